@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+from flask import Flask, Response, abort, jsonify, render_template, request, redirect, url_for
+from concurrent.futures import ThreadPoolExecutor
+import json
+import ssl
+import threading
+import time
+import uuid
+from pyVim.connect import SmartConnect, Disconnect
+from pyVmomi import vim
+import os
+from hoststore import HostStore, PENDING, APPLYING, CONFIGURED
+
+app = Flask(__name__)
+STATE_DB = os.environ.get('STATE_DB', 'esxi_hosts.db')
+# Host lists of earlier versions, imported into the state store on first start
+CONFIG_FILE = 'esxi_hosts_config.json'
+CONFIGURED_FILE = 'configured_hosts.json'
+MAX_PARALLEL_HOSTS = int(os.environ.get('MAX_PARALLEL_HOSTS', 8))
+# Per host, bounds the partition updates hostd runs at the same time
+MAX_PARALLEL_DISK_WIPES = int(os.environ.get('MAX_PARALLEL_DISK_WIPES', 4))
+
+# Apply jobs by id, guarded by jobs_changed which is notified on every progress update
+jobs = {}
+jobs_changed = threading.Condition()
+# Completed jobs are dropped once older than this, or when more are kept
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 3600))
+MAX_COMPLETED_JOBS = int(os.environ.get('MAX_COMPLETED_JOBS', 50))
+
+# Workers sharing the state store tell each other they are alive every HEARTBEAT_SECONDS.
+# The hosts of a worker silent for STALE_CLAIM_SECONDS, e.g. interrupted by a restart, are
+# applied again.
+HEARTBEAT_SECONDS = int(os.environ.get('HEARTBEAT_SECONDS', 30))
+STALE_CLAIM_SECONDS = int(os.environ.get('STALE_CLAIM_SECONDS', 120))
+
+store = HostStore(STATE_DB)
+store.import_json(CONFIG_FILE, PENDING)
+store.import_json(CONFIGURED_FILE, CONFIGURED)
+
+def heartbeat():
+    while True:
+        try:
+            store.heartbeat(APPLYING)
+            recovered = store.recover_stale(APPLYING, PENDING, STALE_CLAIM_SECONDS)
+            if recovered:
+                print(f"Recovered {recovered} host(s) of an interrupted apply job")
+        except Exception as e:
+            print(f"⚠️ Heartbeat failed: {e}")
+        time.sleep(HEARTBEAT_SECONDS)
+
+def start_heartbeat():
+    # Started with the server rather than on import, so the module can be imported on its own
+    threading.Thread(target=heartbeat, name="heartbeat", daemon=True).start()
+
+def wipe_disks(storage_mgr, device_paths, progress):
+    disks = {path: {"status": "pending", "seconds": None, "error": None} for path in device_paths}
+    disks_lock = threading.Lock()
+
+    def update(path, **changes):
+        with disks_lock:
+            disks[path].update(changes)
+            progress({path: dict(disk) for path, disk in disks.items()})
+
+    def wipe(path):
+        update(path, status="wiping")
+        start = time.time()
+        try:
+            print(f"Wiping partitions on {path}...")
+            storage_mgr.UpdateDiskPartitions(path, spec=vim.HostDiskPartitionSpec())
+            update(path, status="wiped", seconds=round(time.time() - start, 1))
+        except Exception as e:
+            print(f"⚠️ Failed to wipe {path}: {e}")
+            update(path, status="failed", seconds=round(time.time() - start, 1), error=str(e))
+
+    progress({path: dict(disk) for path, disk in disks.items()})
+    if device_paths:
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DISK_WIPES) as executor:
+            list(executor.map(wipe, device_paths))
+    return disks
+
+def update_host_config(host_config, progress=None):
+    progress = progress or (lambda step, detail=None: None)
+    context = ssl._create_unverified_context()
+    try:
+        progress("connect")
+        si = SmartConnect(
+            host=host_config["host"],
+            user=host_config["username"],
+            pwd=host_config["password"],
+            sslContext=context
+        )
+    except Exception as e:
+        return f"[{host_config['host']}] ❌ Failed: {str(e)}"
+    try:
+        content = si.RetrieveContent()
+        host_obj = content.viewManager.CreateContainerView(
+            content.rootFolder, [vim.HostSystem], True).view[0]
+        config_mgr = host_obj.configManager
+
+        dns_config = vim.host.DnsConfig(
+            hostName=host_config["hostname"],
+            domainName=host_config["domain"],
+            address=host_config["dns"]
+        )
+        progress("dns")
+        config_mgr.networkSystem.UpdateDnsConfig(dns_config)
+
+        nic = config_mgr.networkSystem.networkInfo.vnic[0].spec
+        nic.ip = vim.host.IpConfig(
+            dhcp=False,
+            ipAddress=host_config["ip"],
+            subnetMask=host_config["netmask"]
+        )
+        progress("vmk0")
+        config_mgr.networkSystem.UpdateVirtualNic("vmk0", nic)
+
+        route_config = vim.host.IpRouteConfig(
+            defaultGateway=host_config["gateway"]
+        )
+        progress("route")
+        config_mgr.networkSystem.UpdateIpRouteConfig(route_config)
+
+        progress("ntp")
+        try:
+            current_ntp = config_mgr.dateTimeSystem.dateTimeInfo.ntpConfig.server
+            if host_config["ntp"] not in current_ntp:
+                ntp_config = vim.host.NtpConfig(server=[host_config["ntp"]])
+                config_mgr.dateTimeSystem.UpdateDateTimeConfig(
+                    vim.host.DateTimeConfig(ntpConfig=ntp_config))
+            config_mgr.dateTimeSystem.EnableNtp()
+        except Exception as e:
+            print(f"⚠️ NTP config skipped or failed: {e}")
+
+        if host_config.get("wipe_disks"):
+            progress("rescan")
+            storage_mgr = config_mgr.storageSystem
+            # Discover new devices on all HBAs first, then the VMFS volumes on them
+            storage_mgr.RescanAllHba()
+            storage_mgr.RescanVmfs()
+
+            bootable_disks = host_obj.config.bootOptions.bootableDisk
+            boot_disk = bootable_disks[0].devicePath if bootable_disks else None
+            disks = [disk.devicePath for disk in storage_mgr.storageDeviceInfo.scsiLun
+                     if isinstance(disk, vim.HostScsiDisk) and disk.devicePath != boot_disk]
+            wipe_disks(storage_mgr, disks, lambda detail: progress("wipe_disks", detail))
+
+        return "success"
+    except Exception as e:
+        return f"[{host_config['host']}] ❌ Failed: {str(e)}"
+    finally:
+        Disconnect(si)
+
+@app.route('/')
+def index():
+    hosts = store.hosts(PENDING)
+    configured = store.hosts(CONFIGURED)
+    return render_template('form.html', hosts=hosts, configured=configured)
+
+@app.route('/add-host', methods=['POST'])
+def add_host():
+    dns_list = [d.strip() for d in request.form['dns'].split(',') if d.strip()]
+
+    host_config = {
+        "host": request.form['host'],
+        "username": request.form['username'],
+        "password": request.form['password'],
+        "hostname": request.form['hostname'],
+        "ip": request.form['ip'],
+        "netmask": request.form['netmask'],
+        "gateway": request.form['gateway'],
+        "dns": dns_list,
+        "domain": request.form['domain'],
+        "ntp": request.form['ntp'],
+        "wipe_disks": request.form.get('wipe_disks') == 'on'
+    }
+
+    store.add_host(host_config)
+
+    return redirect(url_for('index'))
+
+@app.route('/import-hosts', methods=['POST'])
+def import_hosts():
+    # Bulk import of a JSON list of host configs, as in the add-host form
+    host_configs = request.get_json(force=True)
+    if not isinstance(host_configs, list) or not all(
+            isinstance(host, dict) and host.get("host") for host in host_configs):
+        abort(400)
+    store.add_hosts(host_configs)
+    return jsonify({"imported": len(host_configs)})
+
+@app.route('/remove-host/<int:index>', methods=['POST'])
+def remove_host(index):
+    store.remove_at(PENDING, index)
+    return redirect(url_for('index'))
+
+def update_job_host(job, index, **changes):
+    with jobs_changed:
+        job["hosts"][index].update(changes)
+        job["version"] += 1
+        jobs_changed.notify_all()
+
+def apply_host(job, index, host):
+    update_job_host(job, index, status="running", started=time.time())
+    result = update_host_config(
+        host, lambda step, detail=None: update_job_host(job, index, step=step, detail=detail))
+    if result == "success":
+        store.set_status(host["host"], CONFIGURED)
+        update_job_host(job, index, status="success", step="done", finished=time.time(),
+                        message=f"[{host['host']}] ✅ Configuration applied successfully.")
+    else:
+        store.set_status(host["host"], PENDING, message=result)
+        update_job_host(job, index, status="failed", finished=time.time(), message=result)
+
+def run_apply_job(job, hosts):
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_HOSTS) as executor:
+        list(executor.map(lambda args: apply_host(job, *args), enumerate(hosts)))
+
+    with jobs_changed:
+        job["status"] = "completed"
+        job["finished"] = time.time()
+        job["version"] += 1
+        jobs_changed.notify_all()
+
+def prune_jobs(now):
+    # Called with jobs_changed held
+    completed = sorted((job for job in jobs.values() if job["status"] == "completed"),
+                       key=lambda job: job["finished"], reverse=True)
+    for count, job in enumerate(completed):
+        if count >= MAX_COMPLETED_JOBS or now - job["finished"] > JOB_RETENTION_SECONDS:
+            del jobs[job["id"]]
+
+def job_snapshot(job):
+    return {key: value for key, value in job.items() if key != "version"}
+
+@app.route('/apply-all', methods=['POST'])
+def apply_all():
+    hosts = store.claim(PENDING, APPLYING)
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "running",
+        "started": time.time(),
+        "finished": None,
+        "version": 0,
+        "hosts": [{"host": host["host"], "status": "pending", "step": None, "detail": None,
+                   "message": None, "started": None, "finished": None} for host in hosts]
+    }
+    with jobs_changed:
+        prune_jobs(job["started"])
+        jobs[job["id"]] = job
+    threading.Thread(target=run_apply_job, args=(job, hosts), daemon=True).start()
+
+    return render_template('result.html', job_id=job["id"],
+                           result=f"Applying configuration to {len(hosts)} host(s). "
+                                  f"Progress: {url_for('apply_status', job_id=job['id'])} "
+                                  f"or {url_for('apply_events', job_id=job['id'])}")
+
+@app.route('/apply-all/<job_id>')
+def apply_status(job_id):
+    with jobs_changed:
+        job = jobs.get(job_id) or abort(404)
+        return jsonify(job_snapshot(job))
+
+@app.route('/apply-all/<job_id>/events')
+def apply_events(job_id):
+    with jobs_changed:
+        job = jobs.get(job_id) or abort(404)
+
+    def stream():
+        version = -1
+        while True:
+            with jobs_changed:
+                # Wake up regularly to send a keep-alive comment through proxies
+                if not jobs_changed.wait_for(lambda: job["version"] != version, timeout=15):
+                    snapshot = None
+                else:
+                    version = job["version"]
+                    snapshot = job_snapshot(job)
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] == "completed":
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+if __name__ == '__main__':
+    start_heartbeat()
+    app.run(host='0.0.0.0', port=80, threaded=True)
@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+PENDING = "pending"
+APPLYING = "applying"
+CONFIGURED = "configured"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    config TEXT NOT NULL,
+    message TEXT,
+    owner TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hosts_status ON hosts (status, id);
+"""
+
+
+class HostStore:
+    """ESXi host configs and their status in SQLite, safe for concurrent requests and apply jobs.
+
+    Every method is a single transaction. The database runs in WAL mode so readers never wait
+    for the writer, and writers from other threads or processes wait for the lock instead of
+    failing.
+
+    Claimed hosts record the claiming store as owner. The owner refreshes their update time
+    with heartbeat(), so that recover_stale() only gives back hosts of owners that stopped."""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(hosts)")]
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE hosts ADD COLUMN owner TEXT")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_hosts(self, host_configs, status=PENDING):
+        # A host added again replaces its previous config and status
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO hosts (host, status, config, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (host) DO UPDATE SET status = excluded.status, "
+                "config = excluded.config, message = NULL, updated = excluded.updated",
+                [(config["host"], status, json.dumps(config), now) for config in host_configs])
+
+    def add_host(self, host_config, status=PENDING):
+        self.add_hosts([host_config], status)
+
+    def get(self, host):
+        row = self._connection().execute(
+            "SELECT config FROM hosts WHERE host = ?", (host,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def hosts(self, status=None):
+        if status is None:
+            rows = self._connection().execute("SELECT config FROM hosts ORDER BY id")
+        else:
+            rows = self._connection().execute(
+                "SELECT config FROM hosts WHERE status = ? ORDER BY id", (status,))
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, status):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM hosts WHERE status = ?", (status,)).fetchone()[0]
+
+    def set_status(self, host, status, message=None):
+        with self._connection() as conn:
+            conn.execute("UPDATE hosts SET status = ?, message = ?, owner = NULL, updated = ? "
+                         "WHERE host = ?", (status, message, time.time(), host))
+
+    def claim(self, from_status, to_status):
+        """Moves every host of from_status to to_status, owned by this store, and returns their
+        configs, so that two apply jobs never pick the same host."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            host_configs = [json.loads(row[0]) for row in conn.execute(
+                "SELECT config FROM hosts WHERE status = ? ORDER BY id", (from_status,))]
+            conn.execute("UPDATE hosts SET status = ?, owner = ?, updated = ? WHERE status = ?",
+                         (to_status, self.owner, time.time(), from_status))
+        return host_configs
+
+    def heartbeat(self, status):
+        # Tells the other stores that the hosts this store claimed are still being worked on
+        with self._connection() as conn:
+            conn.execute("UPDATE hosts SET updated = ? WHERE status = ? AND owner = ?",
+                         (time.time(), status, self.owner))
+
+    def recover_stale(self, from_status, to_status, max_age):
+        """Moves the hosts of from_status whose owner sent no heartbeat for max_age seconds,
+        e.g. after a crash or restart, to to_status.
+        :return: number of recovered hosts"""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE hosts SET status = ?, owner = NULL, updated = ? "
+                "WHERE status = ? AND updated < ?",
+                (to_status, time.time(), from_status, time.time() - max_age)).rowcount
+
+    def remove_host(self, host):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM hosts WHERE host = ?", (host,))
+
+    def remove_at(self, status, index):
+        # Resolves the index of the host list shown in the UI within the same statement
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM hosts WHERE id = (SELECT id FROM hosts WHERE status = ? "
+                "ORDER BY id LIMIT 1 OFFSET ?)", (status, index))
+
+    def import_json(self, path, status):
+        """Imports a host list written by earlier versions and renames it, so it is imported
+        once."""
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            self.add_hosts(json.load(f), status)
+        os.replace(path, path + ".imported")
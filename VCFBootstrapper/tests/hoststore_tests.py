@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from hoststore import HostStore, PENDING, APPLYING, CONFIGURED
+
+
+def make_config(host):
+    return {"host": host, "password": "secret"}
+
+
+class HostStoreTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "hosts.db")
+        self.store = HostStore(self.path)
+
+    def test_should_claim_hosts_once(self):
+        self.store.add_hosts([make_config("esx-1"), make_config("esx-2")])
+        other = HostStore(self.path)
+
+        claimed = self.store.claim(PENDING, APPLYING)
+
+        self.assertEqual([config["host"] for config in claimed], ["esx-1", "esx-2"])
+        self.assertEqual(other.claim(PENDING, APPLYING), [])
+        self.assertEqual(self.store.count(APPLYING), 2)
+
+    def test_should_recover_claims_without_heartbeat(self):
+        self.store.add_hosts([make_config("esx-1")])
+        other = HostStore(self.path)
+        other.add_hosts([make_config("esx-2")], CONFIGURED)
+        with patch("hoststore.time.time", return_value=1000):
+            self.store.claim(PENDING, APPLYING)
+
+        with patch("hoststore.time.time", return_value=1200):
+            recovered = other.recover_stale(APPLYING, PENDING, 120)
+
+        self.assertEqual(recovered, 1)
+        self.assertEqual([config["host"] for config in other.hosts(PENDING)], ["esx-1"])
+        self.assertEqual(other.count(CONFIGURED), 1)
+
+    def test_should_keep_claims_with_heartbeat(self):
+        self.store.add_hosts([make_config("esx-1")])
+        other = HostStore(self.path)
+        with patch("hoststore.time.time", return_value=1000):
+            self.store.claim(PENDING, APPLYING)
+
+        with patch("hoststore.time.time", return_value=1100):
+            self.store.heartbeat(APPLYING)
+        with patch("hoststore.time.time", return_value=1200):
+            self.assertEqual(other.recover_stale(APPLYING, PENDING, 120), 0)
+        self.assertEqual(other.count(APPLYING), 1)
+
+    def test_should_refresh_own_claims_only(self):
+        self.store.add_hosts([make_config("esx-1")])
+        other = HostStore(self.path)
+        with patch("hoststore.time.time", return_value=1000):
+            self.store.claim(PENDING, APPLYING)
+
+        with patch("hoststore.time.time", return_value=1100):
+            other.heartbeat(APPLYING)
+        with patch("hoststore.time.time", return_value=1200):
+            self.assertEqual(other.recover_stale(APPLYING, PENDING, 120), 1)
+
+    def test_should_import_json_once(self):
+        path = os.path.join(self.directory, "esxi_hosts_config.json")
+        with open(path, "w") as f:
+            json.dump([make_config("esx-1")], f)
+
+        self.store.import_json(path, PENDING)
+        self.store.import_json(path, PENDING)
+
+        self.assertEqual(self.store.get("esx-1"), make_config("esx-1"))
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(path + ".imported"))
+
+    def test_should_add_owner_column_to_existing_databases(self):
+        conn = self.store._connection()
+        conn.executescript("DROP TABLE hosts; CREATE TABLE hosts (id INTEGER PRIMARY KEY "
+                           "AUTOINCREMENT, host TEXT NOT NULL UNIQUE, status TEXT NOT NULL, "
+                           "config TEXT NOT NULL, message TEXT, updated REAL NOT NULL);")
+
+        HostStore(self.path).add_host(make_config("esx-1"))
+
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(hosts)")]
+        self.assertIn("owner", columns)
@@ -11,9 +11,57 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import inspect
 import time
 
+from common.task_tracker import TaskTracker
+
+
+def iter_pages(list_fn, page_size=None, prefetch=4, **filters):
+    """
+       Iterate over the elements of all the pages of a list endpoint.
+       Follows the page metadata of the returned PageOfX, the next pages are
+       fetched concurrently, up to prefetch requests at a time, while the
+       elements of the previous ones are yielded.
+       Endpoints without page parameters are called once.
+       Usage: for host in iter_pages(sddc_client.v1.Hosts.get_hosts, status="ASSIGNED")
+       @return: a generator over the elements
+     """
+    if "page" not in inspect.signature(list_fn).parameters:
+        response = list_fn(**filters)
+        for element in response.elements or []:
+            yield element
+        return
+
+    if page_size is not None:
+        filters["size"] = page_size
+    response = list_fn(**filters)
+    for element in response.elements or []:
+        yield element
+    metadata = response.page_metadata
+    if metadata is None or not metadata.total_pages:
+        return
+    first_page = metadata.page_number or 0
+    last_page = first_page + metadata.total_pages - 1
+    if first_page >= last_page:
+        return
+    if page_size is None and metadata.page_size:
+        # Keep the page boundaries of the first response
+        filters["size"] = metadata.page_size
+
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending = []
+        next_page = first_page + 1
+        while pending or next_page <= last_page:
+            while next_page <= last_page and len(pending) < prefetch:
+                pending.append(executor.submit(list_fn, page=next_page, **filters))
+                next_page += 1
+            response = pending.pop(0).result()
+            for element in response.elements or []:
+                yield element
+
 
 def get_license_keys(product_type, license_key_status, sddc_client):
     """
@@ -36,13 +84,14 @@ def get_hosts_based_on_status(sddc_client, status):
           @return: the list of unassigned hosts that can be used to create domain, clusters
     """
     try:
-        response = sddc_client.v1.Hosts.get_hosts(status=status)
-        if len(response.elements) == 0:
+        hosts = list(iter_pages(sddc_client.v1.Hosts.get_hosts, status=status))
+        if len(hosts) == 0:
             raise AssertionError("Unable to retrieve the unassigned hosts")
-        return response.elements
+        return hosts
     except Exception as ex:
         raise AssertionError("Unable to retrieve the unassigned hosts", ex)
 
+
 def get_cluster_image_id(sddc_client):
     """
           Get cluster Image Id. Use to auto-populate the json required while triggering APIs
@@ -63,11 +112,11 @@ def get_host_based_on_cluster_id_for_removal(sddc_client, cluster_id):
           @return: one of the host belongs to the cluster
     """
     try:
-        response = sddc_client.v1.Hosts.get_hosts(cluster_id=cluster_id)
-        if len(response.elements) <= 6:
+        hosts = list(iter_pages(sddc_client.v1.Hosts.get_hosts, cluster_id=cluster_id))
+        if len(hosts) <= 6:
             raise AssertionError(
                 "Insufficient hosts to remove a host from the cluster")
-        return response.elements[6]
+        return hosts[6]
     except Exception as ex:
         raise AssertionError(
             "Unable to retrieve the hosts for the mentioned cluster", ex)
@@ -80,13 +129,14 @@ def get_domain_id(sddc_client, type, domain_name):
        @return: domain_id
      """
     try:
-        response = sddc_client.v1.Domains.get_domains(type)
-        if len(response.elements) == 0:
-            raise AssertionError("Unable to retrieve the domain information")
         is_found = False
-        for domain in response.elements:
+        is_empty = True
+        for domain in iter_pages(sddc_client.v1.Domains.get_domains, type=type):
+            is_empty = False
             if domain.name == domain_name:
                 return domain.id
+        if is_empty:
+            raise AssertionError("Unable to retrieve the domain information")
         if not is_found:
             raise AssertionError(
                 "Failed to get the domain information for specific domain")
@@ -102,11 +152,11 @@ def get_management_clusters(sddc_client, domain_id):
        @return: the clusters of management domain
      """
     try:
-        response = sddc_client.v1.Clusters.get_clusters(domain_id=domain_id)
-        if len(response.elements) == 0:
+        clusters = list(iter_pages(sddc_client.v1.Clusters.get_clusters, domain_id=domain_id))
+        if len(clusters) == 0:
             raise AssertionError(
                 "Unable to retrieve the management domain clusters information")
-        return response.elements
+        return clusters
     except Exception as ex:
         raise AssertionError(
             "Failed to get the management domain clusters information", ex)
@@ -165,9 +215,8 @@ def retry_task(sddc_client, task_id):
        Retry a failed Task by ID, if it exists
      """
     try:
-            time.sleep(300)
-            sddc_client.v1.Tasks.retry_task(task_id)
-            return
+        sddc_client.v1.Tasks.retry_task(task_id)
+        return
     except Exception as ex:
         raise AssertionError("Failed to retry the task status information", ex)
 
@@ -201,6 +250,7 @@ def validate_cluster_request(sddc_client, cluster_creation_spec):
     except Exception as ex:
         raise AssertionError("Failed to validate the request payload", ex)
 
+
 def poll_domain_status(sddc_client, domain_id):
     """
            poll the domain status.
@@ -215,45 +265,54 @@ def poll_domain_status(sddc_client, domain_id):
         if domains_info.status == "ACTIVE":
             print("The domain status is changed to ACTIVE", domain_id)
             return
-        
+
         raise AssertionError(
-            "Cannot perform operation on the domain as the status is set to {}", domains_info.status , domain_id)
+            "Cannot perform operation on the domain as the status is set to {}",
+            domains_info.status, domain_id)
 
     except Exception as ex:
         raise AssertionError(
             "Failed to poll the domain status for the domain id", domain_id, ex)
 
-def poll_task_status(sddc_client, task_id):
+
+def poll_task_status(sddc_client, task_id, tracker=None):
     """
        poll the task status.
        Use to poll the status of the task and perform cleanup once done successfully
-       Included the logic for retrying a failed task. A maximum of five retries will be attempted if the
-       workflow fails due to a genuine issue or testbed instability.
+       Included the logic for retrying a failed task. A maximum of five retries will be
+       attempted if the workflow fails due to a genuine issue or testbed instability.
+       The task is polled adaptively by a TaskTracker, pass a shared tracker to wait on
+       several tasks from one polling thread.
      """
     try:
-        task = get_task_status(sddc_client, task_id)
         start_time = datetime.now()
-        retry_count = 1
-        print("task {}".format(task.id))
-        while task.status == "Pending" or task.status == "In Progress":
-            time.sleep(900)
-            task = get_task_status(sddc_client, task_id)
-            if task.status == "Failed":
-                if retry_count < 5:
-                    print("Retry the task count: {}".format(retry_count))
-                    retry_task(sddc_client,task_id)
-                    time.sleep(600)
-                    task = get_task_status(sddc_client, task_id)
-                    retry_count =+ 1
-                else:
-                    raise AssertionError(
-                        "Failed to perform the operation with task_id ", task_id)
-        if task.status != "Successful":
-            raise AssertionError(
-                "Failed to perform the operation with task_id ", task_id)
+        print("task {}".format(task_id))
+        if tracker is None:
+            with TaskTracker(sddc_client, max_retries=5) as tracker:
+                tracker.track(task_id).result()
+        else:
+            tracker.track(task_id).result()
         overall_time = (datetime.now() - start_time).total_seconds()/60.0
         print("Overall Time Taken in mins: {}".format(overall_time))
         return
     except Exception as ex:
         raise AssertionError(
             "Failed to poll the task status for the task id", task_id, ex)
+
+
+def poll_tasks_status(sddc_client, task_ids):
+    """
+       poll the status of several tasks at once.
+       Use to wait for tasks triggered together, failing as soon as one of them fails
+       @return: the completed tasks
+     """
+    try:
+        start_time = datetime.now()
+        with TaskTracker(sddc_client, max_retries=5) as tracker:
+            tasks = tracker.wait([tracker.track(task_id) for task_id in task_ids])
+        overall_time = (datetime.now() - start_time).total_seconds()/60.0
+        print("Overall Time Taken in mins: {}".format(overall_time))
+        return tasks
+    except Exception as ex:
+        raise AssertionError(
+            "Failed to poll the task status for the task ids", task_ids, ex)
@@ -0,0 +1,238 @@
+"""
+* *******************************************************
+* Copyright (c) 2025 Broadcom. All rights reserved.
+* The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+* *******************************************************
+*
+* DISCLAIMER. THIS PROGRAM IS PROVIDED TO YOU "AS IS" WITHOUT
+* WARRANTIES OR CONDITIONS OF ANY KIND, WHETHER ORAL OR WRITTEN,
+* EXPRESS OR IMPLIED. THE AUTHOR SPECIFICALLY DISCLAIMS ANY IMPLIED
+* WARRANTIES OR CONDITIONS OF MERCHANTABILITY, SATISFACTORY QUALITY,
+* NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
+"""
+
+from concurrent.futures import Future, wait
+import heapq
+import random
+import threading
+import time
+
+RUNNING_STATUSES = ("Pending", "In Progress")
+
+
+class TaskTracker:
+    """
+    Tracks many SDDC Manager tasks from a single background thread.
+
+    Each task is polled quickly right after it is added, the interval then
+    grows exponentially with some jitter up to max_interval, and falls back
+    to initial_interval whenever the status of the task or of one of its
+    sub-tasks changes. Failed tasks are retried up to max_retries times.
+
+    Usage:
+        with TaskTracker(sddc_client) as tracker:
+            futures = [tracker.track(task.id) for task in tasks]
+            tracker.wait(futures)
+    """
+
+    def __init__(self, sddc_client, initial_interval=5, max_interval=300,
+                 backoff=2.0, jitter=0.2, max_retries=0, retry_delay=30):
+        """
+        :type  sddc_client: :class:`SDDCManagerClient`
+        :param sddc_client: client used to get and retry the tasks
+        :type  initial_interval: :class:`float`
+        :param initial_interval: seconds before the first poll of a task and
+        after each observed progress
+        :type  max_interval: :class:`float`
+        :param max_interval: upper bound of the seconds between two polls
+        :type  backoff: :class:`float`
+        :param backoff: factor applied to the interval when nothing changed
+        :type  jitter: :class:`float`
+        :param jitter: fraction of the interval added or removed at random,
+        so that tasks added together are not polled in lockstep
+        :type  max_retries: :class:`int`
+        :param max_retries: retries of a failed task before giving up
+        :type  retry_delay: :class:`float`
+        :param retry_delay: seconds between a retry and the next poll
+        """
+        self.sddc_client = sddc_client
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._tasks = {}
+        self._schedule = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run,
+                                        name="sddc-task-tracker",
+                                        daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def track(self, task_id, on_update=None):
+        """
+           Start tracking a task.
+           on_update is called with the task every time its status or
+           sub-task progress changes
+           @return: a future resolved with the final task, or failed with an
+           AssertionError when the task did not complete successfully
+         """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The task tracker is closed")
+            tracked = self._tasks.get(task_id)
+            if tracked is None:
+                tracked = _TrackedTask(task_id, self.initial_interval)
+                self._tasks[task_id] = tracked
+                self._push(tracked, 0)
+            if on_update is not None:
+                tracked.callbacks.append(on_update)
+            return tracked.future
+
+    def wait(self, futures, timeout=None):
+        """
+           Wait for the given futures, failing fast on the first failed task
+           @return: the final tasks in the order of the futures
+         """
+        futures = list(futures)
+        done, not_done = wait(futures, timeout=timeout,
+                              return_when="FIRST_EXCEPTION")
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if not_done:
+            raise AssertionError("Timed out waiting for the tasks")
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+           Stop the polling thread. Tasks still running are cancelled.
+         """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+        for tracked in list(self._tasks.values()):
+            tracked.future.cancel()
+        self._tasks.clear()
+
+    def _push(self, tracked, delay):
+        heapq.heappush(self._schedule,
+                       (time.monotonic() + delay, tracked.task_id))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._schedule:
+                        delay = self._schedule[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                _, task_id = heapq.heappop(self._schedule)
+                tracked = self._tasks.get(task_id)
+            if tracked is None:
+                continue
+            if tracked.future.cancelled():
+                with self._condition:
+                    self._tasks.pop(task_id, None)
+                continue
+            self._poll(tracked)
+
+    def _poll(self, tracked):
+        try:
+            task = self.sddc_client.v1.Tasks.get_task(tracked.task_id)
+        except Exception as ex:
+            # Transient API errors only slow the polling down
+            print("Failed to get the task {}: {}".format(tracked.task_id, ex))
+            self._reschedule(tracked, changed=False)
+            return
+
+        progress = _progress(task)
+        changed = progress != tracked.progress
+        tracked.progress = progress
+        if changed:
+            for callback in tracked.callbacks:
+                try:
+                    callback(task)
+                except Exception as ex:
+                    print("Task update callback failed: {}".format(ex))
+
+        if task.status in RUNNING_STATUSES:
+            self._reschedule(tracked, changed)
+        elif task.status == "Failed" and tracked.retries < self.max_retries:
+            tracked.retries += 1
+            print("Retry the task count: {}".format(tracked.retries))
+            try:
+                self.sddc_client.v1.Tasks.retry_task(tracked.task_id)
+            except Exception as ex:
+                self._finish(tracked, exception=AssertionError(
+                    "Failed to retry the task", tracked.task_id, ex))
+                return
+            tracked.interval = self.initial_interval
+            with self._condition:
+                self._push(tracked, self.retry_delay)
+        elif task.status == "Successful":
+            self._finish(tracked, result=task)
+        else:
+            self._finish(tracked, exception=AssertionError(
+                "Failed to perform the operation with task_id ",
+                tracked.task_id))
+
+    def _reschedule(self, tracked, changed):
+        if changed:
+            tracked.interval = self.initial_interval
+        else:
+            tracked.interval = min(tracked.interval * self.backoff,
+                                   self.max_interval)
+        delay = tracked.interval * random.uniform(1 - self.jitter,
+                                                  1 + self.jitter)
+        with self._condition:
+            self._push(tracked, delay)
+
+    def _finish(self, tracked, result=None, exception=None):
+        with self._condition:
+            self._tasks.pop(tracked.task_id, None)
+        if tracked.future.cancelled():
+            return
+        if exception is not None:
+            tracked.future.set_exception(exception)
+        else:
+            tracked.future.set_result(result)
+
+
+class _TrackedTask:
+    """
+    State of one tracked task
+    """
+
+    def __init__(self, task_id, interval):
+        self.task_id = task_id
+        self.interval = interval
+        self.future = Future()
+        self.callbacks = []
+        self.progress = None
+        self.retries = 0
+
+
+def _progress(task):
+    """
+       The statuses of a task and of its sub-tasks, compared between polls
+       to detect progress
+     """
+    return (task.status,
+            tuple(sub_task.status for sub_task in task.sub_tasks or ()))
@@ -0,0 +1,73 @@
+import threading
+from unittest import TestCase
+from mock import Mock
+
+from common.helper import iter_pages
+
+
+def make_page(elements, page_number=None, total_pages=None, page_size=None):
+    metadata = None
+    if total_pages is not None:
+        metadata = Mock(page_number=page_number, total_pages=total_pages,
+                        page_size=page_size)
+    return Mock(elements=elements, page_metadata=metadata)
+
+
+class PagedList:
+    """
+    List endpoint with page parameters, serving pages of two elements
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, status=None, page=None, size=None):
+        with self.lock:
+            self.calls.append({"status": status, "page": page, "size": size})
+        page = page or 0
+        size = size or 2
+        elements = list(range(page * size, min((page + 1) * size, self.total)))
+        return make_page(elements, page, -(-self.total // size), size)
+
+
+class IterPagesTests(TestCase):
+
+    def test_should_call_endpoints_without_page_parameters_once(self):
+        def get_vdses(cluster_id):
+            return make_page(["vds-1", "vds-2"])
+
+        self.assertEqual(list(iter_pages(get_vdses, cluster_id="c1")),
+                         ["vds-1", "vds-2"])
+
+    def test_should_follow_all_pages_in_order(self):
+        get_hosts = PagedList(7)
+
+        hosts = list(iter_pages(get_hosts, prefetch=2, status="ASSIGNED"))
+
+        self.assertEqual(hosts, list(range(7)))
+        self.assertEqual(sorted(call["page"] or 0 for call in get_hosts.calls),
+                         [0, 1, 2, 3])
+        # The next pages keep the filters and the size of the first one
+        self.assertTrue(all(call["status"] == "ASSIGNED"
+                            for call in get_hosts.calls))
+        self.assertEqual([call["size"] for call in get_hosts.calls[1:]],
+                         [2, 2, 2])
+
+    def test_should_pass_page_size(self):
+        get_hosts = PagedList(5)
+
+        hosts = list(iter_pages(get_hosts, page_size=3))
+
+        self.assertEqual(hosts, list(range(5)))
+        self.assertEqual([call["size"] for call in get_hosts.calls], [3, 3])
+
+    def test_should_stop_without_page_metadata(self):
+        get_hosts = Mock(return_value=make_page([1, 2]))
+
+        def list_fn(page=None, size=None):
+            return get_hosts(page=page, size=size)
+
+        self.assertEqual(list(iter_pages(list_fn)), [1, 2])
+        self.assertEqual(get_hosts.call_count, 1)
@@ -0,0 +1,105 @@
+import heapq
+from unittest import TestCase
+from mock import Mock, patch
+
+from common.task_tracker import TaskTracker
+
+
+def make_task(status, sub_statuses=()):
+    return Mock(status=status, sub_tasks=[Mock(status=sub_status)
+                                          for sub_status in sub_statuses])
+
+
+class TaskTrackerSchedulingTests(TestCase):
+
+    def setUp(self):
+        self.tracker = TaskTracker(Mock(), initial_interval=5, max_interval=30,
+                                   backoff=2.0, jitter=0.2)
+        # Stop the polling thread, the schedule is checked directly
+        self.tracker.close()
+        self.tracker._schedule = []
+        self.tracked = Mock(task_id="t1", interval=5)
+
+    @patch("common.task_tracker.random.uniform", return_value=1.0)
+    @patch("common.task_tracker.time.monotonic", return_value=100.0)
+    def test_should_back_off_up_to_max_interval(self, monotonic, uniform):
+        intervals = []
+        for _ in range(4):
+            self.tracker._reschedule(self.tracked, changed=False)
+            intervals.append(self.tracked.interval)
+
+        self.assertEqual(intervals, [10, 20, 30, 30])
+        self.assertEqual(heapq.heappop(self.tracker._schedule), (110.0, "t1"))
+
+    @patch("common.task_tracker.random.uniform", return_value=1.0)
+    def test_should_reset_interval_on_progress(self, uniform):
+        self.tracked.interval = 30
+
+        self.tracker._reschedule(self.tracked, changed=True)
+
+        self.assertEqual(self.tracked.interval, 5)
+
+    @patch("common.task_tracker.time.monotonic", return_value=0.0)
+    def test_should_jitter_delays(self, monotonic):
+        for _ in range(50):
+            self.tracked.interval = 5
+            self.tracker._reschedule(self.tracked, changed=True)
+
+        due = [when for when, _ in self.tracker._schedule]
+        self.assertTrue(all(4 <= when <= 6 for when in due))
+        self.assertGreater(len(set(due)), 1)
+
+    @patch("common.task_tracker.time.monotonic", return_value=0.0)
+    def test_should_schedule_earliest_task_first(self, monotonic):
+        with self.tracker._condition:
+            for task_id, delay in [("t1", 30), ("t2", 5), ("t3", 10)]:
+                self.tracker._push(Mock(task_id=task_id), delay)
+
+        order = [heapq.heappop(self.tracker._schedule)[1] for _ in range(3)]
+        self.assertEqual(order, ["t2", "t3", "t1"])
+
+
+class TaskTrackerTests(TestCase):
+
+    def setUp(self):
+        self.client = Mock()
+        self.print_patch = patch("builtins.print")
+        self.print_patch.start()
+        self.addCleanup(self.print_patch.stop)
+
+    def make_tracker(self, **kwargs):
+        tracker = TaskTracker(self.client, initial_interval=0.01,
+                              max_interval=0.01, retry_delay=0, **kwargs)
+        self.addCleanup(tracker.close)
+        return tracker
+
+    def test_should_resolve_successful_tasks(self):
+        self.client.v1.Tasks.get_task.side_effect = [
+            make_task("In Progress", ["Pending"]),
+            make_task("In Progress", ["Successful"]),
+            make_task("Successful", ["Successful"])]
+        updates = []
+        tracker = self.make_tracker()
+
+        task = tracker.track("t1", updates.append).result(timeout=5)
+
+        self.assertEqual(task.status, "Successful")
+        self.assertEqual(len(updates), 3)
+
+    def test_should_retry_failed_tasks(self):
+        self.client.v1.Tasks.get_task.side_effect = [
+            make_task("Failed"), make_task("Successful")]
+        tracker = self.make_tracker(max_retries=1)
+
+        tracker.track("t1").result(timeout=5)
+
+        self.client.v1.Tasks.retry_task.assert_called_once_with("t1")
+
+    def test_should_fail_fast_when_waiting(self):
+        self.client.v1.Tasks.get_task.side_effect = \
+            lambda task_id: make_task("Failed" if task_id == "t2"
+                                      else "In Progress")
+        tracker = self.make_tracker()
+
+        with self.assertRaises(AssertionError):
+            tracker.wait([tracker.track("t1"), tracker.track("t2")], timeout=5)
@@ -11,7 +11,6 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
-import requests
 
 from vmware.sddc_manager.v1_client import Tokens
 from vmware.sddc_manager.model_client import TokenCreationSpec
@@ -21,6 +20,7 @@ from vmware.vapi.bindings.stub import ApiClient
 from vmware.vapi.lib.connect import get_requests_connector
 from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
 from utils.sddc_manager_filter import SDDCManagerSecurityContextFilter
+from utils.http_session import create_session
 
 
 
@@ -34,7 +34,8 @@ class SDDCManagerClient(ApiClient):
     SDDC Manager Client class that providess access to stubs for all the services in the
     SDDC Manager API
     """
-    def __init__(self, session, server, username, password, refresh_token):
+    def __init__(self, session, server, username, password, refresh_token,
+                 token_cache=None):
         """
         Initialize SDDCManagerClient by creating a stub factory instance
 
@@ -49,41 +50,68 @@ class SDDCManagerClient(ApiClient):
         :param password: Password of the user
         :type  refresh_token: :class:`str`
         :param refresh_token: refresh token obtained from the token service.
+        :type  token_cache: :class:`utils.token_cache.TokenCache` or ``None``
+        :param token_cache: cache of token pairs shared between processes. A
+        valid cached token pair of the user is reused instead of creating one
         """
         if not session:
-            session = requests.Session()
+            session = create_session()
         session.verify = False
         self.session = session
 
         host_url = "https://" + server
         access_token = None
+        cache_key = None
         if username is not None and password is not None:
-            tokens_service = Tokens(
-            StubConfigurationFactory.new_std_configuration(
-                get_requests_connector(
-                    session=session, msg_protocol='rest', url=host_url)))
-            create_token_spec = TokenCreationSpec(username=username, password=password)
-            token_pair = tokens_service.create_token(token_creation_spec=create_token_spec)
-            access_token = token_pair.access_token
-            refresh_token = token_pair.refresh_token.id
+            def create_token_pair():
+                tokens_service = Tokens(
+                StubConfigurationFactory.new_std_configuration(
+                    get_requests_connector(
+                        session=session, msg_protocol='rest', url=host_url)))
+                create_token_spec = TokenCreationSpec(username=username, password=password)
+                token_pair = tokens_service.create_token(token_creation_spec=create_token_spec)
+                return token_pair.access_token, token_pair.refresh_token.id
 
+            if token_cache is not None:
+                cache_key = token_cache.user_key(host_url, username, password)
+                access_token, refresh_token = token_cache.get_or_create(
+                    host_url, cache_key, create_token_pair)
+            else:
+                access_token, refresh_token = create_token_pair()
+
+        self._security_filter = SDDCManagerSecurityContextFilter(session=session,
+                                                                 refresh_token=refresh_token,
+                                                                 host_url=host_url,
+                                                                 access_token=access_token,
+                                                                 token_cache=token_cache,
+                                                                 cache_key=cache_key)
         stub_factory = SDDCManagerStubFactory(
             StubConfigurationFactory.new_std_configuration(
                 get_requests_connector(
                     session=session, msg_protocol='rest', url=host_url,
-                    provider_filter_chain=[
-                        SDDCManagerSecurityContextFilter(session=session,
-                                                         refresh_token=refresh_token,
-                                                         host_url=host_url,
-                                                         access_token=access_token)])))
+                    provider_filter_chain=[self._security_filter])))
         ApiClient.__init__(self, stub_factory)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stop refreshing the access token in the background. The client holds
+        a timer thread until it is closed.
+        """
+        self._security_filter.close()
+
 
 def create_sddc_manager_client(server=None,
                                username=None,
                                password=None,
                                refresh_token=None,
-                               session=None):
+                               session=None,
+                               token_cache=None):
     """
     Helper method to create an instance of the VMC API client using the public
     VMC and CSP URL.
@@ -92,13 +120,18 @@ def create_sddc_manager_client(server=None,
     :param refresh_token: Refresh token obtained from CSP
     :type  session: :class:`requests.Session` or ``None``
     :param session: Requests HTTP session instance. If not specified, then one
-        is automatically created and used
+        with pooled keep-alive connections and retries of idempotent requests
+        is created and used, see utils.http_session.create_session
+    :type  token_cache: :class:`utils.token_cache.TokenCache` or ``None``
+    :param token_cache: Token cache shared by the processes running against
+        the same SDDC Manager, e.g. TokenCache("~/.sddc_manager_tokens")
     :rtype: :class:`vmware.vapi.vmc.client.VmcClient`
     :return: VMC Client instance
     """
-    session = session or requests.Session()
+    session = session or create_session()
     return SDDCManagerClient(session=session,
                              server=server,
                              username=username,
                              password=password,
-                             refresh_token=refresh_token)
+                             refresh_token=refresh_token,
+                             token_cache=token_cache)
@@ -11,12 +11,19 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
+import threading
+import time
+
 from vmware.sddc_manager.v1.tokens.access_token_client import Refresh
 from vmware.vapi.lib.connect import get_requests_connector
 from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
 from vmware.vapi.security.client.security_context_filter import (
     SecurityContextFilter)
 from vmware.vapi.security.oauth import create_oauth_security_context
+from utils.token_cache import DEFAULT_REFRESH_MARGIN, get_token_expiry
+
+# Minimum seconds between two background refreshes
+MIN_REFRESH_DELAY = 5
 
 class SDDCManagerSecurityContextFilter(SecurityContextFilter):
     """
@@ -24,23 +31,48 @@ class SDDCManagerSecurityContextFilter(SecurityContextFilter):
     context based on a refresh token to the execution context passed in.
     """
 
-    def __init__(self, session=None, refresh_token=None, host_url=None, access_token=None):
+    def __init__(self, session=None, refresh_token=None, host_url=None, access_token=None,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN, token_cache=None, cache_key=None):
         """
         Initialize SecurityContextFilter
 
+        The access token is refreshed in a background thread refresh_margin
+        seconds before it expires, so requests do not have to fail with
+        Unauthenticated first. A request that still finds the token about to
+        expire refreshes it inline.
+
         :type  session: :class:`requests.Session`
         :param session: Requests Session object to use for making HTTP calls
         :type  refresh_token: :class:`str`
         :param refresh_token: Refresh token to use for obtaining an access token
-        :type  refresh_url: :class:`str`
-        :param refresh_url: URL that allows exchanging a refresh token for an
-            access token
+        :type  host_url: :class:`str`
+        :param host_url: URL of the SDDC Manager
+        :type  access_token: :class:`str`
+        :param access_token: Current access token, if any
+        :type  refresh_margin: :class:`int`
+        :param refresh_margin: Seconds before the expiry of the access token
+            at which it is refreshed
+        :type  token_cache: :class:`utils.token_cache.TokenCache` or ``None``
+        :param token_cache: Cache to share refreshed tokens with other
+            processes
+        :type  cache_key: :class:`str` or ``None``
+        :param cache_key: Key of the user the tokens belong to in the token
+            cache, see utils.token_cache.TokenCache.user_key
         """
         SecurityContextFilter.__init__(self, None)
         self._session = session
         self._refresh_token = refresh_token
         self._host_url = host_url
-        self._access_token = access_token
+        self._refresh_margin = refresh_margin
+        self._token_cache = token_cache
+        self._cache_key = cache_key
+        self._lock = threading.Lock()
+        self._timer = None
+        self._closed = False
+        self._access_token = None
+        self._expires_at = None
+        if access_token:
+            self._set_access_token(access_token)
 
     def get_max_retries(self):
         """
@@ -62,13 +94,70 @@ class SDDCManagerSecurityContextFilter(SecurityContextFilter):
         :rtype: :class:`vmware.vapi.core.SecurityContext`
         :return: Security context
         """
-        if on_error or not self._access_token:
+        with self._lock:
+            if on_error or self._needs_refresh():
+                self._refresh(rejected=on_error)
+            return create_oauth_security_context(self._access_token)
+
+    def close(self):
+        """
+        Stop refreshing the access token in the background.
+        """
+        with self._lock:
+            self._closed = True
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _needs_refresh(self):
+        if not self._access_token:
+            return True
+        return (self._expires_at is not None and
+                self._expires_at - time.time() < self._refresh_margin)
+
+    def _refresh(self, rejected=False):
+        def refresh_token_pair():
             refresh_token_service = Refresh(
-            StubConfigurationFactory.new_std_configuration(
-                get_requests_connector(
-                    session=self._session, msg_protocol='rest', url=self._host_url)))
-            self._access_token = refresh_token_service.refresh_access_token(self._refresh_token)
-        return create_oauth_security_context(self._access_token)
+                StubConfigurationFactory.new_std_configuration(
+                    get_requests_connector(
+                        session=self._session, msg_protocol='rest', url=self._host_url)))
+            return (refresh_token_service.refresh_access_token(self._refresh_token),
+                    self._refresh_token)
+
+        if self._token_cache and self._cache_key:
+            # Another process may have refreshed the token already
+            access_token, self._refresh_token = self._token_cache.get_or_create(
+                self._host_url, self._cache_key, refresh_token_pair,
+                min_validity=self._refresh_margin,
+                rejected_token=self._access_token if rejected else None)
+        else:
+            access_token, _ = refresh_token_pair()
+        self._set_access_token(access_token)
+
+    def _set_access_token(self, access_token):
+        self._access_token = access_token
+        self._expires_at = get_token_expiry(access_token)
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._expires_at is not None and not self._closed:
+            # Tokens living shorter than the margin, or clock skew, would
+            # otherwise refresh in a tight loop
+            delay = max(self._expires_at - time.time() - self._refresh_margin,
+                        MIN_REFRESH_DELAY)
+            self._timer = threading.Timer(delay, self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                if self._needs_refresh():
+                    self._refresh()
+            except Exception:
+                # The request path refreshes again or retries on
+                # Unauthenticated, nothing more to do here
+                pass
 
     def should_retry(self, error_value):
         """
@@ -0,0 +1,177 @@
+"""
+* *******************************************************
+* Copyright (c) 2025 Broadcom. All rights reserved.
+* The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+* *******************************************************
+*
+* DISCLAIMER. THIS PROGRAM IS PROVIDED TO YOU "AS IS" WITHOUT
+* WARRANTIES OR CONDITIONS OF ANY KIND, WHETHER ORAL OR WRITTEN,
+* EXPRESS OR IMPLIED. THE AUTHOR SPECIFICALLY DISCLAIMS ANY IMPLIED
+* WARRANTIES OR CONDITIONS OF MERCHANTABILITY, SATISFACTORY QUALITY,
+* NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
+"""
+
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, the cache is then only safe for one process
+    fcntl = None
+
+# Seconds before its expiry at which an access token is refreshed. Cached
+# tokens expiring sooner are not handed out, they would be refreshed at once.
+DEFAULT_REFRESH_MARGIN = 120
+
+
+def get_token_expiry(access_token):
+    """
+    Read the expiry of a JWT access token without verifying it.
+
+    :type  access_token: :class:`str`
+    :param access_token: JWT access token
+    :rtype: :class:`float` or ``None``
+    :return: Expiry as seconds since the epoch, None if the token carries
+        no readable expiry
+    """
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenCache:
+    """
+    Token pairs shared between processes through a JSON file.
+
+    Every read and update holds an exclusive lock on the file, so concurrent
+    jobs against the same SDDC Manager agree on a single token pair. The file
+    holds credentials and is created readable by the owner only.
+    """
+
+    def __init__(self, path, min_validity=DEFAULT_REFRESH_MARGIN):
+        """
+        :type  path: :class:`str`
+        :param path: Path of the cache file
+        :type  min_validity: :class:`int`
+        :param min_validity: Seconds an access token must still be valid for
+            to be returned by get()
+        """
+        self.path = os.path.expanduser(path)
+        self.min_validity = min_validity
+
+    @staticmethod
+    def key(host_url, username):
+        return "{}|{}".format(host_url, username)
+
+    @staticmethod
+    def user_key(host_url, username, password):
+        """
+        Name of a user in the cache, tied to the password.
+
+        Entries are looked up by this key instead of the bare user name, so a
+        token pair is only returned to callers knowing the password it was
+        created with. The password is stored as a salted PBKDF2 hash only.
+
+        :rtype: :class:`str`
+        :return: User name followed by the hash of the credentials
+        """
+        digest = hashlib.pbkdf2_hmac(
+            'sha256', password.encode('utf-8'),
+            "{}|{}".format(host_url, username).encode('utf-8'), 100000)
+        return "{}#{}".format(username, digest.hex())
+
+    def get(self, host_url, username):
+        """
+        Get the cached token pair of a user.
+
+        :rtype: :class:`tuple` or ``None``
+        :return: access token and refresh token id, None if there is no
+            entry or its access token expires within min_validity seconds
+        """
+        with self._locked() as entries:
+            return self._valid_entry(entries, host_url, username)
+
+    def get_or_create(self, host_url, username, create_token_pair,
+                      min_validity=None, rejected_token=None):
+        """
+        Get the cached token pair of a user, or create and cache one.
+
+        The lock is held while creating, so processes starting together or
+        refreshing together request a single token pair from the SDDC Manager.
+
+        :type  create_token_pair: :class:`callable`
+        :param create_token_pair: Returns a new access token and refresh token
+            id
+        :type  min_validity: :class:`int` or ``None``
+        :param min_validity: Overrides the min_validity of the cache
+        :type  rejected_token: :class:`str` or ``None``
+        :param rejected_token: Access token rejected by the SDDC Manager, not
+            reused even if it did not expire yet
+        :rtype: :class:`tuple`
+        :return: access token and refresh token id
+        """
+        with self._locked(write=True) as entries:
+            token_pair = self._valid_entry(entries, host_url, username,
+                                           min_validity)
+            if token_pair is not None and token_pair[0] == rejected_token:
+                token_pair = None
+            if token_pair is None:
+                token_pair = create_token_pair()
+                entries[self.key(host_url, username)] = {
+                    'access_token': token_pair[0],
+                    'refresh_token': token_pair[1],
+                }
+            return token_pair
+
+    def put(self, host_url, username, access_token, refresh_token):
+        """
+        Store the token pair of a user.
+        """
+        with self._locked(write=True) as entries:
+            entries[self.key(host_url, username)] = {
+                'access_token': access_token,
+                'refresh_token': refresh_token,
+            }
+
+    def _valid_entry(self, entries, host_url, username, min_validity=None):
+        if min_validity is None:
+            min_validity = self.min_validity
+        entry = entries.get(self.key(host_url, username))
+        if not entry:
+            return None
+        expiry = get_token_expiry(entry['access_token'])
+        if expiry is None or expiry - time.time() < min_validity:
+            return None
+        return entry['access_token'], entry['refresh_token']
+
+    @contextlib.contextmanager
+    def _locked(self, write=False):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as cache_file:
+            if fcntl:
+                fcntl.flock(cache_file, fcntl.LOCK_EX)
+            try:
+                content = cache_file.read()
+                try:
+                    entries = json.loads(content) if content else {}
+                except ValueError:
+                    # A corrupt cache is rebuilt from scratch
+                    entries = {}
+                yield entries
+                if write:
+                    cache_file.seek(0)
+                    cache_file.truncate()
+                    json.dump(entries, cache_file)
+                    cache_file.flush()
+                    os.fsync(cache_file.fileno())
+            finally:
+                if fcntl:
+                    fcntl.flock(cache_file, fcntl.LOCK_UN)
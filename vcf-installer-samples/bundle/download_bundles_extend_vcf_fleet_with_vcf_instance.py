@@ -80,6 +80,12 @@ parser.add_argument(
     default=download_bundles_util.DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC,
     help='The time to sleep in between each poll when polling the download status of the bundles, measured in seconds.')
 
+parser.add_argument(
+    '--download_state_file',
+    required=False,
+    help='Optional - path of a JSON file recording the download progress. '
+         'A rerun with the same file skips the bundles already downloaded.')
+
 args = parser.parse_args()
 server = args.vcf_installer_host_address
 password = args.vcf_installer_admin_password
@@ -108,16 +114,15 @@ latest_product_release_components = download_bundles_util.get_latest_product_rel
         "VCENTER", "NSX_T_MANAGER", "SDDC_MANAGER"})
 print("Retrieved product release components")
 
-bundle_ids_being_downloaded = download_bundles_util.start_bundles_download(
-    client, latest_product_release_components)
-print("Started downloading all necessary bundles".format(bundle_ids_being_downloaded))
-
-utils.download_bundles_util.poll_bundles_downloaded(
+download_orchestrator = download_bundles_util.BundleDownloadOrchestrator(
     client,
-    bundle_ids_being_downloaded,
     version_without_build_number,
-    args.time_to_wait_for_depot_sync_in_minutes,
-    args.max_time_to_poll_download_status_in_hours)
+    state_file=args.download_state_file,
+    max_poll_interval_in_sec=float(args.time_to_sleep_in_between_polls_for_download_status_in_seconds))
+bundle_ids_being_downloaded = download_orchestrator.start(latest_product_release_components)
+print("Started downloading all necessary bundles: {}".format(bundle_ids_being_downloaded))
+
+download_orchestrator.wait(float(args.max_time_to_poll_download_status_in_hours))
 print("Downloaded all necessary bundles")
 
 print("Sample completed successfully")
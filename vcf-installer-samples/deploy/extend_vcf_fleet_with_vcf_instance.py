@@ -276,6 +276,14 @@ parser.add_argument(
     Pass False to disable SSL verifications
     (do not leave it empty on production environments).""")
 
+parser.add_argument(
+    '--thumbprint_cache_file',
+    help="""
+    Path to a JSON file caching the ESXi host SSL thumbprints until the host certificates expire.
+    Repeated runs against the same hosts reuse the cached thumbprints instead of connecting to the hosts.
+    Thumbprints read without SSL verification (--ca_certs False) are not cached.
+    """)
+
 parser.add_argument(
     '--deployment_spec_save_file_path',
     help="""
@@ -378,7 +386,7 @@ def create_sddc_spec_for_extension_of_existing_vcf_fleet(vcf_client, args):
 
     # Hosts
     hosts_dict = get_hosts_to_thumbprint(
-        args.esx_hosts, args.dns_domain, args.ca_certs)
+        args.esx_hosts, args.dns_domain, args.ca_certs, args.thumbprint_cache_file)
     host_specs = create_sddc_host_specs(args.esxi_host_root_password, hosts_dict)
     spec.host_specs = host_specs  # Host specs are required for greenfield deployments.
 
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import Mock, patch
+
+from utils.download_bundles_util import BundleDownloadOrchestrator
+
+_MB = 1024 * 1024
+
+
+def make_status(bundle_id, downloaded, status="INPROGRESS", message=None):
+    return Mock(bundle_id=bundle_id, downloaded_size=downloaded, download_status=status,
+                message=message)
+
+
+def make_component(name, bundle_ids):
+    version = Mock()
+    version.artifacts.bundles = [Mock(id=bundle_id) for bundle_id in bundle_ids]
+    component = Mock(versions=[version])
+    component.name = name
+    return component
+
+
+class BundleDownloadOrchestratorTests(TestCase):
+
+    def setUp(self):
+        self.client = Mock()
+        self.client.v1.Bundles.get_bundle.return_value = Mock(size_mb=100)
+        self.statuses = self.client.v1.bundles.DownloadStatus.get_bundle_download_status
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.state_file = os.path.join(self.directory, "state.json")
+
+    def poll(self, orchestrator, now, statuses):
+        self.statuses.return_value = Mock(elements=statuses)
+        with patch("utils.download_bundles_util.time.time", return_value=now), \
+                patch("builtins.print"):
+            return orchestrator._poll()
+
+    def test_should_estimate_remaining_time_from_throughput(self):
+        orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0")
+        orchestrator.track(["b1", "b2"])
+        orchestrator._fetch_sizes()
+
+        self.assertEqual(self.poll(orchestrator, 100, [make_status("b1", 0),
+                                                       make_status("b2", 0)]),
+                         (False, None))
+        done, eta = self.poll(orchestrator, 110, [make_status("b1", 10 * _MB),
+                                                  make_status("b2", 30 * _MB)])
+
+        self.assertFalse(done)
+        # 160 MB left at 1 + 3 MB/s
+        self.assertAlmostEqual(eta, 40)
+
+    def test_should_smooth_throughput(self):
+        orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0")
+        orchestrator.track(["b1"])
+
+        self.poll(orchestrator, 100, [make_status("b1", 0)])
+        self.poll(orchestrator, 110, [make_status("b1", 10 * _MB)])
+        self.poll(orchestrator, 120, [make_status("b1", 30 * _MB)])
+
+        # 30% of the latest 2 MB/s sample and 70% of the previous 1 MB/s
+        self.assertAlmostEqual(orchestrator.bundles["b1"]["throughput"], 1.3 * _MB)
+
+    def test_should_fail_on_failed_downloads(self):
+        orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0")
+        orchestrator.track(["b1", "b2"])
+
+        with self.assertRaises(AssertionError) as error:
+            self.poll(orchestrator, 100, [make_status("b1", 0, "FAILED", "no space"),
+                                          make_status("b2", 0)])
+        self.assertIn("b1 (FAILED: no space)", str(error.exception))
+
+    def test_should_resume_from_state_file(self):
+        orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0",
+                                                  state_file=self.state_file)
+        orchestrator.track(["b1", "b2"])
+        self.poll(orchestrator, 100, [make_status("b1", 100 * _MB, "SUCCESS"),
+                                      make_status("b2", 10 * _MB)])
+
+        resumed = BundleDownloadOrchestrator(self.client, "9.0.0.0",
+                                             state_file=self.state_file)
+        with patch("builtins.print"):
+            bundle_ids = resumed.start([make_component("VCENTER", ["b1", "b2"])])
+
+        self.assertEqual(sorted(bundle_ids), ["b1", "b2"])
+        self.assertEqual(resumed.bundles["b1"]["status"], "SUCCESS")
+        self.assertEqual(resumed.bundles["b2"]["downloaded"], 10 * _MB)
+        self.assertNotIn("polled_at", resumed.bundles["b2"])
+        started = [call[0][0] for call in
+                   self.client.v1.Bundles.start_bundle_download_by_id.call_args_list]
+        self.assertEqual(started, ["b2"])
+        self.assertFalse(os.path.exists(self.state_file + ".tmp"))
+
+    def test_should_ignore_state_file_of_other_release(self):
+        with open(self.state_file, "w") as file:
+            json.dump({"release_version": "5.2.0.0",
+                       "bundles": {"b1": {"status": "SUCCESS"}}}, file)
+
+        with patch("builtins.print"):
+            orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0",
+                                                      state_file=self.state_file)
+
+        self.assertEqual(orchestrator.bundles, {})
+
+    def test_should_wait_until_downloaded(self):
+        orchestrator = BundleDownloadOrchestrator(self.client, "9.0.0.0",
+                                                  min_poll_interval_in_sec=0,
+                                                  max_poll_interval_in_sec=0)
+        orchestrator.track(["b1"])
+        self.statuses.side_effect = [Mock(elements=[make_status("b1", 0)]),
+                                     Mock(elements=[make_status("b1", 100 * _MB, "SUCCESS")])]
+
+        with patch("builtins.print"):
+            self.assertTrue(orchestrator.wait(0.1))
+        self.assertEqual(self.statuses.call_count, 2)
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from unittest import TestCase
+from mock import Mock, patch
+
+from utils.poll_scheduler import PollScheduler, poll_async
+
+
+class PollAsyncTests(TestCase):
+
+    def run_poll(self, poll_func, *args, **kwargs):
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        with patch("utils.poll_scheduler.asyncio.sleep", sleep), patch("builtins.print"):
+            result = asyncio.run(poll_async(poll_func, *args, **kwargs))
+        return result, sleeps
+
+    def test_should_back_off_up_to_max_interval(self):
+        poll_func = Mock(side_effect=[None, None, None, None, "done"])
+
+        result, sleeps = self.run_poll(poll_func, 1, 10, 30, 2.0)
+
+        self.assertEqual(result, "done")
+        self.assertEqual(sleeps, [10, 20, 30, 30])
+
+    def test_should_clamp_interval_func_to_bounds(self):
+        poll_func = Mock(side_effect=[None, None, None, "done"])
+        interval_func = Mock(side_effect=[1, 100, None])
+
+        result, sleeps = self.run_poll(poll_func, 1, 5, 60, 2.0, interval_func)
+
+        self.assertEqual(result, "done")
+        # None falls back to the backoff, which starts at min_interval
+        self.assertEqual(sleeps, [5, 60, 5])
+
+    def test_should_never_go_below_min_interval(self):
+        poll_func = Mock(side_effect=[None, "done"])
+
+        _, sleeps = self.run_poll(poll_func, 1, 10, 5)
+
+        self.assertEqual(sleeps, [10])
+
+    @patch("utils.poll_scheduler.datetime")
+    def test_should_time_out(self, datetime_mock):
+        start = datetime(2025, 1, 1)
+        datetime_mock.now.side_effect = [start, start.replace(minute=30),
+                                         start.replace(hour=2)]
+        poll_func = Mock(return_value=None)
+
+        with self.assertRaises(AssertionError) as error:
+            self.run_poll(poll_func, 1, 10)
+        self.assertEqual(str(error.exception), "Polling timed out")
+        self.assertEqual(poll_func.call_count, 2)
+
+    def test_should_wrap_poll_failures(self):
+        poll_func = Mock(side_effect=ValueError("bad status"))
+
+        with self.assertRaises(AssertionError) as error:
+            self.run_poll(poll_func, 1, 10)
+        self.assertIsInstance(error.exception.args[1], ValueError)
+
+
+class PollSchedulerTests(TestCase):
+
+    def test_should_wait_for_all_pollers(self):
+        with PollScheduler() as scheduler, patch("builtins.print"):
+            first = scheduler.submit(Mock(side_effect=[None, 1]), 1, 0)
+            second = scheduler.submit(Mock(return_value=2), 1, 0)
+
+            self.assertEqual(scheduler.wait([first, second]), [1, 2])
+
+    def test_should_fail_fast(self):
+        with PollScheduler() as scheduler, patch("builtins.print"):
+            slow = scheduler.submit(Mock(return_value=None), 1, 60)
+            failed = scheduler.submit(Mock(side_effect=ValueError()), 1, 0)
+
+            with self.assertRaises(AssertionError):
+                scheduler.wait([slow, failed])
+        self.assertTrue(slow.cancelled())
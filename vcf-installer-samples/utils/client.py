@@ -11,7 +11,6 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
-import requests
 from vmware.vcf_installer.v1.tokens.access_token_client import Refresh
 from vmware.vapi.security.client.security_context_filter import SecurityContextFilter
 from vmware.vapi.security.oauth import create_oauth_security_context
@@ -23,6 +22,7 @@ from vmware.vcf_installer_client import StubFactory
 from vmware.vapi.bindings.stub import ApiClient
 from vmware.vapi.lib.connect import get_requests_connector
 from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
+from utils.http_session import create_session
 
 
 class VcfInstallerStubFactory(StubFactory):
@@ -129,7 +129,7 @@ class VcfInstallerClient(ApiClient):
         :return: VCF Installer Client instance
         """
         if not session:
-            session = requests.Session()
+            session = create_session()
         session.verify = ca_certs
         self.session = session
 
@@ -169,7 +169,8 @@ def create_vcf_installer_client(server=None,
 
     :type  session: :class:`requests.Session`
     :param session: Requests HTTP session instance. If not specified,
-    then one is automatically created and used
+    then one with pooled keep-alive connections and retries of idempotent
+    requests is created and used, see utils.http_session.create_session
     :type  server: :class:`str`
     :param server: VCF Installer host name or IP address
     :type  username: :class:`str`
@@ -185,7 +186,7 @@ def create_vcf_installer_client(server=None,
     :rtype: :class:`VcfInstallerClient`
     :return: VCF Installer Client instance
     """
-    session = session or requests.Session()
+    session = session or create_session()
     return VcfInstallerClient(session=session,
                               server=server,
                               username=username,
@@ -10,7 +10,15 @@
 * WARRANTIES OR CONDITIONS OF MERCHANTABILITY, SATISFACTORY QUALITY,
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 from utils.misc_util import poll
+from utils.poll_scheduler import poll_async
 from vmware.vcf_installer.model_client import DepotAccount, DepotSettings, \
     BundleDownloadSpec, BundleUpdateSpec, ProductReleaseComponent, Error
 
@@ -18,6 +26,12 @@ DEFAULT_DEPOT_SYNC_TIMEOUT_MINS = 5
 DEFAULT_WAIT_BETWEEN_POLLS_DEPOT_SYNC_SEC = 5
 DEFAULT_POLL_DOWNLOAD_STATUS_TIMEOUT_HOURS = 24
 DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC = 60
+DEFAULT_MIN_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC = 5
+DEFAULT_PARALLEL_DOWNLOAD_STARTS = 8
+
+_MB = 1024 * 1024
+# Weight of the latest sample in the smoothed download throughput
+_THROUGHPUT_SMOOTHING = 0.3
 
 _BUNDLE_IMAGE_TYPE = "INSTALL"
 
@@ -58,11 +72,13 @@ def is_depot_synced(client):
 
 
 def force_sync_depot(client, timeout_in_mins=DEFAULT_DEPOT_SYNC_TIMEOUT_MINS,
-                     poll_interval_in_sec=DEFAULT_WAIT_BETWEEN_POLLS_DEPOT_SYNC_SEC):
+                     poll_interval_in_sec=DEFAULT_WAIT_BETWEEN_POLLS_DEPOT_SYNC_SEC, scheduler=None):
     """
     Sync the depot and wait until the operation is complete
     :param timeout_in_mins: Optional - if not provided will default to DEFAULT_DEPOT_SYNC_TIMEOUT_MINS
     :param poll_interval_in_sec: Optional - if not provided will default to DEFAULT_WAIT_BETWEEN_POLLS_DEPOT_SYNC_SEC
+    :type: scheduler: :class:`utils.poll_scheduler.PollScheduler`
+    :param scheduler: Optional - poll on the scheduler and return a future instead of blocking
     :return:
     """
 
@@ -72,7 +88,10 @@ def force_sync_depot(client, timeout_in_mins=DEFAULT_DEPOT_SYNC_TIMEOUT_MINS,
         return is_depot_synced(client)
 
     print("Polling depot sync")
-    return poll(poller, timeout_in_mins, poll_interval_in_sec)
+    timeout_in_hours = float(timeout_in_mins) / 60
+    if scheduler:
+        return scheduler.submit(poller, timeout_in_hours, float(poll_interval_in_sec))
+    return poll(poller, timeout_in_hours, float(poll_interval_in_sec))
 
 
 def get_latest_product_release_components(client, sku, release_version,
@@ -90,71 +109,46 @@ def get_latest_product_release_components(client, sku, release_version,
             comp.name in product_release_components_names_to_include]
 
 
-def start_bundles_download(client, release_components: ProductReleaseComponent):
+def start_bundles_download(client, release_components: ProductReleaseComponent,
+                           max_parallel_starts=DEFAULT_PARALLEL_DOWNLOAD_STARTS):
+    """
+    Starts the download of the latest bundles of the release components, in parallel.
+
+    :type: client: :class:`utils.client.VcfInstallerClient`
+    :param client: VCF Installer Client
+    :param release_components: components to download the bundles of
+    :param max_parallel_starts: maximum number of concurrent start requests
+    :return: the ids of the bundles being downloaded
+    """
+    orchestrator = BundleDownloadOrchestrator(client, None,
+                                              max_parallel_starts=max_parallel_starts)
+    return orchestrator.start(release_components)
+
+
+def _start_bundle_download(client, component_name, bundle_id):
     bundle_download_spec = BundleDownloadSpec()
     bundle_download_spec.download_now = True
     bundle_update_spec = BundleUpdateSpec()
     bundle_update_spec.bundle_download_spec = bundle_download_spec
 
-    bundle_ids_being_downloaded = []
-
-    for component in release_components:
-        latest = component.versions[0]
-
-        ids = [patch_bundle_info.id for patch_bundle_info in latest.artifacts.bundles]
-
-        for id in ids:
-            try:
-                client.v1.Bundles.start_bundle_download_by_id(id, bundle_update_spec)
-                bundle_ids_being_downloaded.append(id)
-            except Error as e:
-                err_code = e.error_code or (e._extra_fields.get(
-                    "errorCode").value if e._extra_fields.get(
-                    "errorCode") else None)
-
-                if err_code in _START_BUNDLE_DOWNLOAD_ERRORS_TO_IGNORE:
-                    print(
-                        "Not downloading bundle with name: '{}' and id: '{}' "
-                        "as download has already been initiated previously.".format(
-                            component.name, id))
-
-                    bundle_ids_being_downloaded.append(id)
-                else:
-                    print(
-                        "Failed to download bundle with name: '{}' and id: '{}'".format(
-                            component.name, id))
-
-                    raise e
-
-    return bundle_ids_being_downloaded
-
-
-def are_bundles_downloaded(client, bundle_ids_being_downloaded, release_version):
     try:
-        bundle_download_status_infos = client.v1.bundles.DownloadStatus.get_bundle_download_status(
-            release_version=release_version, image_type=_BUNDLE_IMAGE_TYPE)
-    except Exception as e:
-        print("Caught exception while retrieving download status", e)
-        return False
+        client.v1.Bundles.start_bundle_download_by_id(bundle_id, bundle_update_spec)
+    except Error as e:
+        err_code = e.error_code or (e._extra_fields.get(
+            "errorCode").value if e._extra_fields.get(
+            "errorCode") else None)
 
-    all_downloaded = True
-    for status_info in bundle_download_status_infos.elements:
-        if status_info.bundle_id in bundle_ids_being_downloaded:
-            if status_info.download_status == "FAILED":
-                raise AssertionError(
-                    "Failed to download bundle with id: {}".format(status_info.bundle_id))
-            elif status_info.download_status == "CANCELLED":
-                raise AssertionError(
-                    "Download bundle with id: {} has been cancelled.".format(status_info.bundle_id))
-            elif status_info.download_status != "SUCCESS":
-                all_downloaded = False
-                break
-
-    if all_downloaded:
-        print("All bundles have been successfully downloaded.")
-        return True
-    else:
-        return False
+        if err_code in _START_BUNDLE_DOWNLOAD_ERRORS_TO_IGNORE:
+            print(
+                "Not downloading bundle with name: '{}' and id: '{}' "
+                "as download has already been initiated previously.".format(
+                    component_name, bundle_id))
+        else:
+            print(
+                "Failed to download bundle with name: '{}' and id: '{}'".format(
+                    component_name, bundle_id))
+
+            raise e
 
 
 def poll_bundles_downloaded(
@@ -162,9 +156,12 @@ def poll_bundles_downloaded(
         bundle_ids_being_downloaded,
         release_version,
         poll_timeout_in_hours=DEFAULT_POLL_DOWNLOAD_STATUS_TIMEOUT_HOURS,
-        poll_interval_in_sec=DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC):
+        poll_interval_in_sec=DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC,
+        scheduler=None):
     """
     Polls until bundles are downloaded or timeout is reached in which case an exception is thrown.
+    Progress, throughput and ETA are printed on every poll, polls get more frequent
+    as the downloads near completion.
 
     :type: client: :class:`utils.client.VcfInstallerClient`
     :param client: VCF Installer Client
@@ -172,11 +169,223 @@ def poll_bundles_downloaded(
     :param release_version: release version of the bundles to check
     :param poll_timeout_in_hours: Optional - if not provided will default to
     :param poll_interval_in_sec: Optional - if not provided will default to DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC
+    :type: scheduler: :class:`utils.poll_scheduler.PollScheduler`
+    :param scheduler: Optional - poll on the scheduler and return a future instead of blocking
     :return:
     """
+    orchestrator = BundleDownloadOrchestrator(client, release_version,
+                                              max_poll_interval_in_sec=float(poll_interval_in_sec))
+    orchestrator.track(bundle_ids_being_downloaded)
+    print("Polling download status.")
+    return orchestrator.wait(float(poll_timeout_in_hours), scheduler)
 
-    def poller():
-        return are_bundles_downloaded(client, bundle_ids_being_downloaded, release_version)
 
-    print("Polling download status.")
-    return poll(poller, poll_timeout_in_hours, poll_interval_in_sec)
+class BundleDownloadOrchestrator:
+    """
+    Starts bundle downloads in parallel and waits for them, tracking the downloaded bytes,
+    throughput and ETA of every bundle.
+
+    With a state file the progress is persisted after every poll, so that a restarted process
+    skips the bundles already downloaded and resumes waiting for the others.
+
+    Usage:
+        orchestrator = BundleDownloadOrchestrator(client, release_version,
+                                                  state_file="bundles-state.json")
+        orchestrator.start(release_components)
+        orchestrator.wait()
+    """
+
+    def __init__(self, client, release_version, state_file=None,
+                 max_parallel_starts=DEFAULT_PARALLEL_DOWNLOAD_STARTS,
+                 min_poll_interval_in_sec=DEFAULT_MIN_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC,
+                 max_poll_interval_in_sec=DEFAULT_WAIT_BETWEEN_POLLS_DOWNLOAD_STATUS_SEC):
+        """
+        :type: client: :class:`utils.client.VcfInstallerClient`
+        :param client: VCF Installer Client
+        :param release_version: release version of the bundles
+        :param state_file: Optional - path of a JSON file persisting the download progress
+        :param max_parallel_starts: maximum number of concurrent start and size requests
+        :param min_poll_interval_in_sec: poll interval once the downloads are about to complete
+        :param max_poll_interval_in_sec: poll interval while the ETA is unknown or far away
+        """
+        self.client = client
+        self.release_version = release_version
+        self.state_file = state_file
+        self.max_parallel_starts = max_parallel_starts
+        self.min_poll_interval_in_sec = min_poll_interval_in_sec
+        self.max_poll_interval_in_sec = max_poll_interval_in_sec
+        # bundle id -> dict of component, status, size, downloaded, throughput
+        self.bundles = {}
+        self._eta_sec = None
+        self._load_state()
+
+    def start(self, release_components):
+        """
+        Starts the download of the latest bundles of the release components, skipping the
+        bundles already downloaded according to the state file.
+        :return: the ids of the bundles being downloaded
+        """
+        to_start = []
+        for component in release_components:
+            latest = component.versions[0]
+            for patch_bundle_info in latest.artifacts.bundles:
+                bundle = self._bundle(patch_bundle_info.id, component.name)
+                if bundle["status"] != "SUCCESS":
+                    to_start.append((component.name, patch_bundle_info.id))
+
+        if to_start:
+            with ThreadPoolExecutor(max_workers=self.max_parallel_starts) as executor:
+                starts = [executor.submit(_start_bundle_download, self.client, name, bundle_id)
+                          for (name, bundle_id) in to_start]
+                for start in starts:
+                    start.result()
+            self._save_state()
+        return list(self.bundles)
+
+    def track(self, bundle_ids):
+        """
+        Tracks bundles whose download has been started already.
+        """
+        for bundle_id in bundle_ids:
+            self._bundle(bundle_id)
+
+    def wait(self, timeout_in_hours=DEFAULT_POLL_DOWNLOAD_STATUS_TIMEOUT_HOURS, scheduler=None):
+        """
+        Polls until all the tracked bundles are downloaded or timeout is reached, in which case
+        an exception is thrown. Also throws when a download failed or was cancelled.
+        :type: scheduler: :class:`utils.poll_scheduler.PollScheduler`
+        :param scheduler: Optional - poll on the scheduler and return a future instead of blocking
+        :return: True, or a future of it with a scheduler
+        """
+        self._fetch_sizes()
+        args = (self._poller, timeout_in_hours, self.min_poll_interval_in_sec,
+                self.max_poll_interval_in_sec, 1.0, self._next_poll_interval)
+        if scheduler:
+            return scheduler.submit(*args)
+        return asyncio.run(poll_async(*args))
+
+    def _poller(self):
+        try:
+            done, self._eta_sec = self._poll()
+        except AssertionError:
+            raise
+        except Exception as e:
+            print("Caught exception while retrieving download status", e)
+            self._eta_sec = None
+            return None
+        if done:
+            print("All bundles have been successfully downloaded.")
+            return True
+        return None
+
+    def _bundle(self, bundle_id, component_name=None):
+        bundle = self.bundles.setdefault(bundle_id, {
+            "component": component_name, "status": None, "size": None,
+            "downloaded": 0, "throughput": None})
+        if component_name:
+            bundle["component"] = component_name
+        return bundle
+
+    def _fetch_sizes(self):
+        """
+        Retrieves the sizes of the bundles, needed for the ETA, in parallel
+        """
+        bundle_ids = [bundle_id for bundle_id, bundle in self.bundles.items()
+                      if bundle["size"] is None and bundle["status"] != "SUCCESS"]
+        if not bundle_ids:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_parallel_starts) as executor:
+            sizes = executor.map(self._get_bundle_size, bundle_ids)
+            for bundle_id, size in zip(bundle_ids, sizes):
+                self.bundles[bundle_id]["size"] = size
+
+    def _get_bundle_size(self, bundle_id):
+        try:
+            size_mb = self.client.v1.Bundles.get_bundle(bundle_id).size_mb
+        except Exception as e:
+            print("Unable to retrieve the size of bundle with id: {}".format(bundle_id), e)
+            return None
+        return int(size_mb * _MB) if size_mb else None
+
+    def _poll(self):
+        """
+        Updates the progress of the bundles from one download status request
+        :return: whether all bundles are downloaded, and the ETA in seconds if known
+        """
+        status_infos = self.client.v1.bundles.DownloadStatus.get_bundle_download_status(
+            release_version=self.release_version, image_type=_BUNDLE_IMAGE_TYPE).elements
+        now = time.time()
+        failures = []
+        for status_info in status_infos or []:
+            bundle = self.bundles.get(status_info.bundle_id)
+            if bundle is None:
+                continue
+            downloaded = status_info.downloaded_size or 0
+            last_poll = bundle.get("polled_at")
+            if last_poll and downloaded > bundle["downloaded"]:
+                rate = (downloaded - bundle["downloaded"]) / (now - last_poll)
+                bundle["throughput"] = rate if bundle["throughput"] is None else (
+                    _THROUGHPUT_SMOOTHING * rate +
+                    (1 - _THROUGHPUT_SMOOTHING) * bundle["throughput"])
+            bundle["downloaded"] = downloaded
+            bundle["polled_at"] = now
+            bundle["status"] = status_info.download_status
+            if status_info.download_status in ("FAILED", "CANCELLED"):
+                failures.append("{} ({}{})".format(
+                    status_info.bundle_id, status_info.download_status,
+                    ": " + status_info.message if status_info.message else ""))
+        self._save_state()
+        if failures:
+            raise AssertionError("Failed to download bundles: {}".format(", ".join(failures)))
+
+        pending = [bundle for bundle in self.bundles.values() if bundle["status"] != "SUCCESS"]
+        eta = self._eta(pending)
+        self._print_progress(pending, eta)
+        return not pending, eta
+
+    @staticmethod
+    def _eta(pending):
+        remaining = 0
+        throughput = 0
+        for bundle in pending:
+            if bundle["size"] is None or not bundle["throughput"]:
+                return None
+            remaining += max(bundle["size"] - bundle["downloaded"], 0)
+            throughput += bundle["throughput"]
+        return remaining / throughput if throughput else None
+
+    def _next_poll_interval(self):
+        if self._eta_sec is None:
+            return self.max_poll_interval_in_sec
+        # Poll a few times during the remaining time, to notice completion quickly
+        return self._eta_sec / 4
+
+    def _print_progress(self, pending, eta):
+        downloaded = sum(bundle["downloaded"] for bundle in self.bundles.values())
+        throughput = sum(bundle["throughput"] or 0 for bundle in pending)
+        print("Bundles downloaded: {}/{}, {:.0f} MB at {:.1f} MB/s, ETA: {}".format(
+            len(self.bundles) - len(pending), len(self.bundles), downloaded / _MB,
+            throughput / _MB, timedelta(seconds=int(eta)) if eta is not None else "unknown"))
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, "r") as file:
+            state = json.load(file)
+        if state.get("release_version") != self.release_version:
+            print("Ignoring the download state in '{}' of release {}.".format(
+                self.state_file, state.get("release_version")))
+            return
+        self.bundles = state["bundles"]
+        for bundle in self.bundles.values():
+            # Throughput samples of a previous process are not comparable
+            bundle.pop("polled_at", None)
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        tmp_file = "{}.tmp".format(self.state_file)
+        with open(tmp_file, "w") as file:
+            json.dump({"release_version": self.release_version, "bundles": self.bundles},
+                      file, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
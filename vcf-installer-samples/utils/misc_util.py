@@ -11,9 +11,10 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
+import asyncio
 import re
-import time
-from datetime import datetime, timedelta
+
+from utils.poll_scheduler import poll_async
 
 
 def get_version_without_build_number(client):
@@ -34,32 +35,20 @@ def get_version_without_build_number(client):
     return version_without_build
 
 
-def poll(poll_func, max_timeout, poll_interval):
+def poll(poll_func, max_timeout, poll_interval, max_interval=None, backoff=1.0):
     """
-    Generic polling function to wait a condition to be met
+    Generic polling function to wait a condition to be met.
+    Use utils.poll_scheduler.PollScheduler to wait for several conditions at the same time.
     :param poll_func: function that calls the respective API to evaluate if polling should complete.
                     Returns a result when done. Returns None while not ready.
                     Throws an Exception in case the expected resource failed.
     :param max_timeout: maximum time to wait the respective condition (in hours)
     :param poll_interval: how often to call poll_func (in seconds)
+    :param max_interval: Optional - upper bound of the poll interval when backing off (in seconds)
+    :param backoff: Optional - factor applied to the poll interval after every poll that is not ready
     :return: the result of poll_func if polled successfully
     """
-    start_time = datetime.now()
-    timeout_time = start_time + timedelta(hours=max_timeout)
-    timed_out = False
-    try:
-        while not timed_out:
-            result = poll_func()
-            if result:
-                overall_time = (datetime.now() - start_time).total_seconds()/60.0
-                print("Overall Time Taken in mins: {:.2f}".format(overall_time))
-                return result
-            time.sleep(poll_interval)
-            timed_out = datetime.now() > timeout_time
-    except Exception as e:
-        raise AssertionError("Polling failed due to error.", e)
-
-    raise AssertionError("Polling timed out")
+    return asyncio.run(poll_async(poll_func, max_timeout, poll_interval, max_interval, backoff))
 
 
 def parse_bool_or_str(value):
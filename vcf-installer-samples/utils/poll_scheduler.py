@@ -0,0 +1,137 @@
+"""
+* *******************************************************
+* Copyright (c) 2025 Broadcom. All rights reserved.
+* The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+* *******************************************************
+*
+* DISCLAIMER. THIS PROGRAM IS PROVIDED TO YOU "AS IS" WITHOUT
+* WARRANTIES OR CONDITIONS OF ANY KIND, WHETHER ORAL OR WRITTEN,
+* EXPRESS OR IMPLIED. THE AUTHOR SPECIFICALLY DISCLAIMS ANY IMPLIED
+* WARRANTIES OR CONDITIONS OF MERCHANTABILITY, SATISFACTORY QUALITY,
+* NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from datetime import datetime, timedelta
+
+DEFAULT_MAX_WORKERS = 4
+
+
+async def poll_async(poll_func, max_timeout, min_interval, max_interval=None, backoff=1.0,
+                     interval_func=None, executor=None):
+    """
+    Polls until poll_func returns a result, sleeping on the event loop between the polls.
+    :param poll_func: function that calls the respective API to evaluate if polling should complete.
+                    Returns a result when done. Returns None while not ready.
+                    Throws an Exception in case the expected resource failed.
+                    It is a blocking call and runs in the executor.
+    :param max_timeout: maximum time to wait the respective condition (in hours)
+    :param min_interval: seconds before the second poll, and lower bound of the intervals
+    :param max_interval: upper bound of the seconds between two polls, defaults to min_interval
+    :param backoff: factor applied to the interval after every poll that is not ready
+    :param interval_func: Optional - called after every poll that is not ready, returns the
+                    seconds to wait before the next poll, or None to apply the backoff
+    :param executor: executor running poll_func, the default executor of the loop if None
+    :return: the result of poll_func if polled successfully
+    """
+    loop = asyncio.get_running_loop()
+    max_interval = max(max_interval or min_interval, min_interval)
+    start_time = datetime.now()
+    timeout_time = start_time + timedelta(hours=max_timeout)
+    interval = min_interval
+    try:
+        while True:
+            result = await loop.run_in_executor(executor, poll_func)
+            if result:
+                overall_time = (datetime.now() - start_time).total_seconds() / 60.0
+                print("Overall Time Taken in mins: {:.2f}".format(overall_time))
+                return result
+            if datetime.now() > timeout_time:
+                break
+            next_interval = interval_func() if interval_func else None
+            if next_interval is None:
+                next_interval = interval
+                interval = min(interval * backoff, max_interval)
+            await asyncio.sleep(min(max(next_interval, min_interval), max_interval))
+    except Exception as e:
+        raise AssertionError("Polling failed due to error.", e)
+
+    raise AssertionError("Polling timed out")
+
+
+class PollScheduler:
+    """
+    Runs many pollers on a single event loop thread.
+
+    Waiting between polls costs no thread, only the blocking API calls of the pollers run on a
+    small thread pool. Each poller has its own interval bounds and backoff, and resolves a future
+    once done.
+
+    Usage:
+        with PollScheduler() as scheduler:
+            sync = scheduler.submit(depot_synced, 0.1, 5)
+            validation = scheduler.submit(validation_done, 3, 10, 60, 1.5)
+            scheduler.wait([sync, validation])
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        :param max_workers: maximum number of poll functions running at the same time
+        """
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="poller")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="poll-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, poll_func, max_timeout, min_interval, max_interval=None, backoff=1.0,
+               interval_func=None):
+        """
+        Starts polling, see poll_async for the parameters.
+        :return: a concurrent.futures.Future resolved with the result of poll_func, or failed with
+        an AssertionError. Use asyncio.wrap_future to await it from another event loop.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            poll_async(poll_func, max_timeout, min_interval, max_interval, backoff,
+                       interval_func, self._executor),
+            self._loop)
+
+    def wait(self, futures):
+        """
+        Waits for the given futures, failing fast on the first failed poller
+        :return: the results in the order of the futures
+        """
+        futures = list(futures)
+        done, _ = concurrent.futures.wait(futures,
+                                          return_when=concurrent.futures.FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Stops the event loop. Pollers still running are cancelled.
+        """
+        if self._loop.is_closed():
+            return
+
+        async def cancel_pollers():
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+        asyncio.run_coroutine_threadsafe(cancel_pollers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown()
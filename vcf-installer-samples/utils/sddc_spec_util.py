@@ -18,7 +18,7 @@ from ipaddress import ip_address
 from vmware.vcf_installer import model_client
 from vmware.vcf_installer.model_client import IpRange, \
     VcfOperationsDiscoverySpec, VcfAutomationNodeInfo
-from utils.ssl_helper import get_ssl_cert_thumbprint
+from utils.ssl_helper import get_ssl_cert_thumbprint, get_ssl_cert_thumbprints
 
 WorkflowType = Enum("WorkflowType", ["VCF", "VVF"])
 VERSION = "9.0.0.0"
@@ -68,21 +68,27 @@ def hostname_to_fqdn(hostname, dns_domain):
     return hostname.strip()
 
 
-def get_hosts_to_thumbprint(host_fqdn_to_thumbprint, dns_domain, ca_certs):
+def get_hosts_to_thumbprint(host_fqdn_to_thumbprint, dns_domain, ca_certs,
+                            thumbprint_cache_file=None):
     host_fqdn_to_thumbprint_dict = {}
     if not host_fqdn_to_thumbprint:
         for i in range(0, _NUMBER_OF_HOSTS):
             host_fqdn = _BASE_ESX_FQDN.format(i + 1, dns_domain)
-            host_fqdn_to_thumbprint_dict[host_fqdn] = get_ssl_cert_thumbprint(host_fqdn, ca_certs)
+            host_fqdn_to_thumbprint_dict[host_fqdn] = None
     else:
         host_fqdn_to_thumbprint_pairs = host_fqdn_to_thumbprint.split(",")
         for pair in host_fqdn_to_thumbprint_pairs:
             fqdn_thumbprint_pair = pair.split("=")
             host_fqdn = hostname_to_fqdn(fqdn_thumbprint_pair[0], dns_domain)
-            if fqdn_thumbprint_pair and len(fqdn_thumbprint_pair) < 2:
-                fqdn_thumbprint_pair.append(
-                    get_ssl_cert_thumbprint(host_fqdn, ca_certs))
-            host_fqdn_to_thumbprint_dict[host_fqdn] = fqdn_thumbprint_pair[1]
+            host_fqdn_to_thumbprint_dict[host_fqdn] = \
+                fqdn_thumbprint_pair[1] if len(fqdn_thumbprint_pair) > 1 else None
+
+    # Hosts without a given thumbprint are contacted concurrently
+    missing_fqdns = [fqdn for (fqdn, thumbprint) in host_fqdn_to_thumbprint_dict.items()
+                     if not thumbprint]
+    if missing_fqdns:
+        host_fqdn_to_thumbprint_dict.update(get_ssl_cert_thumbprints(
+            missing_fqdns, ca_certs, cache_file=thumbprint_cache_file))
     return host_fqdn_to_thumbprint_dict
 
 
@@ -18,20 +18,21 @@ _VALIDATION_STATUS_IN_PROGRESS = "IN_PROGRESS"
 _DEPLOYMENT_STATUS_COMPLETED_WITH_SUCCESS = "COMPLETED_WITH_SUCCESS"
 _DEPLOYMENT_STATUS_COMPLETED_WITH_FAILURE = "COMPLETED_WITH_FAILURE"
 
-_DEFAULT_POLL_INTERVAL = 60
+# Validations complete within minutes, deployments within hours: the polls start quickly and back
+# off to the previous fixed interval of 60 seconds, respectively to 2 minutes
+VALIDATION_POLL_INTERVALS = (10, 60, 1.5)
+DEPLOYMENT_POLL_INTERVALS = (30, 120, 1.5)
 
 
-def poll_sddc_validation_status(client, validation_id, timeout):
+def sddc_validation_poller(client, validation_id):
     """
-    Poll the validation status.
+    Create the poll function of a validation, for utils.misc_util.poll or a
+    utils.poll_scheduler.PollScheduler.
 
     :type: client: :class:`utils.client.VcfInstallerClient`
     :param client: VCF Installer Client
     :param validation_id: id of validation
-    :param timeout: time to poll before giving up (in hours)
-    :return: retrieved validation if it is successful or `None` if still in progress
-    :rtype: :class:`vmware.vcf_installer.model_client.Validation`
-    :raises AssertionError: If validation fails or a timeout is hit.
+    :return: function returning the validation if it is successful or `None` if still in progress
     """
     def poller():
         validation = client.v1.sddcs.Validations.get_sddc_spec_validation(validation_id)
@@ -45,20 +46,18 @@ def poll_sddc_validation_status(client, validation_id, timeout):
         else:
             return None
 
-    return poll(poller, timeout, _DEFAULT_POLL_INTERVAL)
+    return poller
 
 
-def poll_sddc_deployment_status(client, sddc_task_id, timeout):
+def sddc_deployment_poller(client, sddc_task_id):
     """
-    Poll the SDDC deployment task status.
+    Create the poll function of an SDDC deployment task, for utils.misc_util.poll or a
+    utils.poll_scheduler.PollScheduler.
 
     :type: client: :class:`utils.client.VcfInstallerClient`
     :param client: VCF Installer Client
     :param sddc_task_id: id of sddc deployment task
-    :param timeout: time to poll before giving up (in hours)
-    :return: the retrieved task if it is successful or `None` if still in progress
-    :rtype: :class:`vmware.vcf_installer.model_client.SddcTask`
-    :raises AssertionError: If validation fails or a timeout is hit.
+    :return: function returning the task if it is successful or `None` if still in progress
     """
     def poller():
         task = client.v1.Sddcs.get_sddc_task_by_id(sddc_task_id)
@@ -71,4 +70,44 @@ def poll_sddc_deployment_status(client, sddc_task_id, timeout):
         else:
             return None
 
-    return poll(poller, timeout, _DEFAULT_POLL_INTERVAL)
+    return poller
+
+
+def poll_sddc_validation_status(client, validation_id, timeout, scheduler=None):
+    """
+    Poll the validation status.
+
+    :type: client: :class:`utils.client.VcfInstallerClient`
+    :param client: VCF Installer Client
+    :param validation_id: id of validation
+    :param timeout: time to poll before giving up (in hours)
+    :type: scheduler: :class:`utils.poll_scheduler.PollScheduler`
+    :param scheduler: Optional - poll on the scheduler and return a future instead of blocking
+    :return: retrieved validation if it is successful, or a future of it with a scheduler
+    :rtype: :class:`vmware.vcf_installer.model_client.Validation`
+    :raises AssertionError: If validation fails or a timeout is hit.
+    """
+    poller = sddc_validation_poller(client, validation_id)
+    if scheduler:
+        return scheduler.submit(poller, timeout, *VALIDATION_POLL_INTERVALS)
+    return poll(poller, timeout, *VALIDATION_POLL_INTERVALS)
+
+
+def poll_sddc_deployment_status(client, sddc_task_id, timeout, scheduler=None):
+    """
+    Poll the SDDC deployment task status.
+
+    :type: client: :class:`utils.client.VcfInstallerClient`
+    :param client: VCF Installer Client
+    :param sddc_task_id: id of sddc deployment task
+    :param timeout: time to poll before giving up (in hours)
+    :type: scheduler: :class:`utils.poll_scheduler.PollScheduler`
+    :param scheduler: Optional - poll on the scheduler and return a future instead of blocking
+    :return: the retrieved task if it is successful, or a future of it with a scheduler
+    :rtype: :class:`vmware.vcf_installer.model_client.SddcTask`
+    :raises AssertionError: If validation fails or a timeout is hit.
+    """
+    poller = sddc_deployment_poller(client, sddc_task_id)
+    if scheduler:
+        return scheduler.submit(poller, timeout, *DEPLOYMENT_POLL_INTERVALS)
+    return poll(poller, timeout, *DEPLOYMENT_POLL_INTERVALS)
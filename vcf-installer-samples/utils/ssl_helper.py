@@ -11,15 +11,29 @@
 * NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
 """
 
+import calendar
+import json
 import os
 import socket
 import ssl
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.misc_util import parse_bool_or_str
 
+try:
+    from cryptography import x509
+except ImportError:
+    # Without cryptography the cert expiry is unknown and cached
+    # thumbprints expire after _CACHE_MAX_AGE instead
+    x509 = None
 
-def get_ssl_cert_thumbprint(fqdn, ca_certs=True):
+_HTTPS_PORT = 443
+_CACHE_MAX_AGE = 24 * 60 * 60
+
+
+def get_ssl_cert_thumbprint(fqdn, ca_certs=True, timeout=None):
     """
     Obtain an arbitrary server's SSL certificate thumbprint
     :param fqdn: resolvable host name
@@ -27,33 +41,131 @@ def get_ssl_cert_thumbprint(fqdn, ca_certs=True):
         To pass custom CA provide absolute path to the file/folder
         containing CA certs to use for SSL verifications.
         Pass False to disable SSL verifications (NOT RECOMMENDED)
+    :param timeout: connect and handshake timeout in seconds, None to wait
+        for the system default
     :return: sha-256 thumbprint in 00:00:... format
     """
+    der = _get_server_cert((fqdn, _HTTPS_PORT), ca_certs, timeout)
+    return _thumbprint(der)
+
+
+def get_ssl_cert_thumbprints(fqdns, ca_certs=True, timeout=10, max_workers=16,
+                             cache_file=None):
+    """
+    Obtain the SSL certificate thumbprints of many servers concurrently
+    :param fqdns: resolvable host names
+    :param ca_certs: see get_ssl_cert_thumbprint
+    :param timeout: connect and handshake timeout per server in seconds
+    :param max_workers: maximum number of concurrent TLS handshakes
+    :param cache_file: optional path of a JSON file caching the verified
+        thumbprints until the respective certificate expires, for one day at
+        most. Servers with a thumbprint cached for the same ca_certs are not
+        contacted. Thumbprints obtained without verification are never cached.
+    :return: dict of fqdn to sha-256 thumbprint in 00:00:... format
+    """
     ca_certs = parse_bool_or_str(ca_certs)
-    if not ca_certs:
-        # obtain cert without any verification
-        pem = ssl.get_server_certificate((fqdn, 443))
-    else:
-        pem = _get_valid_server_cert((fqdn, 443), ca_certs)
+    cache = _load_thumbprint_cache(cache_file)
+    now = time.time()
+    thumbprints = {}
+    to_fetch = []
+    for fqdn in fqdns:
+        entry = cache.get(_cache_key(fqdn, ca_certs)) if ca_certs else None
+        if entry and entry["expires"] > now:
+            thumbprints[fqdn] = entry["thumbprint"]
+        elif fqdn not in to_fetch:
+            to_fetch.append(fqdn)
+
+    if to_fetch:
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(to_fetch))) as executor:
+            futures = {fqdn: executor.submit(_get_server_cert, (fqdn, _HTTPS_PORT),
+                                             ca_certs, timeout)
+                       for fqdn in to_fetch}
+            for fqdn, future in futures.items():
+                try:
+                    der = future.result()
+                except Exception as e:
+                    errors[fqdn] = e
+                    continue
+                thumbprints[fqdn] = _thumbprint(der)
+                if ca_certs:
+                    cache[_cache_key(fqdn, ca_certs)] = {
+                        "thumbprint": thumbprints[fqdn],
+                        "expires": min(_get_cert_expiry(der, now), now + _CACHE_MAX_AGE)}
+        if cache_file and ca_certs:
+            _save_thumbprint_cache(cache_file, cache)
+        if errors:
+            raise AssertionError("Unable to obtain the SSL certificate thumbprint of {}".format(
+                ", ".join("{} ({})".format(fqdn, e) for fqdn, e in errors.items())))
+
+    return {fqdn: thumbprints[fqdn] for fqdn in fqdns}
 
-    der = ssl.PEM_cert_to_DER_cert(pem)
+
+def _thumbprint(der):
     sha = hashlib.sha256(der)
     return ":".join(["{:02X}".format(b) for b in sha.digest()])
 
 
-def _get_valid_server_cert(addr, ca_certs):
-    context = ssl.create_default_context()  # use default CA
-
-    if isinstance(ca_certs, str):
+def _get_server_cert(addr, ca_certs, timeout=None):
+    """
+    Returns the DER encoded certificate of the server, verified against
+    ca_certs unless it is False
+    """
+    ca_certs = parse_bool_or_str(ca_certs)
+    if not ca_certs:
+        # obtain cert without any verification
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(ca_certs, str):
         if os.path.isdir(ca_certs):
             # use CA certs dir
             context = ssl.create_default_context(capath=ca_certs)
         else:
             # use CA certs file
             context = ssl.create_default_context(cafile=ca_certs)
+    else:
+        context = ssl.create_default_context()  # use default CA
 
     host, port = addr
-    with socket.create_connection(addr) as sock:
+    with socket.create_connection(addr, timeout=timeout) as sock:
         with context.wrap_socket(sock, server_hostname=host) as ssock:
             ssock.do_handshake()
-            return ssock.getpeercert()
+            return ssock.getpeercert(binary_form=True)
+
+
+def _cache_key(fqdn, ca_certs):
+    # A thumbprint verified against custom CA certs is not reused for the
+    # default CA and the other way around
+    return "{}|{}".format(fqdn, ca_certs if isinstance(ca_certs, str) else "default")
+
+
+def _get_cert_expiry(der, now):
+    if x509 is None:
+        return now + _CACHE_MAX_AGE
+    cert = x509.load_der_x509_certificate(der)
+    try:
+        return cert.not_valid_after_utc.timestamp()
+    except AttributeError:
+        # cryptography < 42, not_valid_after is a naive datetime in UTC
+        return calendar.timegm(cert.not_valid_after.utctimetuple())
+
+
+def _load_thumbprint_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r") as file:
+            return json.load(file)
+    except ValueError:
+        print("Ignoring the invalid thumbprint cache file '{}'.".format(cache_file))
+        return {}
+
+
+def _save_thumbprint_cache(cache_file, cache):
+    # Replace the file at once, so that concurrent readers never see a
+    # partially written cache
+    tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    with open(tmp_file, "w") as file:
+        json.dump(cache, file, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
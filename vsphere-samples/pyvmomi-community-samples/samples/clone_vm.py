@@ -6,23 +6,19 @@ Email: dannbohn@gmail.com
 
 Clone a VM from template example
 """
-from pyVmomi import vim
-from tools import cli, service_instance, pchelper
+from pyVmomi import vim, vmodl
+from tools import cli, service_instance, pchelper, tasks
 
 from add_nic_to_vm import add_nic
 
 
 def wait_for_task(task):
     """ wait for a vCenter task to finish """
-    task_done = False
-    while not task_done:
-        if task.info.state == 'success':
-            return task.info.result
-
-        if task.info.state == 'error':
-            print("there was an error")
-            print(task.info.error)
-            task_done = True
+    try:
+        return tasks.wait_for_task(task)
+    except vmodl.MethodFault as error:
+        print("there was an error")
+        print(error)
 
 
 def clone_vm(
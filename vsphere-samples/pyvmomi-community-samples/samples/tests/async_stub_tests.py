@@ -0,0 +1,108 @@
+import asyncio
+from unittest import TestCase
+
+from pyVmomi import vim
+from pyVmomi.SoapAdapter import SoapStubAdapter
+
+from samples.tools.async_stub import AsyncSoapStubAdapter
+
+ENVELOPE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soapenv:Envelope '
+    'xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    'xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<soapenv:Body>%s</soapenv:Body></soapenv:Envelope>')
+
+CURRENT_TIME = ENVELOPE % (
+    '<CurrentTimeResponse xmlns="urn:vim25">'
+    '<returnval>2024-01-01T00:00:00Z</returnval></CurrentTimeResponse>')
+
+FAULT = ENVELOPE % (
+    '<soapenv:Fault><faultcode>ServerFaultCode</faultcode>'
+    '<faultstring>denied</faultstring><detail>'
+    '<NoPermissionFault xmlns="urn:vim25" xsi:type="NoPermission">'
+    '<privilegeId>System.View</privilegeId></NoPermissionFault>'
+    '</detail></soapenv:Fault>')
+
+
+class FakeSoapServer(object):
+
+    def __init__(self, status=200, body=CURRENT_TIME, chunked=False):
+        self.status = status
+        self.body = body.encode()
+        self.chunked = chunked
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        while True:
+            length = 0
+            line = await reader.readline()
+            if not line:
+                break
+            while line not in (b'\r\n', b''):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+                line = await reader.readline()
+            await reader.readexactly(length)
+            self.requests += 1
+            await asyncio.sleep(0.01)
+            head = 'HTTP/1.1 %d OK\r\nSet-Cookie: vmware_soap_session="s1"\r\n' \
+                % self.status
+            if self.chunked:
+                half = len(self.body) // 2
+                body = b''.join(b'%x\r\n%s\r\n' % (len(part), part)
+                                for part in (self.body[:half],
+                                             self.body[half:]))
+                writer.write((head + 'Transfer-Encoding: chunked\r\n\r\n')
+                             .encode() + body + b'0\r\n\r\n')
+            else:
+                writer.write((head + 'Content-Length: %d\r\n\r\n'
+                              % len(self.body)).encode() + self.body)
+            await writer.drain()
+        writer.close()
+
+
+class AsyncSoapStubAdapterTests(TestCase):
+
+    def run_calls(self, server, calls, pool_size=4):
+        async def scenario():
+            listener = await asyncio.start_server(server.handle, '127.0.0.1',
+                                                  0)
+            port = listener.sockets[0].getsockname()[1]
+            stub = SoapStubAdapter(host='127.0.0.1', port=-port)
+            adapter = AsyncSoapStubAdapter(stub, pool_size=pool_size)
+            si = vim.ServiceInstance('ServiceInstance', adapter)
+            try:
+                return await asyncio.gather(
+                    *[si.CurrentTime() for _ in range(calls)],
+                    return_exceptions=True), stub
+            finally:
+                await adapter.close()
+                listener.close()
+                await listener.wait_closed()
+        return asyncio.run(scenario())
+
+    def test_should_run_calls_concurrently_on_pooled_connections(self):
+        server = FakeSoapServer()
+
+        results, stub = self.run_calls(server, 20, pool_size=4)
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0].year, 2024)
+        self.assertEqual(server.requests, 20)
+        self.assertLessEqual(server.connections, 4)
+        self.assertEqual(stub.cookie, 'vmware_soap_session="s1"')
+
+    def test_should_read_chunked_responses(self):
+        results, _ = self.run_calls(FakeSoapServer(chunked=True), 2)
+
+        self.assertEqual([result.year for result in results], [2024, 2024])
+
+    def test_should_raise_server_faults(self):
+        results, _ = self.run_calls(FakeSoapServer(500, FAULT), 1)
+
+        self.assertIsInstance(results[0], vim.fault.NoPermission)
+        self.assertEqual(results[0].privilegeId, 'System.View')
@@ -0,0 +1,126 @@
+import threading
+from unittest import TestCase
+from mock import Mock, patch
+
+from pyVmomi import vim, vmodl
+
+from samples.tools.inventory_cache import InventoryCache
+
+
+def make_update(version, object_updates, truncated=False):
+    filter_update = vmodl.query.PropertyCollector.FilterUpdate(
+        objectSet=object_updates)
+    return vmodl.query.PropertyCollector.UpdateSet(
+        version=version, filterSet=[filter_update], truncated=truncated)
+
+
+def make_object_update(moref, kind, changes=()):
+    change_set = [vmodl.query.PropertyCollector.Change(name=name, op=op,
+                                                       val=val)
+                  for name, op, val in changes]
+    return vmodl.query.PropertyCollector.ObjectUpdate(
+        obj=moref, kind=kind, changeSet=change_set)
+
+
+class InventoryCacheTests(TestCase):
+
+    def setUp(self):
+        self.si = Mock()
+        content = self.si.content
+        content.viewManager.CreateContainerView.return_value = \
+            vim.view.ContainerView('session[1]view-1')
+        self.collector = \
+            content.propertyCollector.CreatePropertyCollector.return_value
+        self.vm1 = vim.VirtualMachine('vm-1')
+        self.vm2 = vim.VirtualMachine('vm-2')
+        self.collector.WaitForUpdatesEx.side_effect = [
+            make_update('1', [
+                make_object_update(self.vm1, 'enter', [
+                    ('name', 'assign', 'web'),
+                    ('config.uuid', 'assign', 'uuid-1')])],
+                truncated=True),
+            make_update('2', [
+                make_object_update(self.vm2, 'enter', [
+                    ('name', 'assign', 'db'),
+                    ('config.uuid', 'assign', 'uuid-2')])]),
+        ]
+        self.cache = InventoryCache(self.si, [vim.VirtualMachine],
+                                    path_set=['config.uuid'])
+
+    def test_should_load_initial_snapshot(self):
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.find_by_name('web'), self.vm1)
+        self.assertEqual(self.cache.find_by_uuid('uuid-2'), self.vm2)
+        self.assertEqual(self.cache.path_set, ['name', 'config.uuid'])
+
+    def test_should_page_through_truncated_updates_without_waiting(self):
+        calls = self.collector.WaitForUpdatesEx.call_args_list
+        self.assertEqual([call[0][0] for call in calls], ['', '1'])
+        self.assertEqual(calls[1][0][1].maxWaitSeconds, 0)
+
+    def test_should_reindex_on_rename(self):
+        self.collector.WaitForUpdatesEx.side_effect = [
+            make_update('3', [make_object_update(self.vm1, 'modify', [
+                ('name', 'assign', 'web-renamed')])])]
+
+        self.assertTrue(self.cache.update())
+
+        self.assertIsNone(self.cache.find_by_name('web'))
+        self.assertEqual(self.cache.find_by_name('web-renamed'), self.vm1)
+        self.assertEqual(self.cache.get_properties(self.vm1)['config.uuid'],
+                         'uuid-1')
+
+    def test_should_drop_objects_that_leave(self):
+        self.collector.WaitForUpdatesEx.side_effect = [
+            make_update('3', [make_object_update(self.vm2, 'leave')])]
+
+        self.cache.update()
+
+        self.assertNotIn(self.vm2, self.cache)
+        self.assertIsNone(self.cache.find_by_name('db'))
+        self.assertIsNone(self.cache.find_by_uuid('uuid-2'))
+
+    @patch('samples.tools.inventory_cache.logging')
+    def test_should_refetch_on_invalid_collector_version(self, logging):
+        vm3 = vim.VirtualMachine('vm-3')
+        self.collector.WaitForUpdatesEx.side_effect = [
+            vmodl.query.InvalidCollectorVersion(),
+            make_update('1', [make_object_update(self.vm2, 'enter', [
+                ('name', 'assign', 'db')])], truncated=True),
+            make_update('2', [make_object_update(vm3, 'enter', [
+                ('name', 'assign', 'app')])])]
+
+        self.assertTrue(self.cache.update())
+
+        calls = self.collector.WaitForUpdatesEx.call_args_list[-3:]
+        self.assertEqual([call[0][0] for call in calls], ['2', '', '1'])
+        self.assertEqual(set(self.cache.get_all()), {self.vm2, vm3})
+        self.assertIsNone(self.cache.find_by_name('web'))
+        self.assertIsNone(self.cache.find_by_uuid('uuid-2'))
+        self.assertEqual(self.cache._version, '2')
+
+    def test_should_report_no_change_on_timeout(self):
+        self.collector.WaitForUpdatesEx.side_effect = [None]
+
+        self.assertFalse(self.cache.update(max_wait_seconds=1))
+
+    @patch('samples.tools.inventory_cache.logging')
+    def test_should_retry_failed_background_updates(self, logging):
+        failed = threading.Event()
+        recovered = threading.Event()
+
+        def wait_for_updates(version, options):
+            if not failed.is_set():
+                failed.set()
+                raise vmodl.fault.SystemError(msg='network')
+            recovered.set()
+            return None
+
+        self.collector.WaitForUpdatesEx.side_effect = wait_for_updates
+        with patch.object(self.cache._stop_event, 'wait'):
+            self.cache.start(max_wait_seconds=0)
+            self.assertTrue(recovered.wait(5))
+            self.cache.stop()
+
+        self.assertEqual(logging.warning.call_count, 1)
+        self.assertIsNone(self.cache.last_error)
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from samples.tools import lazy_typeinfo
+
+CHILD = """
+import sys
+sys.path.insert(0, %r)
+import lazy_typeinfo
+lazy_typeinfo.enable(%r)
+from pyVmomi import vim
+print(vim.VirtualMachine.__name__)
+print(lazy_typeinfo.is_loaded('pbm'), lazy_typeinfo.is_loaded('vsanhealth'))
+from pyVmomi import pbm
+print(pbm.ServiceInstance.__name__, lazy_typeinfo.is_loaded('pbm'))
+lazy_typeinfo.load('vsanhealth')
+print(vim.cluster.VsanPerfQuerySpec.__name__)
+"""
+
+
+class LazyTypeinfoTests(TestCase):
+
+    def run_child(self, namespaces):
+        directory = os.path.dirname(os.path.abspath(lazy_typeinfo.__file__))
+        output = subprocess.check_output(
+            [sys.executable, '-c', CHILD % (directory, namespaces)])
+        return output.decode().splitlines()
+
+    def test_should_load_deferred_typeinfos_on_first_access(self):
+        lines = self.run_child(('pbm', 'vsanhealth'))
+
+        self.assertEqual(lines, [
+            'vim.VirtualMachine',
+            'False False',
+            'pbm.ServiceInstance True',
+            'vim.cluster.VsanPerfQuerySpec',
+        ])
+
+    def test_should_refuse_to_enable_after_pyvmomi_import(self):
+        import pyVmomi  # noqa: F401
+
+        with self.assertRaises(RuntimeError):
+            lazy_typeinfo.enable()
+
+    def test_should_reject_unknown_namespaces(self):
+        modules = sys.modules.pop('pyVmomi')
+        self.addCleanup(sys.modules.__setitem__, 'pyVmomi', modules)
+
+        with self.assertRaises(ValueError):
+            lazy_typeinfo.enable(['vim'])
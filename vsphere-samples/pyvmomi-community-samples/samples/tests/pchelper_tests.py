@@ -0,0 +1,150 @@
+from unittest import TestCase
+from mock import Mock
+
+from pyVmomi import vim, vmodl
+
+from samples.tools.pchelper import (
+    NameIndex,
+    get_objs,
+    iter_properties,
+    search_for_obj
+)
+
+
+def make_object_content(moid, name):
+    return vmodl.query.PropertyCollector.ObjectContent(
+        obj=vim.VirtualMachine(moid),
+        propSet=[vmodl.DynamicProperty(name='name', val=name)])
+
+
+def make_result(objects, token=None):
+    return vmodl.query.PropertyCollector.RetrieveResult(objects=objects,
+                                                        token=token)
+
+
+class IterPropertiesTests(TestCase):
+
+    def setUp(self):
+        self.si = Mock()
+        self.collector = self.si.content.propertyCollector
+        self.view = vim.view.ContainerView('session[1]view-1')
+
+    def test_should_follow_tokens_until_last_page(self):
+        self.collector.RetrievePropertiesEx.return_value = make_result(
+            [make_object_content('vm-1', 'a'),
+             make_object_content('vm-2', 'b')], token='t1')
+        self.collector.ContinueRetrievePropertiesEx.return_value = \
+            make_result([make_object_content('vm-3', 'c')])
+
+        rows = list(iter_properties(self.si, self.view, vim.VirtualMachine,
+                                    path_set=['name'], max_objects=2))
+
+        self.assertEqual([row['name'] for row in rows], ['a', 'b', 'c'])
+        options = self.collector.RetrievePropertiesEx.call_args[0][1]
+        self.assertEqual(options.maxObjects, 2)
+        self.collector.ContinueRetrievePropertiesEx.assert_called_once_with(
+            't1')
+        self.collector.CancelRetrievePropertiesEx.assert_not_called()
+
+    def test_should_include_mors_when_requested(self):
+        self.collector.RetrievePropertiesEx.return_value = make_result(
+            [make_object_content('vm-1', 'a')])
+
+        rows = list(iter_properties(self.si, self.view, vim.VirtualMachine,
+                                    path_set=['name'], include_mors=True))
+
+        self.assertEqual(rows[0]['obj'], vim.VirtualMachine('vm-1'))
+
+    def test_should_yield_nothing_when_no_objects_match(self):
+        self.collector.RetrievePropertiesEx.return_value = None
+
+        rows = list(iter_properties(self.si, self.view, vim.VirtualMachine))
+
+        self.assertEqual(rows, [])
+
+    def test_should_cancel_retrieval_when_closed_early(self):
+        self.collector.RetrievePropertiesEx.return_value = make_result(
+            [make_object_content('vm-1', 'a')], token='t1')
+
+        rows = iter_properties(self.si, self.view, vim.VirtualMachine)
+        next(rows)
+        rows.close()
+
+        self.collector.CancelRetrievePropertiesEx.assert_called_once_with('t1')
+        self.collector.ContinueRetrievePropertiesEx.assert_not_called()
+
+
+class NameIndexTests(TestCase):
+
+    def setUp(self):
+        self.content = Mock()
+        self.content.viewManager.CreateContainerView.return_value = \
+            Mock(spec=vim.view.ContainerView)
+        self.collector = self.content.propertyCollector
+        self.collector.RetrievePropertiesEx.return_value = make_result(
+            [make_object_content('vm-1', 'a'),
+             make_object_content('vm-2', 'b'),
+             make_object_content('vm-3', 'a')])
+
+    def test_should_fetch_names_in_one_call(self):
+        index = NameIndex(self.content, [vim.VirtualMachine])
+
+        self.assertEqual(index.lookup('b'), vim.VirtualMachine('vm-2'))
+        self.assertIsNone(index.lookup('missing'))
+        self.assertEqual(len(index.get_all()), 3)
+        self.collector.RetrievePropertiesEx.assert_called_once()
+
+    def test_should_skip_objects_without_name(self):
+        self.collector.RetrievePropertiesEx.return_value = make_result(
+            [vmodl.query.PropertyCollector.ObjectContent(
+                obj=vim.VirtualMachine('vm-0'), propSet=[],
+                missingSet=[vmodl.query.PropertyCollector.MissingProperty(
+                    path='name', fault=vim.fault.NoPermission())]),
+             make_object_content('vm-1', 'a')])
+        index = NameIndex(self.content, [vim.VirtualMachine])
+
+        self.assertEqual(index.get_all(), {vim.VirtualMachine('vm-1'): 'a'})
+
+    def test_should_keep_first_object_for_duplicate_names(self):
+        vm = search_for_obj(self.content, [vim.VirtualMachine], 'a')
+
+        self.assertEqual(vm, vim.VirtualMachine('vm-1'))
+
+    def test_should_refetch_after_invalidate(self):
+        index = NameIndex(self.content, [vim.VirtualMachine])
+        index.lookup('a')
+        index.invalidate()
+        index.lookup('a')
+
+        self.assertEqual(self.collector.RetrievePropertiesEx.call_count, 2)
+
+    def test_should_survive_invalidate_during_lookup(self):
+        index = NameIndex(self.content, [vim.VirtualMachine])
+        refresh = index.refresh
+
+        def refresh_then_invalidate():
+            names = refresh()
+            index.invalidate()
+            return names
+
+        index.refresh = refresh_then_invalidate
+
+        self.assertEqual(index.lookup('b'), vim.VirtualMachine('vm-2'))
+
+    def test_should_refetch_when_ttl_expired(self):
+        index = NameIndex(self.content, [vim.VirtualMachine], ttl=0)
+        index.lookup('a')
+        index._loaded_at -= 1
+        index.lookup('a')
+
+        self.assertEqual(self.collector.RetrievePropertiesEx.call_count, 2)
+
+    def test_should_resolve_many_names_at_once(self):
+        vms = get_objs(self.content, [vim.VirtualMachine], ['b', 'a'])
+
+        self.assertEqual(vms, [vim.VirtualMachine('vm-2'),
+                               vim.VirtualMachine('vm-1')])
+
+    def test_should_raise_when_any_name_is_missing(self):
+        with self.assertRaises(RuntimeError):
+            get_objs(self.content, [vim.VirtualMachine], ['a', 'missing'])
@@ -0,0 +1,231 @@
+import ast
+import datetime
+import math
+import os
+import shutil
+import struct
+import tempfile
+from unittest import TestCase, skipUnless
+from mock import Mock, patch
+
+from pyVmomi import vim, vmodl
+
+from samples.tools.perf import (
+    ParallelPerfCollector,
+    PerfCollector,
+    PerfColumns,
+    PerfSeries,
+    _AdaptiveLimiter
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_counter(key, group, name, rollup):
+    return vim.PerformanceManager.CounterInfo(
+        key=key,
+        groupInfo=vim.ElementDescription(key=group),
+        nameInfo=vim.ElementDescription(key=name),
+        rollupType=rollup)
+
+
+def make_csv_metric(entity, sample_info, series):
+    return vim.PerformanceManager.EntityMetricCSV(
+        entity=entity,
+        sampleInfoCSV=sample_info,
+        value=[vim.PerformanceManager.MetricSeriesCSV(
+            id=vim.PerformanceManager.MetricId(counterId=counter_id,
+                                               instance=instance),
+            value=values)
+            for counter_id, instance, values in series])
+
+
+class PerfCollectorTests(TestCase):
+
+    def setUp(self):
+        self.perf_manager = Mock()
+        self.perf_manager.perfCounter = [
+            make_counter(6, 'cpu', 'usagemhz', 'average'),
+            make_counter(24, 'mem', 'usage', 'average'),
+        ]
+        self.collector = PerfCollector(self.perf_manager, batch_size=2)
+
+    def test_should_index_counters_both_ways(self):
+        self.assertEqual(self.collector.counter_id('mem.usage.average'), 24)
+        self.assertEqual(self.collector.counter_name(6),
+                         'cpu.usagemhz.average')
+        self.assertEqual(self.collector.counter_name(99), '99')
+
+    def test_should_batch_entities_per_query(self):
+        vms = [vim.VirtualMachine('vm-%d' % i) for i in range(5)]
+        self.perf_manager.QueryPerf.return_value = []
+
+        list(self.collector.query(vms, ['cpu.usagemhz.average']))
+
+        batches = [call[1]['querySpec']
+                   for call in self.perf_manager.QueryPerf.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        spec = batches[0][0]
+        self.assertEqual(spec.format, 'csv')
+        self.assertEqual(spec.intervalId, 20)
+        self.assertEqual(spec.metricId[0].counterId, 6)
+
+    def test_should_parse_csv_results(self):
+        vm = vim.VirtualMachine('vm-1')
+        self.perf_manager.QueryPerf.return_value = [make_csv_metric(
+            vm,
+            '20,2024-01-01T00:00:00Z,20,2024-01-01T00:00:20Z',
+            [(6, '', '100,'), (24, '0', '5,7')])]
+
+        series = list(self.collector.query([vm]))
+
+        self.assertEqual(len(series), 2)
+        self.assertEqual(series[0].entity, vm)
+        self.assertEqual(series[0].counter, 'cpu.usagemhz.average')
+        self.assertEqual(series[0].values, [100, -1])
+        self.assertEqual(series[1].instance, '0')
+        self.assertEqual([ts.second for ts in series[1].timestamps], [0, 20])
+
+
+class ParallelPerfCollectorTests(TestCase):
+
+    def make_collector(self, sample_info, values):
+        perf_manager = Mock()
+        perf_manager.perfCounter = [make_counter(6, 'cpu', 'usagemhz',
+                                                 'average')]
+        perf_manager.QueryPerf.side_effect = lambda querySpec: [
+            make_csv_metric(spec.entity, sample_info, [(6, '', values)])
+            for spec in querySpec]
+        return PerfCollector(perf_manager, batch_size=1)
+
+    def test_should_merge_endpoints_in_time_order(self):
+        first = self.make_collector(
+            '20,2024-01-01T00:00:00Z,20,2024-01-01T00:00:40Z', '1,3')
+        second = self.make_collector('20,2024-01-01T00:00:20Z', '2')
+        targets = [(first, [vim.VirtualMachine('vm-1')]),
+                   (second, [vim.VirtualMachine('vm-2')])]
+
+        samples = list(ParallelPerfCollector(max_workers=2).query(targets))
+
+        self.assertEqual([sample.value for sample in samples], [1, 2, 3])
+        self.assertEqual(samples[1].entity, vim.VirtualMachine('vm-2'))
+
+    @patch('samples.tools.perf.time.sleep')
+    def test_should_retry_server_faults(self, sleep):
+        collector = self.make_collector('20,2024-01-01T00:00:00Z', '5')
+        vm = vim.VirtualMachine('vm-1')
+        collector.perf_manager.QueryPerf.side_effect = [
+            vmodl.fault.SystemError(),
+            [make_csv_metric(vm, '20,2024-01-01T00:00:00Z', [(6, '', '5')])]]
+        parallel = ParallelPerfCollector(max_per_endpoint=4)
+
+        samples = list(parallel.query([(collector, [vm])]))
+
+        self.assertEqual([sample.value for sample in samples], [5])
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(parallel._limiter(collector).limit, 2)
+
+    @patch('samples.tools.perf.time.sleep')
+    def test_should_give_up_after_retries(self, sleep):
+        collector = self.make_collector('', '')
+        collector.perf_manager.QueryPerf.side_effect = \
+            vmodl.fault.SystemError()
+        parallel = ParallelPerfCollector(retries=2)
+
+        with self.assertRaises(vmodl.fault.SystemError):
+            list(parallel.query([(collector, [vim.VirtualMachine('vm-1')])]))
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_should_release_limiter_on_other_faults(self):
+        collector = self.make_collector('', '')
+        collector.perf_manager.QueryPerf.side_effect = \
+            vmodl.fault.InvalidArgument()
+        parallel = ParallelPerfCollector(max_per_endpoint=1)
+
+        for _ in range(2):
+            with self.assertRaises(vmodl.fault.InvalidArgument):
+                list(parallel.query(
+                    [(collector, [vim.VirtualMachine('vm-1')])]))
+        limiter = parallel._limiter(collector)
+        self.assertEqual(limiter._active, 0)
+        self.assertEqual(limiter._successes, 0)
+
+
+class AdaptiveLimiterTests(TestCase):
+
+    def test_should_halve_on_failure_and_grow_back(self):
+        limiter = _AdaptiveLimiter(4)
+        limiter.acquire()
+        limiter.release(success=False)
+        self.assertEqual(limiter.limit, 2)
+
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(success=True)
+        self.assertEqual(limiter.limit, 3)
+
+
+class PerfColumnsTests(TestCase):
+
+    def setUp(self):
+        self.timestamps = [datetime.datetime(2024, 1, 1, 0, 0, 0),
+                           datetime.datetime(2024, 1, 1, 0, 0, 20)]
+        self.columns = PerfColumns()
+        self.columns.extend_series([
+            PerfSeries('vm-1', 'cpu.usagemhz.average', '',
+                       self.timestamps, [10, -1]),
+            PerfSeries('vm-2', 'cpu.usagemhz.average', '0',
+                       self.timestamps, [30, 40]),
+        ])
+
+    def test_should_store_samples_column_wise(self):
+        self.assertEqual(len(self.columns), 4)
+        self.assertEqual(list(self.columns.entity), [0, 0, 1, 1])
+        self.assertEqual(list(self.columns.counter), [0, 0, 0, 0])
+        self.assertEqual(list(self.columns.instance), [0, 0, 1, 1])
+        self.assertEqual(self.columns.entities, ['vm-1', 'vm-2'])
+        self.assertEqual(list(self.columns.timestamp),
+                         [1704067200, 1704067220] * 2)
+        self.assertTrue(math.isnan(self.columns.value[1]))
+        self.assertEqual(self.columns.value[3], 40.0)
+
+    def test_should_parse_vsan_metrics(self):
+        columns = PerfColumns()
+        columns.extend_vsan_metrics([vim.cluster.VsanPerfEntityMetricCSV(
+            entityRefId='cluster-domclient:c1',
+            sampleInfo='2024-01-01 00:00:00,2024-01-01 00:05:00',
+            value=[vim.cluster.VsanPerfMetricSeriesCSV(
+                metricId=vim.cluster.VsanPerfMetricId(label='iopsRead'),
+                values='1.5,2.5')])])
+
+        self.assertEqual(columns.counters, ['iopsRead'])
+        self.assertEqual(list(columns.value), [1.5, 2.5])
+        self.assertEqual(list(columns.timestamp), [1704067200, 1704067500])
+
+    def test_should_save_npy_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.columns.save(directory)
+
+        with open(os.path.join(directory, 'timestamp.npy'), 'rb') as npy:
+            self.assertEqual(npy.read(8), b'\x93NUMPY\x01\x00')
+            header_length = struct.unpack('<H', npy.read(2))[0]
+            header = ast.literal_eval(npy.read(header_length).decode())
+            data = npy.read()
+        self.assertEqual((10 + header_length) % 64, 0)
+        self.assertEqual(header['shape'], (4,))
+        self.assertEqual(struct.unpack(header['descr'][0] + '4q', data),
+                         (1704067200, 1704067220) * 2)
+        self.assertTrue(os.path.exists(os.path.join(directory,
+                                                    'lookup.json')))
+
+    @skipUnless(numpy, 'requires numpy')
+    def test_should_export_to_numpy(self):
+        arrays = self.columns.to_numpy()
+
+        self.assertEqual(arrays['value'].dtype, numpy.float64)
+        self.assertEqual(numpy.nansum(arrays['value']), 80.0)
@@ -0,0 +1,151 @@
+import io
+from unittest import TestCase
+from mock import Mock, patch
+
+from pyVmomi import vim, vmodl
+from pyVmomi.SoapAdapter import SoapStubAdapter
+
+from samples.tools import soap_stream
+
+ENVELOPE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soapenv:Envelope '
+    'xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    'xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<soapenv:Body>%s</soapenv:Body></soapenv:Envelope>')
+
+OBJECT = (
+    '<objects><obj type="VirtualMachine">%s</obj>'
+    '<propSet><name>name</name><val xsi:type="xsd:string">%s</val>'
+    '</propSet></objects>')
+
+
+def retrieve_response(names, token=None, method='RetrievePropertiesEx'):
+    token_element = '<token>%s</token>' % token if token else ''
+    objects = ''.join(OBJECT % ('vm-%d' % i, name)
+                      for i, name in enumerate(names))
+    return (ENVELOPE % (
+        '<%sResponse xmlns="urn:vim25"><returnval>%s%s</returnval>'
+        '</%sResponse>' % (method, token_element, objects, method))).encode()
+
+
+FAULT = (ENVELOPE % (
+    '<soapenv:Fault><faultcode>ServerFaultCode</faultcode>'
+    '<faultstring>denied</faultstring><detail>'
+    '<NoPermissionFault xmlns="urn:vim25" xsi:type="NoPermission">'
+    '<privilegeId>System.View</privilegeId></NoPermissionFault>'
+    '</detail></soapenv:Fault>')).encode()
+
+
+class FakeResponse(io.BytesIO):
+
+    def __init__(self, body, status=200):
+        io.BytesIO.__init__(self, body)
+        self.status = status
+        self.reason = 'OK'
+
+    def getheader(self, name, default=None):
+        return default
+
+
+class StreamingResponseParserTests(TestCase):
+
+    def make_parser(self):
+        return soap_stream._StreamingResponseParser(
+            None, vmodl.query.PropertyCollector.ObjectContent,
+            ('returnval', 'objects'))
+
+    def test_should_emit_each_item_once_it_is_closed(self):
+        body = retrieve_response(['a', 'b'], token='t1')
+        parser = self.make_parser()
+        first_item_end = body.index(b'</objects>') + len(b'</objects>')
+
+        parser.feed(body[:first_item_end])
+        self.assertEqual(len(parser.items), 1)
+        self.assertEqual(parser.items[0].propSet[0].val, 'a')
+
+        parser.feed(body[first_item_end:], final=True)
+        self.assertEqual(len(parser.items), 2)
+        self.assertEqual(parser.items[1].obj, vim.VirtualMachine('vm-1'))
+        self.assertEqual(parser.fields['token'], 't1')
+
+    def test_should_parse_byte_by_byte(self):
+        body = retrieve_response(['a', 'b', 'c'])
+        parser = self.make_parser()
+
+        for i in range(len(body)):
+            parser.feed(body[i:i + 1])
+        parser.feed(b'', final=True)
+
+        self.assertEqual([item.propSet[0].val for item in parser.items],
+                         ['a', 'b', 'c'])
+
+    def test_should_deserialize_faults(self):
+        parser = self.make_parser()
+
+        parser.feed(FAULT, final=True)
+
+        self.assertIsInstance(parser.fault, vim.fault.NoPermission)
+        self.assertEqual(parser.fault.msg, 'denied')
+
+
+class RetrievePropertiesTests(TestCase):
+
+    def setUp(self):
+        self.stub = SoapStubAdapter(host='vcenter')
+        self.conn = Mock()
+        self.stub.GetConnection = Mock(return_value=self.conn)
+        self.stub.ReturnConnection = Mock()
+        self.si = Mock()
+        self.si.content.propertyCollector = \
+            vmodl.query.PropertyCollector('propertyCollector', self.stub)
+        self.specs = [vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[vmodl.query.PropertyCollector.ObjectSpec(
+                obj=vim.Folder('group-d1'))],
+            propSet=[vmodl.query.PropertyCollector.PropertySpec(
+                type=vim.Folder, pathSet=['name'])])]
+
+    def test_should_follow_tokens(self):
+        self.conn.getresponse.side_effect = [
+            FakeResponse(retrieve_response(['a'], token='t1')),
+            FakeResponse(retrieve_response(
+                ['b'], method='ContinueRetrievePropertiesEx')),
+        ]
+
+        objects = list(soap_stream.retrieve_properties(self.si, self.specs))
+
+        self.assertEqual([obj.propSet[0].val for obj in objects], ['a', 'b'])
+        self.assertIn(b'>t1</token>',
+                      self.conn.request.call_args_list[1][0][2])
+        self.assertEqual(self.stub.ReturnConnection.call_count, 2)
+
+    def test_should_raise_faults(self):
+        self.conn.getresponse.return_value = FakeResponse(FAULT, status=500)
+
+        with self.assertRaises(vim.fault.NoPermission):
+            list(soap_stream.retrieve_properties(self.si, self.specs))
+
+    def test_should_close_connection_when_stopped_early(self):
+        self.conn.getresponse.return_value = FakeResponse(
+            retrieve_response(['a', 'b']))
+
+        objects = soap_stream.retrieve_properties(self.si, self.specs)
+        next(objects)
+        objects.close()
+
+        self.conn.close.assert_called_once()
+        self.stub.ReturnConnection.assert_not_called()
+
+    def test_should_cancel_retrieval_when_stopped_early(self):
+        self.conn.getresponse.return_value = FakeResponse(
+            retrieve_response(['a', 'b'], token='t1'))
+
+        objects = soap_stream.retrieve_properties(self.si, self.specs)
+        with patch.object(vmodl.query.PropertyCollector,
+                          'CancelRetrievePropertiesEx') as cancel:
+            next(objects)
+            objects.close()
+
+        cancel.assert_called_once_with('t1')
+        self.conn.close.assert_called_once()
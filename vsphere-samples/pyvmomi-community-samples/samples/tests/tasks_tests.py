@@ -0,0 +1,114 @@
+import queue
+from unittest import TestCase
+from mock import Mock
+
+from pyVmomi import vim, vmodl
+
+from samples.tools.tasks import TaskMonitor, wait_for_tasks
+
+
+def make_task_update(task, state, result=None, error=None):
+    changes = [vmodl.query.PropertyCollector.Change(
+        name='info.state', op='assign', val=state)]
+    if result is not None:
+        changes.append(vmodl.query.PropertyCollector.Change(
+            name='info.result', op='assign', val=result))
+    if error is not None:
+        changes.append(vmodl.query.PropertyCollector.Change(
+            name='info.error', op='assign', val=error))
+    object_update = vmodl.query.PropertyCollector.ObjectUpdate(
+        obj=task, kind='enter', changeSet=changes)
+    filter_update = vmodl.query.PropertyCollector.FilterUpdate(
+        objectSet=[object_update])
+    return vmodl.query.PropertyCollector.UpdateSet(
+        version='1', filterSet=[filter_update])
+
+
+class TaskMonitorTests(TestCase):
+
+    def setUp(self):
+        self.updates = queue.Queue()
+        self.si = Mock()
+        self.collector = \
+            self.si.content.propertyCollector.CreatePropertyCollector \
+            .return_value
+        self.collector.WaitForUpdatesEx.side_effect = self.next_update
+        self.monitor = TaskMonitor(self.si)
+
+    def tearDown(self):
+        self.monitor.close()
+
+    def next_update(self, version, options):
+        try:
+            update = self.updates.get(timeout=0.05)
+        except queue.Empty:
+            return None
+        if isinstance(update, Exception):
+            raise update
+        return update
+
+    def test_should_resolve_future_with_task_result(self):
+        task = vim.Task('task-1')
+        future = self.monitor.add(task)
+        self.updates.put(make_task_update(task, 'running'))
+        self.updates.put(make_task_update(task, 'success', result='done'))
+
+        self.assertEqual(future.result(timeout=5), 'done')
+        self.collector.CreateFilter.return_value.Destroy.assert_called_once()
+
+    def test_should_raise_task_error(self):
+        task = vim.Task('task-1')
+        future = self.monitor.add(task)
+        self.updates.put(make_task_update(
+            task, 'error', error=vim.fault.InvalidState()))
+
+        with self.assertRaises(vim.fault.InvalidState):
+            future.result(timeout=5)
+
+    def test_should_share_one_collector_for_many_tasks(self):
+        tasks = [vim.Task('task-%d' % i) for i in range(3)]
+        futures = [self.monitor.add(task) for task in tasks]
+        for i, task in enumerate(tasks):
+            self.updates.put(make_task_update(task, 'success', result=i))
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [0, 1, 2])
+        self.assertEqual(self.collector.CreateFilter.call_count, 3)
+        self.si.content.propertyCollector.CreatePropertyCollector \
+            .assert_called_once()
+
+    def test_should_return_same_future_for_same_task(self):
+        task = vim.Task('task-1')
+
+        self.assertIs(self.monitor.add(task), self.monitor.add(task))
+
+    def test_should_destroy_filter_when_removed(self):
+        task = vim.Task('task-1')
+        future = self.monitor.add(task)
+        self.monitor.remove(task)
+
+        self.assertTrue(future.cancelled())
+        self.collector.CreateFilter.return_value.Destroy.assert_called_once()
+
+    def test_wait_for_tasks_should_reuse_monitor_per_connection(self):
+        TaskMonitor._monitors[self.si._stub] = self.monitor
+        task = vim.Task('task-1')
+        self.updates.put(make_task_update(task, 'success'))
+
+        wait_for_tasks(self.si, [task])
+        wait_for_tasks(self.si, [])
+
+        self.assertIs(TaskMonitor.get(self.si), self.monitor)
+        del TaskMonitor._monitors[self.si._stub]
+
+    def test_should_release_monitor_when_session_ends(self):
+        TaskMonitor._monitors[self.si._stub] = self.monitor
+        task = vim.Task('task-1')
+        future = self.monitor.add(task)
+        self.updates.put(vim.fault.NotAuthenticated())
+
+        with self.assertRaises(vim.fault.NotAuthenticated):
+            future.result(timeout=5)
+        self.monitor._thread.join(5)
+        self.collector.CreateFilter.return_value.Destroy.assert_called_once()
+        self.collector.Destroy.assert_called_once()
+        self.assertNotIn(self.si._stub, TaskMonitor._monitors)
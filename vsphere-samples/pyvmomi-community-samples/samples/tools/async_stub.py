@@ -0,0 +1,287 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements an asyncio stub adapter for pyVmomi.
+
+AsyncSoapStubAdapter wraps the SoapStubAdapter of an existing, logged in
+connection and shares its session cookie. It uses the pyVmomi request
+serializer and response deserializer unchanged but sends the requests on an
+asyncio event loop over a pool of keep-alive HTTP connections, so a single
+thread can have many calls in flight. Managed object methods of objects
+bound to the adapter return awaitables, property reads stay synchronous and
+are sent through the wrapped stub.
+
+Only direct http and https connections are supported, not proxies, tunnels
+or unix sockets.
+
+Sample Usage:
+
+    si = service_instance.connect(args)
+    async_si = async_stub.async_service_instance(si)
+
+    async def main():
+        collector = async_si.content.propertyCollector
+        results = await asyncio.gather(*[
+            collector.RetrievePropertiesEx(specs, options)
+            for specs in spec_sets])
+"""
+import asyncio
+import ssl
+import zlib
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from http.cookies import SimpleCookie
+
+from pyVmomi import vim
+from pyVmomi.Security import VerifyCert, VerifyCertThumbprint
+from pyVmomi.SoapAdapter import (
+    SoapResponseDeserializer,
+    SoapStubAdapterBase,
+    StubAdapterAccessorMixin
+)
+
+__author__ = "VMware, Inc."
+
+COOKIE_NAME = 'vmware_soap_session'
+
+
+def async_service_instance(si, pool_size=64):
+    """
+    Returns a ServiceInstance bound to an AsyncSoapStubAdapter sharing the
+    session of 'si'.
+    """
+    return vim.ServiceInstance('ServiceInstance',
+                               AsyncSoapStubAdapter(si._stub, pool_size))
+
+
+class AsyncSoapStubAdapter(SoapStubAdapterBase):
+    """
+    asyncio based stub adapter sharing the session of a SoapStubAdapter.
+    """
+
+    def __init__(self, stub, pool_size=64):
+        """
+        - `stub` (SoapStubAdapter) is the logged in stub to share the
+          session of, e.g. si._stub.
+        - `pool_size` (int) is the maximum number of HTTP connections, and
+          so of calls in flight.
+        """
+        if stub.scheme not in (HTTPConnection, HTTPSConnection) or \
+                stub.is_tunnel:
+            raise ValueError("Only direct http and https connections are "
+                             "supported")
+        SoapStubAdapterBase.__init__(self, version=stub.version,
+                                     sessionId=stub.GetSessionId())
+        self.stub = stub
+        self.pool_size = pool_size
+        self.path = stub.path
+        self.requestContext = stub.requestContext
+        self.samlToken = stub.samlToken
+        self._host = stub.host.rsplit(':', 1)[0].strip('[]')
+        self._port = stub.port
+        self._ssl_context = None
+        if stub.scheme is HTTPSConnection:
+            self._ssl_context = stub.schemeArgs.get('context') or \
+                ssl.create_default_context()
+            if stub.serverPemCert or stub.thumbprint:
+                # The pinned identity replaces the CA verification, as in
+                # SoapStubAdapter
+                self._ssl_context = ssl.create_default_context()
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._idle = []
+        self._semaphore = None
+
+    @property
+    def cookie(self):
+        return self.stub.cookie
+
+    def InvokeMethod(self, mo, info, args):
+        """
+        Returns an awaitable for the result of the method call.
+        """
+        request = self.SerializeRequest(mo, info, args)
+        return self._invoke(info, request)
+
+    def InvokeAccessor(self, mo, info):
+        """
+        Reads a property synchronously through the wrapped stub.
+        """
+        return StubAdapterAccessorMixin.InvokeAccessor(
+            _SyncAccessorStub(self), mo, info)
+
+    async def close(self):
+        """
+        Closes the idle connections of the pool.
+        """
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def _headers(self, content_length):
+        headers = {
+            'Host': self.stub.host,
+            'Cookie': self.cookie,
+            'SOAPAction': self.versionId,
+            'Content-Type': 'text/xml; charset=UTF-8',
+            'Content-Length': str(content_length),
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        }
+        if self.stub._customHeaders:
+            headers.update(self.stub._customHeaders)
+        return headers
+
+    async def _invoke(self, info, request):
+        for modifier in self.stub.requestModifierList:
+            request = modifier(request)
+        head = ['POST %s HTTP/1.1' % self.path]
+        head.extend('%s: %s' % item
+                    for item in self._headers(len(request)).items())
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode('latin1') + request
+
+        status, reason, headers, body = await self._send(message)
+
+        cookie = headers.get('set-cookie')
+        if cookie:
+            self.stub.cookie = cookie
+            session_id = SimpleCookie(cookie)[COOKIE_NAME].value
+            self.stub.SetSessionId(session_id)
+            self.SetSessionId(session_id)
+
+        if status not in (200, 500):
+            raise HTTPException("{0} {1}".format(status, reason))
+
+        encoding = headers.get('content-encoding', 'identity').lower()
+        if encoding == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        obj = SoapResponseDeserializer(self).Deserialize(body, info.result)
+        if status == 200:
+            return obj
+        raise obj
+
+    async def _send(self, message):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+        async with self._semaphore:
+            # A pooled connection may have been closed by the server while
+            # idle, retry those once on a new connection
+            while self._idle:
+                reader, writer = self._idle.pop()
+                if writer.is_closing() or reader.at_eof():
+                    writer.close()
+                    continue
+                try:
+                    return await self._exchange(reader, writer, message)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                break
+            reader, writer = await self._connect()
+            return await self._exchange(reader, writer, message)
+
+    async def _connect(self):
+        if self._ssl_context is None:
+            return await asyncio.open_connection(self._host, self._port)
+        reader, writer = await asyncio.open_connection(
+            self._host, self._port, ssl=self._ssl_context,
+            server_hostname=self._host)
+        if self.stub.serverPemCert or self.stub.thumbprint:
+            der_cert = writer.get_extra_info('ssl_object').getpeercert(True)
+            try:
+                if self.stub.serverPemCert:
+                    VerifyCert(ssl.DER_cert_to_PEM_cert(der_cert),
+                               self.stub.serverPemCert)
+                else:
+                    VerifyCertThumbprint(der_cert, self.stub.thumbprint)
+            except Exception:
+                writer.close()
+                raise
+        return reader, writer
+
+    async def _exchange(self, reader, writer, message):
+        try:
+            writer.write(message)
+            await writer.drain()
+            status, reason, headers, body, keep_alive = \
+                await _read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, reason, headers, body
+
+
+class _SyncAccessorStub(object):
+    """
+    Sends the property reads of an AsyncSoapStubAdapter through its wrapped
+    stub, binding the returned managed objects to the async adapter.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.version = adapter.version
+
+    def InvokeMethod(self, mo, info, args):
+        status, obj = self.adapter.stub.InvokeMethod(mo, info, args,
+                                                     outerStub=self.adapter)
+        if status == 200:
+            return obj
+        raise obj
+
+
+async def _read_response(reader):
+    """
+    Reads an HTTP/1.x response, returns the status, reason, lower case
+    headers, body and whether the connection can be reused
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed by the server")
+    http_version, status, reason = \
+        (status_line.decode('latin1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = http_version == 'HTTP/1.1' and \
+        headers.get('connection', '').lower() != 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Skip the trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), reason, headers, body, keep_alive
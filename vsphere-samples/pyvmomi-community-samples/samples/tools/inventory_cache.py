@@ -0,0 +1,323 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements a local, self updating snapshot of inventory
+properties.
+
+The cache does one full property fetch through a private PropertyCollector
+and then keeps itself current by applying the change sets returned by
+WaitForUpdatesEx, the same way waitforupdates.py does. Lookups by name,
+managed object reference or UUID are then local dict reads instead of one
+SOAP round-trip per property access.
+
+Sample Usage:
+
+    cache = InventoryCache(si, [vim.VirtualMachine],
+                           path_set=['name', 'config.uuid',
+                                     'runtime.powerState'])
+    cache.start()
+    vm = cache.find_by_name('my-vm')
+    state = cache.get_properties(vm)['runtime.powerState']
+    ...
+    cache.destroy()
+"""
+import logging
+import threading
+
+from pyVmomi import vmodl
+
+__author__ = "VMware, Inc."
+
+# Properties whose values are indexed for find_by_uuid when they are tracked
+UUID_PATHS = ('config.uuid', 'config.instanceUuid',
+              'summary.config.uuid', 'summary.config.instanceUuid',
+              'hardware.systemInfo.uuid', 'summary.hardware.uuid')
+
+
+class InventoryCache(object):
+    """
+    Local snapshot of a set of properties for all managed objects of the
+    given types below a container, kept current with WaitForUpdatesEx.
+    """
+
+    def __init__(self, si, obj_types, path_set=None, container=None,
+                 max_object_updates=1000):
+        """
+        Creates the cache and performs the initial full fetch.
+
+        - `si` (ServiceInstance) is the connection to use.
+        - `obj_types` (list) are the managed object types to track.
+        - `path_set` (list) are the properties to track, 'name' is always
+          tracked.
+        - `container` (ManagedEntity) is the root of the tracked inventory,
+          the root folder by default.
+        - `max_object_updates` (int) caps the number of objects returned
+          per WaitForUpdatesEx call while catching up.
+        """
+        content = si.content
+        if container is None:
+            container = content.rootFolder
+
+        self.path_set = ['name'] + [path for path in path_set or []
+                                    if path != 'name']
+        self._max_object_updates = max_object_updates
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._version = ''
+        self.last_error = None
+
+        self._properties = {}
+        self._by_name = {}
+        self._by_uuid = {}
+
+        # A private collector keeps our filter and update versions separate
+        # from anything else using the session's default collector
+        self._collector = content.propertyCollector.CreatePropertyCollector()
+        self._view = content.viewManager.CreateContainerView(
+            container, obj_types, True)
+        self._collector.CreateFilter(
+            self._build_filter_spec(obj_types), True)
+
+        self.update(max_wait_seconds=0)
+
+    def _build_filter_spec(self, obj_types):
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False,
+            type=self._view.__class__)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=self._view, skip=True, selectSet=[traversal_spec])
+        prop_specs = [vmodl.query.PropertyCollector.PropertySpec(
+            type=obj_type, all=False, pathSet=self.path_set)
+            for obj_type in obj_types]
+        return vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[obj_spec], propSet=prop_specs)
+
+    def update(self, max_wait_seconds=0):
+        """
+        Applies all pending change sets to the cache.
+
+        Waits up to `max_wait_seconds` for the first change set, None waits
+        indefinitely. Returns True if any change was applied.
+
+        When the server no longer knows the version of the cache, e.g. after
+        the collector was reset, the full inventory is fetched again and
+        replaces the cached one.
+        """
+        wait_options = vmodl.query.PropertyCollector.WaitOptions(
+            maxObjectUpdates=self._max_object_updates)
+        if max_wait_seconds is not None:
+            wait_options.maxWaitSeconds = max_wait_seconds
+
+        changed = False
+        version = self._version
+        resync = False
+        # Object updates of a full fetch, applied once it is complete
+        pending = []
+        while True:
+            try:
+                result = self._collector.WaitForUpdatesEx(version,
+                                                          wait_options)
+            except vmodl.query.InvalidCollectorVersion:
+                if resync:
+                    raise
+                logging.warning("Inventory cache version %s is no longer "
+                                "valid, fetching the inventory again",
+                                version)
+                version = ''
+                resync = True
+                wait_options.maxWaitSeconds = 0
+                continue
+            # timeout, nothing changed
+            if result is None:
+                return changed
+
+            object_sets = [object_set for filter_set in result.filterSet
+                           for object_set in filter_set.objectSet]
+            version = result.version
+            if resync:
+                # Lookups keep the last known inventory until the full
+                # fetch is complete
+                pending.extend(object_sets)
+                if not result.truncated:
+                    with self._lock:
+                        self._properties = {}
+                        self._by_name = {}
+                        self._by_uuid = {}
+                        for object_set in pending:
+                            self._apply_object_update(object_set)
+                        self._version = version
+            else:
+                with self._lock:
+                    for object_set in object_sets:
+                        self._apply_object_update(object_set)
+                    self._version = version
+            changed = True
+
+            # A truncated result means more updates are queued, fetch them
+            # without waiting
+            if not result.truncated:
+                return changed
+            wait_options.maxWaitSeconds = 0
+
+    def _apply_object_update(self, object_set):
+        moref = object_set.obj
+        if object_set.kind == 'leave':
+            self._remove(moref)
+            return
+
+        properties = dict(self._properties.get(moref, {}))
+        for change in object_set.changeSet:
+            if change.op in ('assign', 'add'):
+                properties[change.name] = change.val
+            else:
+                properties.pop(change.name, None)
+        self._remove(moref)
+        self._add(moref, properties)
+
+    def _add(self, moref, properties):
+        self._properties[moref] = properties
+        name = properties.get('name')
+        if name is not None:
+            self._by_name.setdefault(name, []).append(moref)
+        for path in UUID_PATHS:
+            uuid = properties.get(path)
+            if uuid:
+                self._by_uuid[uuid] = moref
+
+    def _remove(self, moref):
+        properties = self._properties.pop(moref, None)
+        if properties is None:
+            return
+        morefs = self._by_name.get(properties.get('name'))
+        if morefs is not None:
+            morefs.remove(moref)
+            if not morefs:
+                del self._by_name[properties['name']]
+        for path in UUID_PATHS:
+            uuid = properties.get(path)
+            if uuid and self._by_uuid.get(uuid) == moref:
+                del self._by_uuid[uuid]
+
+    def find_by_name(self, name):
+        """
+        Returns the first managed object with the given name or None.
+        """
+        with self._lock:
+            morefs = self._by_name.get(name)
+            return morefs[0] if morefs else None
+
+    def find_all_by_name(self, name):
+        """
+        Returns all managed objects with the given name.
+        """
+        with self._lock:
+            return list(self._by_name.get(name, []))
+
+    def find_by_uuid(self, uuid):
+        """
+        Returns the managed object with the given BIOS, instance or
+        hardware UUID or None. Only tracked UUID properties are indexed.
+        """
+        with self._lock:
+            return self._by_uuid.get(uuid)
+
+    def get_properties(self, moref):
+        """
+        Returns a copy of the tracked properties of a managed object or None.
+        """
+        with self._lock:
+            properties = self._properties.get(moref)
+            return dict(properties) if properties is not None else None
+
+    def get_all(self):
+        """
+        Returns a dict of managed object to a copy of its tracked properties.
+        """
+        with self._lock:
+            return {moref: dict(properties)
+                    for moref, properties in self._properties.items()}
+
+    def __contains__(self, moref):
+        with self._lock:
+            return moref in self._properties
+
+    def __len__(self):
+        with self._lock:
+            return len(self._properties)
+
+    def start(self, max_wait_seconds=30, max_retry_seconds=60):
+        """
+        Keeps the cache current from a background daemon thread.
+
+        A failed update, e.g. after a network error, is logged, kept in
+        `last_error` and retried with exponential backoff up to
+        `max_retry_seconds`. The cache serves the last known state meanwhile.
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(max_wait_seconds,
+                                              max_retry_seconds),
+                                        name='InventoryCache')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, max_wait_seconds, max_retry_seconds):
+        delay = 1
+        while not self._stop_event.is_set():
+            try:
+                self.update(max_wait_seconds)
+            except Exception as error:
+                if self._stop_event.is_set():
+                    break
+                self.last_error = error
+                logging.warning("Inventory cache update failed, retrying in "
+                                "%d seconds: %s", delay, error)
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, max_retry_seconds)
+                continue
+            self.last_error = None
+            delay = 1
+
+    def stop(self):
+        """
+        Stops the background thread started by start().
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # A cancel sent before the thread entered WaitForUpdatesEx is lost,
+        # cancel again until the thread is done
+        while self._thread.is_alive():
+            self._collector.CancelWaitForUpdates()
+            self._thread.join(0.5)
+        self._thread = None
+
+    def destroy(self):
+        """
+        Stops updating and releases the server side collector and view.
+        """
+        self.stop()
+        self._collector.Destroy()
+        self._view.Destroy()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.destroy()
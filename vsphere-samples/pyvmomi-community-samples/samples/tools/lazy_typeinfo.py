@@ -0,0 +1,208 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements an opt-in lazy loading of the pyVmomi type infos.
+
+'import pyVmomi' executes the type info modules of every namespace it ships,
+vim, eam, pbm, sms, vslm and the vSAN health types, although most scripts
+only use vim. Calling enable() before pyVmomi is imported replaces the
+pyVmomi type info loader: vmodl and vim are loaded as usual, the deferred
+namespaces are loaded on their first access through the pyVmomi module,
+e.g. 'from pyVmomi import pbm', or by an explicit load().
+
+The vSAN health types extend the vim namespace, so they can only be loaded
+explicitly with load('vsanhealth') and are not deferred by default.
+
+Sample Usage:
+
+    from tools import lazy_typeinfo
+    lazy_typeinfo.enable()
+
+    from pyVmomi import vim
+
+Running this module compares the import time of both modes:
+
+    python lazy_typeinfo.py --runs 10 --defer pbm vsanhealth
+"""
+import importlib
+import sys
+import threading
+import types
+
+__author__ = "VMware, Inc."
+
+EAGER = ('core', 'query', 'vim')
+DEFERRED = ('eam', 'pbm', 'sms', 'vslm')
+FROZEN = ('vsanhealth',)
+
+_lock = threading.RLock()
+_deferred = set()
+
+
+def enable(namespaces=DEFERRED):
+    """
+    Defers loading the type infos of 'namespaces' until first access.
+    Must be called before pyVmomi is imported.
+
+    - `namespaces` (iterable) are type info names out of DEFERRED and
+      'vsanhealth'.
+    """
+    if 'pyVmomi' in sys.modules:
+        raise RuntimeError("lazy_typeinfo.enable() must be called before "
+                           "pyVmomi is imported")
+    namespaces = set(namespaces)
+    unknown = namespaces - set(DEFERRED + FROZEN)
+    if unknown:
+        raise ValueError("Cannot defer type infos: %s"
+                         % ', '.join(sorted(unknown)))
+    _deferred.clear()
+    _deferred.update(namespaces)
+    # pyVmomi imports its loader as a submodule, a module already present in
+    # sys.modules is used instead of the shipped one
+    loader = types.ModuleType('pyVmomi._typeinfos')
+    loader.load_typeinfos = _load_typeinfos
+    sys.modules['pyVmomi._typeinfos'] = loader
+
+
+def is_loaded(name):
+    """
+    Returns whether the type infos of 'name' have been loaded.
+    """
+    return 'pyVmomi._typeinfo_' + name in sys.modules
+
+
+def load(name):
+    """
+    Loads the deferred type infos of 'name' and returns the namespace
+    module of pyVmomi, or None for 'vsanhealth'.
+    """
+    from pyVmomi import VmomiSupport
+    with VmomiSupport._lazyLock, _lock:
+        if not is_loaded(name):
+            _import_typeinfo(name)
+        _deferred.discard(name)
+        if name in FROZEN:
+            return None
+        return _publish(name)
+
+
+def _import_typeinfo(name):
+    if name not in FROZEN:
+        importlib.import_module('pyVmomi._typeinfo_' + name)
+        return
+    from pyVmomi.VmomiSupport import SetFreezeDefinitions
+    try:
+        SetFreezeDefinitions(True)
+        importlib.import_module('pyVmomi._typeinfo_' + name)
+    finally:
+        SetFreezeDefinitions(False)
+
+
+def _load_typeinfos():
+    for name in EAGER + DEFERRED + FROZEN:
+        if name not in _deferred:
+            try:
+                _import_typeinfo(name)
+            except ImportError:
+                pass
+    # Called while 'pyVmomi' is being initialized, the module attribute
+    # hook resolves the deferred namespaces once their name is accessed
+    sys.modules['pyVmomi'].__getattr__ = _module_getattr
+
+
+def _module_getattr(attr):
+    if attr in _deferred and attr not in FROZEN:
+        return load(attr)
+    raise AttributeError("module 'pyVmomi' has no attribute '%s'" % attr)
+
+
+def _publish(name):
+    """
+    Adds the LazyModule of a namespace to pyVmomi, as pyVmomi does at import
+    time for the namespaces loaded then
+    """
+    import pyVmomi
+    from pyVmomi import VmomiSupport
+    module = pyVmomi.__dict__.get(name)
+    if module is not None:
+        return module
+    module = VmomiSupport.LazyModule(name)
+    names = [name]
+    if VmomiSupport._allowCapitalizedNames:
+        names.append(VmomiSupport.Capitalize(name))
+    for alias in names:
+        setattr(pyVmomi, alias, module)
+        if not hasattr(VmomiSupport.types, alias):
+            setattr(VmomiSupport.types, alias, module)
+    return module
+
+
+_BENCHMARK = """
+import sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+namespaces = %r
+if namespaces is not None:
+    import lazy_typeinfo
+    lazy_typeinfo.enable(namespaces)
+from pyVmomi import vim
+vim.VirtualMachine
+print(time.perf_counter() - start)
+"""
+
+
+def benchmark(runs=5, namespaces=DEFERRED + FROZEN):
+    """
+    Measures the time to import pyVmomi and resolve vim.VirtualMachine in
+    fresh interpreters, with every type info loaded and with 'namespaces'
+    deferred. Returns the median seconds, eager and lazy.
+    """
+    # Imported here to keep the import of this module itself cheap
+    import os
+    import statistics
+    import subprocess
+    directory = os.path.dirname(os.path.abspath(__file__))
+    medians = []
+    for deferred in (None, tuple(namespaces)):
+        timings = []
+        for _ in range(runs):
+            output = subprocess.check_output(
+                [sys.executable, '-c', _BENCHMARK % (directory, deferred)])
+            timings.append(float(output))
+        medians.append(statistics.median(timings))
+    return tuple(medians)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Compares the pyVmomi import time with and without '
+                    'lazy type info loading')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Interpreter starts per mode')
+    parser.add_argument('--defer', nargs='+', default=DEFERRED + FROZEN,
+                        choices=DEFERRED + FROZEN,
+                        help='Type infos to defer in the lazy mode')
+    args = parser.parse_args()
+
+    eager, lazy = benchmark(args.runs, args.defer)
+    print("eager: %.1f ms" % (eager * 1000))
+    print("lazy:  %.1f ms (%.0f%% less)"
+          % (lazy * 1000, (eager - lazy) * 100 / eager))
+
+
+if __name__ == '__main__':
+    main()
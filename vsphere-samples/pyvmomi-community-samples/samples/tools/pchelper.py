@@ -2,6 +2,9 @@
 Property Collector helper module.
 """
 
+import threading
+import time
+
 import pyVmomi
 
 
@@ -30,7 +33,80 @@ def collect_properties(si, view_ref, obj_type, path_set=None,
 
     """
     collector = si.content.propertyCollector
+    filter_spec = _build_filter_spec(view_ref, obj_type, path_set)
+
+    # Retrieve properties
+    props = collector.RetrieveContents([filter_spec])
+
+    data = []
+    for obj in props:
+        data.append(_object_content_to_dict(obj, include_mors))
+    return data
+
+
+def iter_properties(si, view_ref, obj_type, path_set=None,
+                    include_mors=False, max_objects=1000):
+    """
+    Collect properties for managed objects from a view ref, one page at a
+    time
+
+    Unlike collect_properties, this is a generator built on
+    RetrievePropertiesEx and ContinueRetrievePropertiesEx. The server
+    returns at most 'max_objects' objects per round-trip and each row is
+    yielded as soon as its page arrives, so callers can start producing
+    output before the whole inventory has been fetched and memory use is
+    bounded by the page size.
+
+    If the generator is closed before the last page is consumed, the
+    server side result set is released with CancelRetrievePropertiesEx.
+
+    Args:
+        si          (ServiceInstance): ServiceInstance connection
+        view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+        obj_type      (pyVmomi.vim.*): Type of managed object
+        path_set               (list): List of properties to retrieve
+        include_mors           (bool): If True include the managed objects
+                                       refs in the result
+        max_objects             (int): Maximum number of objects returned
+                                       by the server per page
+
+    Returns:
+        A generator of property dicts for the managed objects
 
+    """
+    filter_spec = _build_filter_spec(view_ref, obj_type, path_set)
+    for obj in _iter_object_contents(si.content.propertyCollector,
+                                     filter_spec, max_objects):
+        yield _object_content_to_dict(obj, include_mors)
+
+
+def _iter_object_contents(collector, filter_spec, max_objects):
+    """
+    Yield the ObjectContent results of a filter spec page by page
+    """
+    options = pyVmomi.vmodl.query.PropertyCollector.RetrieveOptions()
+    options.maxObjects = max_objects
+
+    # RetrievePropertiesEx returns None when nothing matched the filter
+    result = collector.RetrievePropertiesEx([filter_spec], options)
+    try:
+        while result is not None:
+            for obj in result.objects:
+                yield obj
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    except GeneratorExit:
+        if result is not None and result.token:
+            collector.CancelRetrievePropertiesEx(result.token)
+        raise
+
+
+def _build_filter_spec(view_ref, obj_type, path_set):
+    """
+    Build the property filter specification used by collect_properties
+    and iter_properties
+    """
     # Create object specification to define the starting point of
     # inventory navigation
     obj_spec = pyVmomi.vmodl.query.PropertyCollector.ObjectSpec()
@@ -59,21 +135,20 @@ def collect_properties(si, view_ref, obj_type, path_set=None,
     filter_spec = pyVmomi.vmodl.query.PropertyCollector.FilterSpec()
     filter_spec.objectSet = [obj_spec]
     filter_spec.propSet = [property_spec]
+    return filter_spec
 
-    # Retrieve properties
-    props = collector.RetrieveContents([filter_spec])
-
-    data = []
-    for obj in props:
-        properties = {}
-        for prop in obj.propSet:
-            properties[prop.name] = prop.val
 
-        if include_mors:
-            properties['obj'] = obj.obj
+def _object_content_to_dict(obj, include_mors):
+    """
+    Flatten an ObjectContent into a dict of property name to value
+    """
+    properties = {}
+    for prop in obj.propSet:
+        properties[prop.name] = prop.val
 
-        data.append(properties)
-    return data
+    if include_mors:
+        properties['obj'] = obj.obj
+    return properties
 
 
 def get_container_view(si, obj_type, container=None):
@@ -100,50 +175,146 @@ def get_container_view(si, obj_type, container=None):
     return view_ref
 
 
-def search_for_obj(content, vim_type, name, folder=None, recurse=True):
+class NameIndex(object):
     """
-    Search the managed object for the name and type specified
+    Index of managed object names for all objects of the given types
+
+    The names are fetched with a single paged PropertyCollector retrieval
+    instead of one round-trip per object. The index can be shared between
+    search_for_obj, get_obj, get_objs and get_all_obj calls and refreshes
+    itself when it is older than 'ttl' seconds or after invalidate() was
+    called, e.g. after a sample created or renamed an object.
 
     Sample Usage:
 
-    get_obj(content, [vim.Datastore], "Datastore Name")
+    index = NameIndex(content, [vim.Datastore], ttl=300)
+    get_obj(content, [vim.Datastore], "Datastore Name", name_index=index)
     """
-    if folder is None:
-        folder = content.rootFolder
-
-    obj = None
-    container = content.viewManager.CreateContainerView(folder, vim_type, recurse)
-
-    for managed_object_ref in container.view:
-        if managed_object_ref.name == name:
-            obj = managed_object_ref
-            break
-    container.Destroy()
-    return obj
-
 
-def get_all_obj(content, vim_type, folder=None, recurse=True):
+    def __init__(self, content, vim_type, folder=None, recurse=True,
+                 ttl=None, max_objects=1000):
+        self.content = content
+        self.vim_type = vim_type
+        self.folder = folder if folder else content.rootFolder
+        self.recurse = recurse
+        self.ttl = ttl
+        self.max_objects = max_objects
+        self._lock = threading.Lock()
+        self._by_name = None
+        self._by_obj = None
+        self._loaded_at = None
+
+    def refresh(self):
+        """
+        Fetch the names of all matching objects from the server
+        """
+        container = self.content.viewManager.CreateContainerView(
+            self.folder, self.vim_type, self.recurse)
+        try:
+            # PropertySpec needs a single type, the view already limits the
+            # objects to vim_type so the common base type is enough
+            filter_spec = _build_filter_spec(
+                container, pyVmomi.vim.ManagedEntity, ['name'])
+            by_obj = {}
+            for obj in _iter_object_contents(self.content.propertyCollector,
+                                             filter_spec, self.max_objects):
+                # The name is in missingSet instead, e.g. without permission
+                if not obj.propSet:
+                    continue
+                by_obj[obj.obj] = obj.propSet[0].val
+        finally:
+            container.Destroy()
+
+        by_name = {}
+        for obj, name in by_obj.items():
+            # Keep the first object in view order, like search_for_obj did
+            by_name.setdefault(name, obj)
+
+        with self._lock:
+            self._by_obj = by_obj
+            self._by_name = by_name
+            self._loaded_at = time.monotonic()
+        return by_name, by_obj
+
+    def invalidate(self):
+        """
+        Drop the cached names, the next lookup fetches them again
+        """
+        with self._lock:
+            self._by_name = None
+            self._by_obj = None
+            self._loaded_at = None
+
+    def _snapshot(self):
+        # The dicts are replaced on refresh and never modified, so a
+        # snapshot taken with the load check stays usable without the lock
+        # even if invalidate() runs meanwhile
+        with self._lock:
+            loaded_at = self._loaded_at
+            if loaded_at is not None and \
+                    (self.ttl is None or
+                     time.monotonic() - loaded_at <= self.ttl):
+                return self._by_name, self._by_obj
+        return self.refresh()
+
+    def lookup(self, name):
+        """
+        Return the managed object with the given name or None
+        """
+        by_name, _ = self._snapshot()
+        return by_name.get(name)
+
+    def lookup_many(self, names):
+        """
+        Resolve many names at once, returns a dict of name to managed
+        object for the names that were found
+        """
+        by_name, _ = self._snapshot()
+        return {name: by_name[name] for name in names if name in by_name}
+
+    def get_all(self):
+        """
+        Return a dict of managed object to name
+        """
+        _, by_obj = self._snapshot()
+        return dict(by_obj)
+
+
+def search_for_obj(content, vim_type, name, folder=None, recurse=True,
+                   name_index=None):
     """
     Search the managed object for the name and type specified
 
+    Pass a NameIndex as 'name_index' to reuse names fetched by earlier calls.
+
     Sample Usage:
 
     get_obj(content, [vim.Datastore], "Datastore Name")
     """
-    if not folder:
-        folder = content.rootFolder
+    if name_index is None:
+        name_index = NameIndex(content, vim_type, folder, recurse)
+    return name_index.lookup(name)
+
 
-    obj = {}
-    container = content.viewManager.CreateContainerView(folder, vim_type, recurse)
+def get_all_obj(content, vim_type, folder=None, recurse=True,
+                name_index=None):
+    """
+    Returns a dict of managed object to name for all objects of the types
+    specified
 
-    for managed_object_ref in container.view:
-        obj[managed_object_ref] = managed_object_ref.name
+    Pass a NameIndex as 'name_index' to reuse names fetched by earlier calls.
 
-    container.Destroy()
-    return obj
+    Sample Usage:
+
+    get_all_obj(content, [vim.VirtualMachine])
+    """
+    if name_index is None:
+        name_index = NameIndex(content, vim_type, folder, recurse)
+    return name_index.get_all()
 
 
-def get_obj(content, vim_type, name, folder=None, recurse=True):
+def get_obj(content, vim_type, name, folder=None, recurse=True,
+            name_index=None):
     """
     Retrieves the managed object for the name and type specified
     Throws an exception if of not found.
@@ -152,7 +323,27 @@ def get_obj(content, vim_type, name, folder=None, recurse=True):
 
     get_obj(content, [vim.Datastore], "Datastore Name")
     """
-    obj = search_for_obj(content, vim_type, name, folder, recurse)
+    obj = search_for_obj(content, vim_type, name, folder, recurse, name_index)
     if not obj:
         raise RuntimeError("Managed Object " + name + " not found.")
     return obj
+
+
+def get_objs(content, vim_type, names, folder=None, recurse=True,
+             name_index=None):
+    """
+    Retrieves the managed objects for all the names and type specified
+    with a single name fetch. Throws an exception if any is not found.
+
+    Sample Usage:
+
+    get_objs(content, [vim.Datastore], ["Datastore 1", "Datastore 2"])
+    """
+    if name_index is None:
+        name_index = NameIndex(content, vim_type, folder, recurse)
+    objs = name_index.lookup_many(names)
+    missing = [name for name in names if name not in objs]
+    if missing:
+        raise RuntimeError("Managed Objects " + ", ".join(missing) +
+                           " not found.")
+    return [objs[name] for name in names]
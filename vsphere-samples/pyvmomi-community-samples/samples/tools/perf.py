@@ -0,0 +1,508 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements helper functions for collecting performance
+statistics with the PerformanceManager.
+
+The counter catalog is fetched once and indexed both by full counter name
+(group.name.rollup, e.g. cpu.usagemhz.average) and by counter id. Stats for
+many entities are collected with one QueryPerf call per batch of entities,
+using the CSV format which is considerably smaller on the wire than the
+normal format. ParallelPerfCollector runs those batches concurrently across
+one or more connections and PerfColumns stores the results column-wise for
+vectorized analysis.
+
+Sample Usage:
+
+    collector = PerfCollector(content.perfManager)
+    for series in collector.query(vms, ['cpu.usagemhz.average']):
+        print(series.entity, series.counter, series.values)
+"""
+import array
+import calendar
+import collections
+import concurrent.futures
+import datetime
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from pyVmomi import vim, vmodl, Iso8601
+
+__author__ = "VMware, Inc."
+
+# Interval of the realtime statistics, in seconds
+REALTIME_INTERVAL = 20
+
+PerfSeries = collections.namedtuple(
+    'PerfSeries',
+    ['entity', 'counter', 'instance', 'timestamps', 'values'])
+PerfSeries.__doc__ = """
+Samples of one counter instance of one entity. 'counter' is the full counter
+name, 'timestamps' a list of datetime and 'values' a list of int with -1 for
+samples the server has no value for.
+"""
+
+PerfSample = collections.namedtuple(
+    'PerfSample',
+    ['timestamp', 'entity', 'counter', 'instance', 'value'])
+PerfSample.__doc__ = """
+A single sample of one counter instance of one entity.
+"""
+
+# Faults after which a QueryPerf call is retried with a smaller concurrency
+RETRIABLE_FAULTS = (vmodl.fault.SystemError, vmodl.fault.HostCommunication,
+                    OSError)
+
+
+class PerfCollector(object):
+    """
+    Batched PerformanceManager.QueryPerf collector with a cached counter
+    catalog.
+    """
+
+    def __init__(self, perf_manager, batch_size=64,
+                 interval_id=REALTIME_INTERVAL, csv=True):
+        """
+        - `perf_manager` (vim.PerformanceManager) to query.
+        - `batch_size` (int) is the number of entities per QueryPerf call.
+        - `interval_id` (int) is the sampling interval to query, the
+          realtime interval by default.
+        - `csv` (bool) requests the CSV format instead of the normal one.
+        """
+        self.perf_manager = perf_manager
+        self.batch_size = batch_size
+        self.interval_id = interval_id
+        self.csv = csv
+        self._lock = threading.Lock()
+        self._counter_ids = None
+        self._counter_names = None
+
+    def _load_counters(self):
+        with self._lock:
+            if self._counter_ids is not None:
+                return
+            counter_ids = {}
+            counter_names = {}
+            for counter in self.perf_manager.perfCounter:
+                full_name = "%s.%s.%s" % (counter.groupInfo.key,
+                                          counter.nameInfo.key,
+                                          counter.rollupType)
+                counter_ids[full_name] = counter.key
+                counter_names[counter.key] = full_name
+            self._counter_names = counter_names
+            self._counter_ids = counter_ids
+
+    def counter_id(self, name):
+        """
+        Returns the counter id for a full counter name, e.g.
+        cpu.usagemhz.average. Raises KeyError for unknown counters.
+        """
+        self._load_counters()
+        return self._counter_ids[name]
+
+    def counter_name(self, counter_id):
+        """
+        Returns the full counter name for a counter id, or the id as a
+        string for counters missing from the catalog.
+        """
+        self._load_counters()
+        return self._counter_names.get(counter_id, str(counter_id))
+
+    def metric_ids(self, counter_names, instance="*"):
+        """
+        Builds the MetricId list for counter names.
+        """
+        return [vim.PerformanceManager.MetricId(
+            counterId=self.counter_id(name), instance=instance)
+            for name in counter_names]
+
+    def build_query_specs(self, entities, counter_names=None, max_sample=1,
+                          start_time=None, end_time=None):
+        """
+        Builds one QuerySpec per entity. Without counter names all the
+        metrics available for each entity are requested.
+        """
+        metric_ids = self.metric_ids(counter_names) if counter_names else []
+        query_format = vim.PerformanceManager.Format.csv if self.csv \
+            else vim.PerformanceManager.Format.normal
+        return [vim.PerformanceManager.QuerySpec(entity=entity,
+                                                 metricId=metric_ids,
+                                                 intervalId=self.interval_id,
+                                                 maxSample=max_sample,
+                                                 startTime=start_time,
+                                                 endTime=end_time,
+                                                 format=query_format)
+                for entity in entities]
+
+    def batches(self, query_specs):
+        """
+        Splits query specs into batches of 'batch_size'.
+        """
+        return [query_specs[start:start + self.batch_size]
+                for start in range(0, len(query_specs), self.batch_size)]
+
+    def query_batches(self, query_specs):
+        """
+        Runs QueryPerf for batches of 'batch_size' query specs and yields
+        the raw EntityMetricBase results.
+        """
+        self._load_counters()
+        for batch in self.batches(query_specs):
+            for entity_metric in self.perf_manager.QueryPerf(querySpec=batch):
+                yield entity_metric
+
+    def query(self, entities, counter_names=None, max_sample=1,
+              start_time=None, end_time=None):
+        """
+        Collects stats for many entities and yields a PerfSeries per counter
+        instance, grouped by entity.
+        """
+        query_specs = self.build_query_specs(entities, counter_names,
+                                             max_sample, start_time, end_time)
+        for entity_metric in self.query_batches(query_specs):
+            for series in self.parse(entity_metric):
+                yield series
+
+    def parse(self, entity_metric):
+        """
+        Converts a normal or CSV EntityMetric into PerfSeries.
+        """
+        if isinstance(entity_metric, vim.PerformanceManager.EntityMetricCSV):
+            timestamps = _parse_sample_info_csv(entity_metric.sampleInfoCSV)
+            for metric in entity_metric.value:
+                yield PerfSeries(entity_metric.entity,
+                                 self.counter_name(metric.id.counterId),
+                                 metric.id.instance,
+                                 timestamps,
+                                 _parse_values_csv(metric.value))
+        else:
+            timestamps = [info.timestamp for info in entity_metric.sampleInfo]
+            for metric in entity_metric.value:
+                yield PerfSeries(entity_metric.entity,
+                                 self.counter_name(metric.id.counterId),
+                                 metric.id.instance,
+                                 timestamps,
+                                 list(metric.value))
+
+
+def _parse_sample_info_csv(sample_info_csv):
+    """
+    Parses 'interval,timestamp,interval,timestamp,...' into the timestamps
+    """
+    if not sample_info_csv:
+        return []
+    fields = sample_info_csv.split(',')
+    return [Iso8601.ParseISO8601(timestamp) for timestamp in fields[1::2]]
+
+
+def _parse_values_csv(values_csv):
+    """
+    Parses a CSV list of sample values, empty values become -1
+    """
+    if not values_csv:
+        return []
+    return [int(value) if value else -1 for value in values_csv.split(',')]
+
+
+class ParallelPerfCollector(object):
+    """
+    Runs the QueryPerf batches of one or more PerfCollector, typically one
+    per vCenter, on a bounded thread pool.
+
+    The SoapStubAdapter of each connection keeps a pool of HTTP connections,
+    so concurrent calls on the same connection run in parallel. The number
+    of calls in flight per connection is capped by 'max_per_endpoint' and
+    halved whenever the server answers with a server fault, then grows back
+    one call at a time as calls succeed. Failed batches are retried with
+    exponential backoff and jitter.
+
+    Sample Usage:
+
+    parallel = ParallelPerfCollector(max_workers=16, max_per_endpoint=4)
+    targets = [(PerfCollector(si.content.perfManager), vms)
+               for si, vms in connections]
+    for sample in parallel.query(targets, ['cpu.usagemhz.average']):
+        print(sample.timestamp, sample.entity, sample.value)
+    """
+
+    def __init__(self, max_workers=8, max_per_endpoint=4, retries=3,
+                 backoff=1.0):
+        self.max_workers = max_workers
+        self.max_per_endpoint = max_per_endpoint
+        self.retries = retries
+        self.backoff = backoff
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, collector):
+        # One limiter per connection, the stub outlives the collectors
+        # created for it
+        key = collector.perf_manager._stub
+        with self._limiters_lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = _AdaptiveLimiter(self.max_per_endpoint)
+                self._limiters[key] = limiter
+            return limiter
+
+    def query(self, targets, counter_names=None, max_sample=1,
+              start_time=None, end_time=None):
+        """
+        Collects stats for a list of (PerfCollector, entities) pairs and
+        yields PerfSample in timestamp order once all batches completed.
+        """
+        jobs = []
+        for collector, entities in targets:
+            query_specs = collector.build_query_specs(
+                entities, counter_names, max_sample, start_time, end_time)
+            for batch in collector.batches(query_specs):
+                jobs.append((collector, batch))
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as pool:
+            futures = [pool.submit(self._run_batch, collector, batch)
+                       for collector, batch in jobs]
+            results = [future.result() for future in futures]
+
+        for sample in heapq.merge(*results, key=lambda s: s.timestamp):
+            yield sample
+
+    def _run_batch(self, collector, batch):
+        limiter = self._limiter(collector)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            success = False
+            try:
+                entity_metrics = collector.perf_manager.QueryPerf(
+                    querySpec=batch)
+                success = True
+            except RETRIABLE_FAULTS:
+                if attempt >= self.retries:
+                    raise
+            finally:
+                limiter.release(success=success)
+            if success:
+                break
+            time.sleep(self.backoff * (2 ** attempt) *
+                       random.uniform(0.5, 1.5))
+            attempt += 1
+
+        samples = []
+        for entity_metric in entity_metrics:
+            for series in collector.parse(entity_metric):
+                for timestamp, value in zip(series.timestamps, series.values):
+                    samples.append(PerfSample(timestamp, series.entity,
+                                              series.counter, series.instance,
+                                              value))
+        samples.sort(key=lambda sample: sample.timestamp)
+        return samples
+
+
+class _AdaptiveLimiter(object):
+    """
+    Semaphore whose limit is halved on failure and grows back by one after
+    as many consecutive successes as the current limit.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self._active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self, success):
+        with self._cond:
+            self._active -= 1
+            if success:
+                self._successes += 1
+                if self._successes >= self.limit and \
+                        self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            else:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            self._cond.notify_all()
+
+
+class PerfColumns(object):
+    """
+    Columnar store of performance samples.
+
+    Every sample is one row across five parallel arrays: 'entity',
+    'counter' and 'instance' hold int32 indexes into the 'entities',
+    'counters' and 'instances' lookup lists, 'timestamp' holds int64 epoch
+    seconds and 'value' float64 values, with NaN for samples the server has
+    no value for. The arrays are stdlib array.array objects, so they export
+    the buffer protocol: to_numpy() wraps them without copying if NumPy is
+    installed and save() writes them as .npy files straight from memory.
+
+    Sample Usage:
+
+    columns = PerfColumns()
+    columns.extend_series(collector.query(vms))
+    columns.save('/tmp/perf')
+    # later: numpy.load('/tmp/perf/value.npy')
+    """
+
+    COLUMNS = ('entity', 'counter', 'instance', 'timestamp', 'value')
+
+    def __init__(self):
+        self.entities = []
+        self.counters = []
+        self.instances = []
+        self._entity_index = {}
+        self._counter_index = {}
+        self._instance_index = {}
+        self.entity = array.array('i')
+        self.counter = array.array('i')
+        self.instance = array.array('i')
+        self.timestamp = array.array('q')
+        self.value = array.array('d')
+
+    def __len__(self):
+        return len(self.value)
+
+    @staticmethod
+    def _index(lookup, index, key):
+        position = index.get(key)
+        if position is None:
+            position = index[key] = len(lookup)
+            lookup.append(key)
+        return position
+
+    def append_series(self, entity, counter, instance, timestamps, values):
+        """
+        Appends the samples of one counter instance of one entity.
+        Negative values are the server's marker for missing samples and
+        are stored as NaN.
+        """
+        count = min(len(timestamps), len(values))
+        if not count:
+            return
+        self.entity.extend([self._index(self.entities, self._entity_index,
+                                        entity)] * count)
+        self.counter.extend([self._index(self.counters, self._counter_index,
+                                         counter)] * count)
+        self.instance.extend([self._index(self.instances,
+                                          self._instance_index,
+                                          instance)] * count)
+        self.timestamp.extend(_epoch_seconds(timestamp)
+                              for timestamp in timestamps[:count])
+        self.value.extend(float(value) if value >= 0 else float('nan')
+                          for value in values[:count])
+
+    def extend_series(self, series_list):
+        """
+        Appends PerfSeries, e.g. the output of PerfCollector.query().
+        """
+        for series in series_list:
+            self.append_series(series.entity, series.counter, series.instance,
+                               series.timestamps, series.values)
+
+    def extend_samples(self, samples):
+        """
+        Appends PerfSample, e.g. the output of ParallelPerfCollector.query().
+        """
+        for sample in samples:
+            self.append_series(sample.entity, sample.counter, sample.instance,
+                               [sample.timestamp], [sample.value])
+
+    def extend_vsan_metrics(self, entity_metrics):
+        """
+        Appends the VsanPerfEntityMetricCSV results of
+        VsanPerformanceManager.VsanPerfQueryPerf. Entities are the
+        entityRefId strings and counters the metric labels.
+        """
+        for entity_metric in entity_metrics:
+            timestamps = [datetime.datetime.strptime(timestamp,
+                                                     '%Y-%m-%d %H:%M:%S')
+                          for timestamp in
+                          (entity_metric.sampleInfo or '').split(',')
+                          if timestamp]
+            for metric in entity_metric.value:
+                values = [float(value) if value else -1.0
+                          for value in (metric.values or '').split(',')]
+                self.append_series(entity_metric.entityRefId,
+                                   metric.metricId.label, '',
+                                   timestamps, values)
+
+    def to_numpy(self):
+        """
+        Returns a dict of column name to a NumPy array sharing the memory
+        of the column. Requires NumPy.
+        """
+        import numpy
+        return {name: numpy.frombuffer(getattr(self, name),
+                                       dtype=_npy_descr(getattr(self, name)))
+                for name in self.COLUMNS}
+
+    def save(self, directory):
+        """
+        Writes one .npy file per column and the lookup lists to
+        'lookup.json' in 'directory'.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in self.COLUMNS:
+            _write_npy(os.path.join(directory, name + '.npy'),
+                       getattr(self, name))
+        with open(os.path.join(directory, 'lookup.json'), 'w') as lookup:
+            json.dump({'entities': [str(entity) for entity in self.entities],
+                       'counters': self.counters,
+                       'instances': self.instances}, lookup)
+
+
+def _epoch_seconds(timestamp):
+    """
+    Converts a datetime, naive ones being UTC, to epoch seconds
+    """
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+def _npy_descr(column):
+    byte_order = '<' if sys.byteorder == 'little' else '>'
+    kind = 'f' if column.typecode == 'd' else 'i'
+    return '%s%s%d' % (byte_order, kind, column.itemsize)
+
+
+def _write_npy(path, column):
+    """
+    Writes a one dimensional array.array in the NumPy .npy format 1.0
+    """
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        _npy_descr(column), len(column))
+    # magic (6) + version (2) + header length (2) + header, padded with
+    # spaces and a newline so the data starts on a 64 byte boundary
+    padding = -(10 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    with open(path, 'wb') as npy:
+        npy.write(b'\x93NUMPY\x01\x00')
+        npy.write(len(header).to_bytes(2, 'little'))
+        npy.write(header)
+        npy.write(memoryview(column))
@@ -0,0 +1,275 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements streaming deserialization of large SOAP responses.
+
+SoapStubAdapter.InvokeMethod reads and deserializes the whole response
+before returning it, so the complete result of e.g. a RetrievePropertiesEx
+over a big inventory or a QueryPerf over many entities is in memory at once.
+The functions here send the same request but feed the response to expat as
+it is read from the socket and hand out each repeated item, an ObjectContent
+or a performance EntityMetric, as soon as its closing element has been
+parsed. Items that the caller has processed can be garbage collected while
+the rest of the response is still being read.
+
+Sample Usage:
+
+    for obj in soap_stream.retrieve_properties(si, [filter_spec]):
+        print(obj.obj, obj.propSet[0].val)
+
+    for entity_metric in soap_stream.query_perf(perf_manager, specs):
+        ...
+"""
+import collections
+from http.client import HTTPException
+from xml.parsers.expat import ParserCreate
+
+from pyVmomi import vim, vmodl
+from pyVmomi.SoapAdapter import (
+    NS_SEP,
+    XMLNS_SOAPENV,
+    ExpatDeserializerNSHandlers,
+    GetHandlers,
+    GzipReader,
+    SetHandlers,
+    SoapDeserializer
+)
+
+__author__ = "VMware, Inc."
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def retrieve_properties(si, filter_specs, max_objects=None):
+    """
+    Streams the ObjectContent results of RetrievePropertiesEx, following
+    the continuation tokens with ContinueRetrievePropertiesEx. A retrieval
+    stopped early is released with CancelRetrievePropertiesEx.
+    """
+    collector = si.content.propertyCollector
+    options = vmodl.query.PropertyCollector.RetrieveOptions(
+        maxObjects=max_objects)
+    call = StreamingCall(collector, 'RetrievePropertiesEx',
+                         [filter_specs, options],
+                         vmodl.query.PropertyCollector.ObjectContent,
+                         ('returnval', 'objects'))
+    while True:
+        objects = iter(call)
+        try:
+            for obj in objects:
+                yield obj
+        except GeneratorExit:
+            objects.close()
+            # The token precedes the objects of a RetrieveResult, so it is
+            # known once the first object was streamed
+            token = call.fields.get('token')
+            if token:
+                collector.CancelRetrievePropertiesEx(token)
+            raise
+        token = call.fields.get('token')
+        if not token:
+            return
+        call = StreamingCall(collector, 'ContinueRetrievePropertiesEx',
+                             [token],
+                             vmodl.query.PropertyCollector.ObjectContent,
+                             ('returnval', 'objects'))
+
+
+def query_perf(perf_manager, query_specs):
+    """
+    Streams the EntityMetric results of PerformanceManager.QueryPerf.
+    """
+    return iter(StreamingCall(perf_manager, 'QueryPerf', [query_specs],
+                              vim.PerformanceManager.EntityMetricBase,
+                              ('returnval',)))
+
+
+class StreamingCall(object):
+    """
+    Iterable over the items of one method call, deserialized as they arrive.
+
+    - `mo` (ManagedObject) is the object to invoke the method on.
+    - `method` (str) is the method name, e.g. 'RetrievePropertiesEx'.
+    - `args` (list) are the method arguments in declaration order.
+    - `item_type` (type) is the static type of the streamed items.
+    - `item_path` (tuple) are the element names from the response element
+      down to the repeated item element.
+
+    Text values of other elements along 'item_path', like the token of a
+    RetrieveResult, are collected in 'fields' as they are parsed.
+    """
+
+    def __init__(self, mo, method, args, item_type, item_path):
+        self.mo = mo
+        self.stub = mo._stub
+        self.info = mo._GetMethodInfo(method)
+        self.args = list(args) + [None] * (len(self.info.params) - len(args))
+        self.item_type = item_type
+        self.item_path = item_path
+        self.fields = {}
+
+    def __iter__(self):
+        stub = self.stub
+        request = stub.SerializeRequest(self.mo, self.info, self.args)
+        for modifier in stub.requestModifierList:
+            request = modifier(request)
+        headers = {
+            'Cookie': stub.cookie,
+            'SOAPAction': stub.versionId,
+            'Content-Type': 'text/xml; charset=UTF-8',
+        }
+        if stub._customHeaders:
+            headers.update(stub._customHeaders)
+        if stub._acceptCompressedResponses:
+            headers['Accept-Encoding'] = 'gzip, deflate'
+
+        conn = stub.GetConnection()
+        try:
+            conn.request('POST', stub.path, request, headers)
+            resp = conn.getresponse()
+            if resp.status not in (200, 500):
+                raise HTTPException("{0} {1}".format(resp.status,
+                                                     resp.reason))
+            fd = resp
+            encoding = resp.getheader('Content-Encoding', 'identity').lower()
+            if encoding == 'gzip':
+                fd = GzipReader(resp, encoding=GzipReader.GZIP)
+            elif encoding == 'deflate':
+                fd = GzipReader(resp, encoding=GzipReader.DEFLATE)
+
+            parser = _StreamingResponseParser(stub, self.item_type,
+                                              self.item_path)
+            self.fields = parser.fields
+            while True:
+                chunk = fd.read(READ_CHUNK_SIZE)
+                parser.feed(chunk, final=not chunk)
+                while parser.items:
+                    yield parser.items.popleft()
+                if not chunk:
+                    break
+        except GeneratorExit:
+            # Stopped early, the rest of the response is not read
+            conn.close()
+            raise
+        except BaseException:
+            conn.close()
+            # The server might be sick, as in SoapStubAdapter drop all the
+            # cached connections
+            stub.DropConnections()
+            raise
+        stub.ReturnConnection(conn)
+
+        if parser.fault is not None:
+            raise parser.fault
+
+
+class _ItemDeserializer(SoapDeserializer):
+    """
+    SoapDeserializer for one item that reports its result once the closing
+    element of the item has been parsed.
+    """
+
+    def __init__(self, stub, on_result):
+        SoapDeserializer.__init__(self, stub)
+        self.on_result = on_result
+
+    def EndElementHandler(self, tag):
+        SoapDeserializer.EndElementHandler(self, tag)
+        # The base class drops its stack once the item is complete
+        if not hasattr(self, 'stack'):
+            self.on_result(self.result)
+
+
+class _StreamingResponseParser(ExpatDeserializerNSHandlers):
+    """
+    Expat handlers that walk a SOAP response and hand each item element
+    over to an _ItemDeserializer.
+    """
+
+    def __init__(self, stub, item_type, item_path):
+        ExpatDeserializerNSHandlers.__init__(self)
+        self.stub = stub
+        self.item_type = item_type
+        self.item_path = item_path
+        self.items = collections.deque()
+        self.fields = {}
+        self.fault = None
+        self._path = []
+        self._in_response = False
+        self._in_fault = False
+        self._fault_deserializer = None
+        self._fault_message = ''
+        self._data = ''
+        self.parser = ParserCreate(namespace_separator=NS_SEP)
+        self.parser.buffer_text = True
+        SetHandlers(self.parser, GetHandlers(self))
+
+    def feed(self, data, final=False):
+        self.parser.Parse(data, final)
+
+    @staticmethod
+    def _name(tag):
+        return tag.rsplit(NS_SEP, 1)[-1]
+
+    def StartElementHandler(self, tag, attr):
+        self._data = ''
+        if tag == XMLNS_SOAPENV + NS_SEP + 'Fault':
+            self._in_fault = True
+            return
+        if self._in_fault:
+            if self._name(tag) == 'detail':
+                self._fault_deserializer = SoapDeserializer(self.stub)
+                self._fault_deserializer.Deserialize(self.parser, object,
+                                                     True, self.nsMap)
+            return
+        if not self._in_response:
+            self._in_response = tag.endswith('Response')
+            return
+
+        self._path.append(self._name(tag))
+        if tuple(self._path) == self.item_path:
+            self._path.pop()
+            deserializer = _ItemDeserializer(self.stub, self.items.append)
+            deserializer.Deserialize(self.parser, self.item_type, False,
+                                     self.nsMap)
+            # Replay the item start tag to the deserializer which now owns
+            # the parser handlers until the item end tag
+            deserializer.StartElementHandler(tag, attr)
+
+    def EndElementHandler(self, tag):
+        if self._in_fault:
+            if self._name(tag) == 'faultstring':
+                self._fault_message = self._data
+            elif tag == XMLNS_SOAPENV + NS_SEP + 'Fault':
+                self._in_fault = False
+                fault = None
+                if self._fault_deserializer is not None:
+                    fault = self._fault_deserializer.GetResult()
+                if fault is None:
+                    fault = vmodl.RuntimeFault()
+                fault.msg = self._fault_message
+                self.fault = fault
+            return
+        if self._path:
+            name = self._path.pop()
+            if self._data:
+                self.fields[name] = self._data
+                self._data = ''
+        elif self._in_response and tag.endswith('Response'):
+            self._in_response = False
+
+    def CharacterDataHandler(self, data):
+        self._data += data
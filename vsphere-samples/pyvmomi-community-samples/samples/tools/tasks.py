@@ -9,52 +9,250 @@ http://www.apache.org/licenses/LICENSE-2.0.html
 
 Helper module for task operations.
 """
+import concurrent.futures
+import threading
+
 from pyVmomi import vim
 from pyVmomi import vmodl
 
 
-def wait_for_tasks(si, tasks):
-    """Given the service instance and tasks, it returns after all the
-   tasks are complete
-   """
-    property_collector = si.content.propertyCollector
-    task_list = [str(task) for task in tasks]
-    # Create filter
-    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=task)
-                 for task in tasks]
-    property_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.Task,
-                                                               pathSet=[],
-                                                               all=True)
-    filter_spec = vmodl.query.PropertyCollector.FilterSpec()
-    filter_spec.objectSet = obj_specs
-    filter_spec.propSet = [property_spec]
-    pcfilter = property_collector.CreateFilter(filter_spec, True)
-    try:
-        version, state = None, None
-        # Loop looking for updates till the state moves to a completed state.
-        while task_list:
-            update = property_collector.WaitForUpdates(version)
+class TaskMonitor(object):
+    """
+    Tracks the completion of many tasks with a single WaitForUpdatesEx
+    stream.
+
+    Each tracked task gets its own filter on a private PropertyCollector
+    that is created once per ServiceInstance, so tasks can be added and
+    removed at any time while one background thread waits for updates on
+    behalf of all of them. Completion is reported through
+    concurrent.futures.Future objects, which can be awaited from asyncio
+    code with add_async().
+
+    Sample Usage:
+
+    monitor = TaskMonitor.get(si)
+    futures = [monitor.add(vm.PowerOn()) for vm in vms]
+    concurrent.futures.wait(futures)
+    """
+
+    _monitors = {}
+    _monitors_lock = threading.Lock()
+
+    TASK_PROPERTIES = ['info.state', 'info.result', 'info.error']
+
+    def __init__(self, si, max_wait_seconds=30):
+        self._stub = si._stub
+        self._collector = \
+            si.content.propertyCollector.CreatePropertyCollector()
+        self._wait_options = vmodl.query.PropertyCollector.WaitOptions(
+            maxWaitSeconds=max_wait_seconds)
+        self._cond = threading.Condition()
+        # str(task) -> _TrackedTask
+        self._pending = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='TaskMonitor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @classmethod
+    def get(cls, si):
+        """
+        Returns the shared monitor for the connection of 'si', creating it
+        on first use.
+        """
+        with cls._monitors_lock:
+            monitor = cls._monitors.get(si._stub)
+            if monitor is None or monitor._closed:
+                monitor = cls(si)
+                cls._monitors[si._stub] = monitor
+            return monitor
+
+    def add(self, task):
+        """
+        Starts tracking a task, returns a Future that resolves to the task
+        result or raises the task error.
+        """
+        key = str(task)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("TaskMonitor is closed")
+            if key in self._pending:
+                return self._pending[key].future
+            # Registered before the filter exists so an update racing with
+            # CreateFilter is not dropped
+            tracked = _TrackedTask()
+            self._pending[key] = tracked
+            self._cond.notify()
+
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=task)
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.Task, pathSet=self.TASK_PROPERTIES, all=False)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[obj_spec], propSet=[property_spec])
+        try:
+            pcfilter = self._collector.CreateFilter(filter_spec, True)
+        except Exception:
+            with self._cond:
+                self._pending.pop(key, None)
+            raise
+
+        with self._cond:
+            tracked.filter = pcfilter
+            finished = key not in self._pending
+        if finished:
+            pcfilter.Destroy()
+
+        tracked.future.add_done_callback(
+            lambda future: self._on_done(task, future))
+        return tracked.future
+
+    def add_async(self, task):
+        """
+        Same as add() but returns an asyncio future bound to the running
+        event loop.
+        """
+        import asyncio
+        return asyncio.wrap_future(self.add(task))
+
+    def remove(self, task):
+        """
+        Stops tracking a task, its future is cancelled if still pending.
+        """
+        with self._cond:
+            tracked = self._pending.pop(str(task), None)
+        if tracked is None:
+            return
+        tracked.future.cancel()
+        if tracked.filter is not None:
+            tracked.filter.Destroy()
+
+    def _on_done(self, task, future):
+        if future.cancelled():
+            self.remove(task)
+
+    def close(self):
+        """
+        Cancels all pending futures and releases the server side collector.
+        """
+        with self._cond:
+            if self._closed:
+                # Already closed, or its session ended
+                return
+            self._closed = True
+            pending, self._pending = self._pending, {}
+            self._cond.notify()
+        self._unregister()
+        for tracked in pending.values():
+            tracked.future.cancel()
+        self._collector.CancelWaitForUpdates()
+        self._thread.join()
+        self._collector.Destroy()
+
+    def _unregister(self):
+        with self._monitors_lock:
+            if self._monitors.get(self._stub) is self:
+                del self._monitors[self._stub]
+
+    def _run(self):
+        version = ''
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+            try:
+                update = self._collector.WaitForUpdatesEx(
+                    version, self._wait_options)
+            except vmodl.fault.RequestCanceled:
+                continue
+            except Exception as ex:
+                # The session is unusable, fail everything waiting on it and
+                # let get() create a new monitor for the next tasks
+                with self._cond:
+                    self._closed = True
+                    pending, self._pending = self._pending, {}
+                self._unregister()
+                for tracked in pending.values():
+                    if not tracked.future.done():
+                        tracked.future.set_exception(ex)
+                    if tracked.filter is not None:
+                        _destroy_quietly(tracked.filter)
+                _destroy_quietly(self._collector)
+                return
+
+            # timeout, call again
+            if update is None:
+                continue
+
             for filter_set in update.filterSet:
                 for obj_set in filter_set.objectSet:
-                    task = obj_set.obj
-                    for change in obj_set.changeSet:
-                        if change.name == 'info':
-                            state = change.val.state
-                        elif change.name == 'info.state':
-                            state = change.val
-                        else:
-                            continue
-
-                        if not str(task) in task_list:
-                            continue
-
-                        if state == vim.TaskInfo.State.success:
-                            # Remove task from taskList
-                            task_list.remove(str(task))
-                        elif state == vim.TaskInfo.State.error:
-                            raise task.info.error
-            # Move to next version
+                    self._process(obj_set)
             version = update.version
-    finally:
-        if pcfilter:
+
+    def _process(self, obj_set):
+        key = str(obj_set.obj)
+        with self._cond:
+            tracked = self._pending.get(key)
+            if tracked is None:
+                return
+            for change in obj_set.changeSet:
+                tracked.values[change.name] = change.val
+
+            state = tracked.values.get('info.state')
+            if state not in (vim.TaskInfo.State.success,
+                             vim.TaskInfo.State.error):
+                return
+            del self._pending[key]
+            # add() destroys the filter itself if it is not assigned yet
+            pcfilter = tracked.filter
+
+        if pcfilter is not None:
             pcfilter.Destroy()
+        if tracked.future.done():
+            return
+        if state == vim.TaskInfo.State.success:
+            tracked.future.set_result(tracked.values.get('info.result'))
+        else:
+            tracked.future.set_exception(tracked.values.get('info.error'))
+
+
+def _destroy_quietly(managed_object):
+    # Releases a server side object of a session that may have ended
+    try:
+        managed_object.Destroy()
+    except Exception:
+        pass
+
+
+class _TrackedTask(object):
+    """
+    Bookkeeping for a task tracked by TaskMonitor
+    """
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.filter = None
+        self.values = {}
+
+
+def wait_for_task(task):
+    """Given a task, it returns the task result once it is complete or
+   raises the task error
+   """
+    si = vim.ServiceInstance('ServiceInstance', task._stub)
+    return TaskMonitor.get(si).add(task).result()
+
+
+def wait_for_tasks(si, tasks):
+    """Given the service instance and tasks, it returns after all the
+   tasks are complete
+   """
+    monitor = TaskMonitor.get(si)
+    futures = [monitor.add(task) for task in tasks]
+    done, _ = concurrent.futures.wait(
+        futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+    for future in done:
+        if future.exception() is not None:
+            raise future.exception()
@@ -13,79 +13,60 @@
      VM tools must be installed on all virtual machines.
 """
 
-import sys
 from pyVmomi import vim
-from tools import cli, service_instance
+from tools import cli, service_instance, pchelper, perf
 
 
 def main():
 
     parser = cli.Parser()
+    parser.add_custom_argument('--batch-size', type=int, default=64,
+                               help='Number of VMs per QueryPerf call')
+    parser.add_custom_argument('--save-columns', metavar='DIRECTORY',
+                               help='Also save the samples as .npy columns')
     args = parser.get_args()
     si = service_instance.connect(args)
 
     content = si.RetrieveContent()
-    perf_manager = content.perfManager
 
-    # create a mapping from performance stats to their counterIDs
-    # counterInfo: [performance stat => counterId]
+    # The collector caches the counter catalog, mapping both
+    # performance stat => counterId and counterId => performance stat
     # performance stat example: cpu.usagemhz.LATEST
     # counterId example: 6
-    counter_info = {}
-    for counter in perf_manager.perfCounter:
-        full_name = counter.groupInfo.key + "." + \
-                    counter.nameInfo.key + "." + counter.rollupType
-        counter_info[full_name] = counter.key
-
-    # create a list of vim.VirtualMachine objects so
-    # that we can query them for statistics
-    container = content.rootFolder
-    view_type = [vim.VirtualMachine]
-    recursive = True
-
-    container_view = content.viewManager.CreateContainerView(container, view_type, recursive)
-    children = container_view.view
-
-    # Loop through all the VMs
-    for child in children:
-        # Get all available metric IDs for this VM
-        counter_ids = [m.counterId for m in perf_manager.QueryAvailablePerfMetric(entity=child)]
-
-        # Using the IDs form a list of MetricId
-        # objects for building the Query Spec
-        metric_ids = [vim.PerformanceManager.MetricId(
-            counterId=counter, instance="*") for counter in counter_ids]
-
-        # Build the specification to be used
-        # for querying the performance manager
-        spec = vim.PerformanceManager.QuerySpec(maxSample=1,
-                                                entity=child,
-                                                metricId=metric_ids)
-        # Query the performance manager
-        # based on the metrics created above
-        result_stats = perf_manager.QueryStats(querySpec=[spec])
-
-        # Loop through the results and print the output
-        output = ""
-        for _ in result_stats:
-            output += "name:        " + child.summary.config.name + "\n"
-            for val in result_stats[0].value:
-                # python3
-                if sys.version_info[0] > 2:
-                    counterinfo_k_to_v = list(counter_info.keys())[
-                        list(counter_info.values()).index(val.id.counterId)]
-                # python2
-                else:
-                    counterinfo_k_to_v = counter_info.keys()[
-                        counter_info.values().index(val.id.counterId)]
-                if val.id.instance == '':
-                    output += "%s: %s\n" % (
-                        counterinfo_k_to_v, str(val.value[0]))
-                else:
-                    output += "%s (%s): %s\n" % (
-                        counterinfo_k_to_v, val.id.instance, str(val.value[0]))
-
-        print(output)
+    collector = perf.PerfCollector(content.perfManager,
+                                   batch_size=args.batch_size)
+
+    # create a mapping of vim.VirtualMachine objects to their names
+    # so that we can query them for statistics
+    vm_names = pchelper.get_all_obj(content, [vim.VirtualMachine])
+
+    # Query the performance manager for all the metrics available for
+    # each VM, many VMs per call. The results are grouped by VM.
+    columns = perf.PerfColumns()
+    current_vm = None
+    output = []
+    for series in collector.query(list(vm_names), max_sample=1):
+        if args.save_columns:
+            columns.extend_series([series])
+        if series.entity != current_vm:
+            if output:
+                print("\n".join(output) + "\n")
+            current_vm = series.entity
+            output = ["name:        " + vm_names[current_vm]]
+        if not series.values:
+            continue
+        if series.instance == '':
+            output.append("%s: %s" % (series.counter, series.values[0]))
+        else:
+            output.append("%s (%s): %s" % (
+                series.counter, series.instance, series.values[0]))
+
+    if output:
+        print("\n".join(output) + "\n")
+
+    if args.save_columns:
+        columns.save(args.save_columns)
+        print("Saved %d samples to %s" % (len(columns), args.save_columns))
 
 
 if __name__ == "__main__":
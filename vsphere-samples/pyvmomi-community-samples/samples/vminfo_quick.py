@@ -48,12 +48,16 @@ atexit.register(endit)
 
 root_folder = si.content.rootFolder
 view = pchelper.get_container_view(si, obj_type=[vim.VirtualMachine])
-vm_data = pchelper.collect_properties(si,
-                                      view_ref=view,
-                                      obj_type=vim.VirtualMachine,
-                                      path_set=vm_properties,
-                                      include_mors=True)
+# Stream the VMs page by page so output starts before the whole
+# inventory has been retrieved
+vm_data = pchelper.iter_properties(si,
+                                   view_ref=view,
+                                   obj_type=vim.VirtualMachine,
+                                   path_set=vm_properties,
+                                   include_mors=True)
+vm_count = 0
 for vm in vm_data:
+    vm_count += 1
     print("-" * 70)
     print("Name:                    {0}".format(vm["name"]))
     print("BIOS UUID:               {0}".format(vm["config.uuid"]))
@@ -67,4 +71,4 @@ for vm in vm_data:
 
 
 print("")
-print("Found {0} VirtualMachines.".format(len(vm_data)))
+print("Found {0} VirtualMachines.".format(vm_count))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2016-2025 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes sample codes for fleet wide vSAN space reporting with the
+vSAN mass collector.
+
+Instead of resolving clusters one by one and calling QuerySpaceUsage for each
+of them, the space usage of every vSAN enabled cluster of a vCenter is
+retrieved by a single VsanRetrieveProperties call of the vsan-mass-collector.
+The usage by object type is aggregated in one pass per cluster, and one row
+per cluster is printed as CSV, suitable for appending to a trending data set:
+
+vc,cluster,totalB,usedB,freeB,efficiencySavedB,vdiskB,vmswapB,...
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+import sys
+import ssl
+import atexit
+import argparse
+import csv
+import getpass
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append("/usr/lib64/vmware-vpx/vsan-health/")
+sys.path.append("/usr/lib/vmware/site-packages/")
+from pyVmomi import vim, vmodl
+from pyVim.connect import SmartConnect, Disconnect
+
+import vsanmgmtObjects
+import vsanapiutils
+
+# Mass collector property returning the VsanSpaceUsage of a cluster, named
+# after the vSAN API it runs. The vSAN bindings do not list the property names
+# the mass collector serves, so a vCenter returning no space usage at all for
+# it is reported as an InvalidProperty and every cluster is queried one by one.
+# Clusters only some of the results are missing for are queried one by one too.
+SPACE_USAGE_PROPERTY = 'vsanQuerySpaceUsage'
+
+OBJECT_TYPES = ['vdisk', 'vmswap', 'statsdb', 'namespace', 'traceobject',
+                'esaObjectOverhead', 'fileSystemOverhead']
+
+COLUMNS = ['vc', 'cluster', 'totalB', 'usedB', 'freeB', 'efficiencySavedB'] + \
+          ['%sB' % objType for objType in OBJECT_TYPES] + ['otherB']
+
+def GetArgs():
+   """
+   Supports the command-line arguments listed below.
+   """
+   parser = argparse.ArgumentParser(
+       description=
+       'vSAN SDK sample application for fleet wide vSAN space reporting. '
+       'It collects the space usage of all vSAN clusters of the given '
+       'vCenter Servers with the vSAN mass collector and prints one CSV row '
+       'per cluster.')
+   parser.add_argument('-v', '--vc', required=True, action='append',
+                       help='Remote vCenter Server to connect to, can be '
+                            'given several times')
+   parser.add_argument('-o', '--port', type=int, default=443, action='store',
+                       help='Port to connect on, default is 443')
+   parser.add_argument('-u', '--user', required=True, action='store',
+                       help='User name to use when connecting to '
+                            'vCenter Server')
+   parser.add_argument('-p', '--password', required=False, action='store',
+                       help='Password to use when connecting to vCenter '
+                            'Server. If not provided, it will prompt to '
+                            'ask for manually inputting the password')
+   parser.add_argument('--workers', type=int, default=8, action='store',
+                       help='Concurrent QuerySpaceUsage calls when the mass '
+                            'collector does not return the space usage')
+   parser.add_argument('--no-header', dest='header', action='store_false',
+                       help='Do not print the CSV header, e.g. when '
+                            'appending to an existing file')
+   args = parser.parse_args()
+   return args
+
+def GetClusterNames(si):
+   """
+   Retrieves the names of all clusters in one property collector call
+   @return dict of cluster moId to name
+   """
+   content = si.RetrieveContent()
+   view = content.viewManager.CreateContainerView(
+      content.rootFolder, [vim.ClusterComputeResource], True)
+   try:
+      traversal = vmodl.query.PropertyCollector.TraversalSpec(
+         name='traverseView', path='view', skip=False,
+         type=vim.view.ContainerView)
+      filterSpec = vmodl.query.PropertyCollector.FilterSpec(
+         objectSet=[vmodl.query.PropertyCollector.ObjectSpec(
+            obj=view, skip=True, selectSet=[traversal])],
+         propSet=[vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.ClusterComputeResource, pathSet=['name'])])
+      names = {}
+      result = content.propertyCollector.RetrievePropertiesEx(
+         [filterSpec], vmodl.query.PropertyCollector.RetrieveOptions())
+      while result:
+         for objContent in result.objects:
+            names[objContent.obj._moId] = objContent.propSet[0].val
+         if not result.token:
+            break
+         result = content.propertyCollector.ContinueRetrievePropertiesEx(
+            result.token)
+      return names
+   finally:
+      view.Destroy()
+
+def CollectSpaceUsage(vsanMos):
+   """
+   Retrieves the space usage of all vSAN enabled clusters with one
+   VsanRetrieveProperties call of the mass collector
+   @return dict of cluster moId to VsanSpaceUsage, None for the clusters the
+           mass collector returned no space usage for
+   @raise vmodl.query.InvalidProperty if it returned no space usage at all
+   """
+   massCollector = vsanMos['vsan-mass-collector']
+   spec = vim.VsanMassCollectorSpec(
+      objectCollection='ALL_VSAN_ENABLED_CLUSTERS',
+      properties=[SPACE_USAGE_PROPERTY])
+   spaceUsages = {}
+   for objContent in massCollector.VsanRetrieveProperties(
+         massCollectorSpecs=[spec]) or []:
+      spaceUsage = None
+      for prop in objContent.propSet or []:
+         if prop.name == SPACE_USAGE_PROPERTY:
+            spaceUsage = prop.val
+      spaceUsages[objContent.obj._moId] = spaceUsage
+   if spaceUsages and all(usage is None for usage in spaceUsages.values()):
+      raise vmodl.query.InvalidProperty(
+         name=SPACE_USAGE_PROPERTY,
+         msg="The mass collector returned no %s for any of %d clusters" %
+             (SPACE_USAGE_PROPERTY, len(spaceUsages)))
+   return spaceUsages
+
+def QueryMissingSpaceUsage(vsanMos, vcStub, spaceUsages, workers):
+   """
+   Calls QuerySpaceUsage concurrently for the clusters the mass collector
+   returned no space usage for
+   """
+   vss = vsanMos['vsan-cluster-space-report-system']
+   missing = [moId for moId, usage in spaceUsages.items() if usage is None]
+
+   def query(moId):
+      try:
+         return vss.QuerySpaceUsage(
+            cluster=vim.ClusterComputeResource(moId, vcStub))
+      except vmodl.MethodFault as e:
+         # e.g. a cluster without vSAN, it is left out of the report
+         print("Skipping cluster %s: %s" % (moId, e.msg), file=sys.stderr)
+         return None
+
+   if missing:
+      with ThreadPoolExecutor(max_workers=workers) as executor:
+         for moId, usage in zip(missing, executor.map(query, missing)):
+            spaceUsages[moId] = usage
+   return spaceUsages
+
+def SummarizeSpaceUsage(spaceResult):
+   """
+   Flattens a VsanSpaceUsage into a dict, with the used bytes by object type
+   aggregated in a single pass
+   """
+   row = dict.fromkeys(COLUMNS[2:], 0)
+   row['totalB'] = spaceResult.totalCapacityB or 0
+   row['freeB'] = spaceResult.freeCapacityB or 0
+   if spaceResult.spaceOverview is not None:
+      row['usedB'] = spaceResult.spaceOverview.usedB or 0
+   efficientCapacity = getattr(spaceResult, 'efficientCapacity', None)
+   if efficientCapacity is not None:
+      row['efficiencySavedB'] = \
+         (efficientCapacity.logicalCapacityUsed or 0) - \
+         (efficientCapacity.physicalCapacityUsed or 0)
+   if spaceResult.spaceDetail is not None:
+      for obj in spaceResult.spaceDetail.spaceUsageByObjectType or []:
+         key = '%sB' % obj.objType
+         if key not in row or key in COLUMNS[:6]:
+            key = 'otherB'
+         row[key] += obj.usedB or 0
+   return row
+
+def ReportVc(vc, args, password, sslContext):
+   """
+   Collects the space report rows of all vSAN clusters of a vCenter
+   """
+   si = SmartConnect(host=vc,
+                     user=args.user,
+                     pwd=password,
+                     port=int(args.port),
+                     sslContext=sslContext)
+   atexit.register(Disconnect, si)
+   if si.content.about.apiType != 'VirtualCenter':
+      raise Exception("The sample script should be run against vc.")
+
+   # Reports run periodically against the same vCenters, reuse the versions
+   # negotiated by earlier runs
+   apiVersion = vsanapiutils.GetLatestVmodlVersion(
+      vc, int(args.port), cacheFile=vsanapiutils.VSAN_VERSION_CACHE_FILE)
+   vsanMos = vsanapiutils.GetVsanVcMos(si._stub,
+                                       context=sslContext,
+                                       version=apiVersion)
+
+   start = time.time()
+   names = GetClusterNames(si)
+   try:
+      spaceUsages = CollectSpaceUsage(vsanMos)
+   except vmodl.MethodFault as e:
+      # Mass collector without the space usage property, e.g. InvalidProperty,
+      # NotSupported or InvalidArgument, query every cluster and say so loudly
+      # as it is one call per cluster
+      print("The mass collector failed, querying every cluster: %s" % e.msg,
+            file=sys.stderr)
+      spaceUsages = dict.fromkeys(names, None)
+   spaceUsages = QueryMissingSpaceUsage(vsanMos, si._stub, spaceUsages,
+                                        args.workers)
+   print("Collected the space usage of %d clusters of %s in %.1f seconds" %
+         (len(spaceUsages), vc, time.time() - start), file=sys.stderr)
+
+   rows = []
+   for moId, spaceResult in sorted(spaceUsages.items(),
+                                   key=lambda item: names.get(item[0], '')):
+      if spaceResult is None:
+         continue
+      row = SummarizeSpaceUsage(spaceResult)
+      row['vc'] = vc
+      row['cluster'] = names.get(moId, moId)
+      rows.append(row)
+   return rows
+
+def main():
+   args = GetArgs()
+   if args.password:
+      password = args.password
+   else:
+      password = getpass.getpass(prompt='Enter password for user %s: ' %
+                                        args.user)
+
+   # For python 2.7.9 and later, the default SSL context has stricter
+   # connection handshaking rule, hence we are turning off the hostname checking
+   # and client side cert verification.
+   sslContext = None
+   if sys.version_info[:3] > (2,7,8):
+      sslContext = ssl.create_default_context()
+      sslContext.check_hostname = False
+      sslContext.verify_mode = ssl.CERT_NONE
+
+   writer = csv.DictWriter(sys.stdout, fieldnames=COLUMNS)
+   if args.header:
+      writer.writeheader()
+   for vc in args.vc:
+      writer.writerows(ReportVc(vc, args, password, sslContext))
+
+
+if __name__ == "__main__":
+   main()
@@ -12,6 +12,11 @@ __author__ = 'Broadcom, Inc'
 
 import sys
 import ssl
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
 if (sys.version_info[0] == 3):
    from urllib.request import urlopen
 else:
@@ -27,6 +32,21 @@ VSAN_API_ESXI_SERVICE_ENDPOINT = '/vsan'
 
 VSAN_VMODL_VERSION = "vsan.version.version3"
 
+# Negotiated vSAN VMODL versions can be cached in this file for
+# VSAN_VERSION_CACHE_TTL seconds, so that scripts polling many hosts do not
+# download vsanServiceVersions.xml from every host on every run. Pass it as
+# the cacheFile of GetLatestVmodlVersion to opt in.
+VSAN_VERSION_CACHE_FILE = os.path.join(os.path.expanduser('~'),
+                                       '.vsanVmodlVersions.json')
+VSAN_VERSION_CACHE_TTL = 24 * 60 * 60
+
+# vSAN stubs by (host, session cookie, endpoint, version, SSL context), least
+# recently used first. A new session cookie leads to a new stub.
+VSAN_STUB_CACHE_SIZE = 64
+_vsanStubs = OrderedDict()
+_vsanVersions = {}
+_cacheLock = threading.Lock()
+
 # Construct a stub for vSAN API access using vCenter or ESXi sessions from
 # existing stubs. Corresponding vCenter or ESXi service endpoint is required.
 # vCenter service endpoint is used by default.
@@ -38,17 +58,47 @@ def valid_ipv6(addr):
       return False
    return True
 
+class _SharedPoolStubAdapter(SoapStubAdapter):
+   """
+   SoapStubAdapter using the HTTP connection pool of another stub.
+
+   SoapStubAdapter replaces its pool list when it closes idle connections or
+   drops them, so the pool is read from and written to the owner every time
+   instead of sharing the list object.
+   """
+   poolOwner = None
+
+   @property
+   def pool(self):
+      if self.poolOwner is not None:
+         return self.poolOwner.pool
+      return self._ownPool
+
+   @pool.setter
+   def pool(self, value):
+      if self.poolOwner is not None:
+         self.poolOwner.pool = value
+      else:
+         self._ownPool = value
+
 def _GetVsanStub(
       stub, endpoint=VSAN_API_VC_SERVICE_ENDPOINT,
       context=None, version='vim.version.version11'
    ):
+   key = (stub.host, stub.cookie, endpoint, version, id(context))
+   with _cacheLock:
+      vsanStub = _vsanStubs.get(key)
+      if vsanStub is not None:
+         _vsanStubs.move_to_end(key)
+         return vsanStub
+
    index = stub.host.rfind(':')
    if valid_ipv6(stub.host[:index][1:-1]):
       hostname = stub.host[:index][1:-1]
    else:
       hostname = stub.host[:index]
    port = int(stub.host.split(":")[-1])
-   vsanStub = SoapStubAdapter(
+   vsanStub = _SharedPoolStubAdapter(
       host=hostname,
       port=port,
       path=endpoint,
@@ -56,8 +106,28 @@ def _GetVsanStub(
       sslContext=context
    )
    vsanStub.cookie = stub.cookie
+   # The vSAN endpoints are served by the same host and port as the vim
+   # endpoint, so the stubs can use the same pool of HTTP connections instead
+   # of each opening their own. Connections are only shared between stubs
+   # verifying the server with the same SSL context.
+   if isinstance(stub, SoapStubAdapter) and \
+         stub.scheme is vsanStub.scheme and \
+         stub.schemeArgs.get('context') is vsanStub.schemeArgs.get('context'):
+      vsanStub.lock = stub.lock
+      vsanStub.poolSize = stub.poolSize
+      vsanStub.poolOwner = stub
+
+   with _cacheLock:
+      vsanStub = _vsanStubs.setdefault(key, vsanStub)
+      while len(_vsanStubs) > VSAN_STUB_CACHE_SIZE:
+         _vsanStubs.popitem(last=False)
    return vsanStub
 
+# Forget the cached vSAN stubs and managed objects, e.g. after a logout.
+def ClearVsanStubCache():
+   with _cacheLock:
+      _vsanStubs.clear()
+
 # Construct a stub for access vCenter side vSAN APIs.
 def GetVsanVcStub(stub, context=None, version=VSAN_VMODL_VERSION):
    return _GetVsanStub(stub, endpoint=VSAN_API_VC_SERVICE_ENDPOINT,
@@ -71,6 +141,9 @@ def GetVsanEsxStub(stub, context=None, version=VSAN_VMODL_VERSION):
 # Construct a stub for access ESXi side vSAN APIs.
 def GetVsanVcMos(vcStub, context=None, version=VSAN_VMODL_VERSION):
    vsanStub = GetVsanVcStub(vcStub, context, version=version)
+   vcMos = getattr(vsanStub, '_vsanVcMos', None)
+   if vcMos is not None:
+      return dict(vcMos)
    vcMos = {
       'vsan-disk-management-system' : vim.cluster.VsanVcDiskManagementSystem(
                                          'vsan-disk-management-system',
@@ -144,12 +217,16 @@ def GetVsanVcMos(vcStub, context=None, version=VSAN_VMODL_VERSION):
                                          'vsan-cluster-power-system',
                                          vsanStub),
    }
+   vsanStub._vsanVcMos = vcMos
 
-   return vcMos
+   return dict(vcMos)
 
 # Construct a stub for access ESXi side vSAN APIs.
 def GetVsanEsxMos(esxStub, context=None, version=VSAN_VMODL_VERSION):
    vsanStub = GetVsanEsxStub(esxStub, context, version=version)
+   esxMos = getattr(vsanStub, '_vsanEsxMos', None)
+   if esxMos is not None:
+      return dict(esxMos)
    esxMos = {
       'vsan-performance-manager' : vim.cluster.VsanPerformanceManager(
                                       'vsan-performance-manager',
@@ -185,7 +262,8 @@ def GetVsanEsxMos(esxStub, context=None, version=VSAN_VMODL_VERSION):
                                          'vsan-host-ioinsight-manager',
                                          vsanStub),
    }
-   return esxMos
+   vsanStub._vsanEsxMos = esxMos
+   return dict(esxMos)
 
 # Convert a vSAN Task to a Task MO binding to vCenter service.
 def ConvertVsanTaskToVcTask(vsanTask, vcStub):
@@ -247,16 +325,30 @@ def getVsanVersionFromNamespace(versionId, localVersion):
       return remoteVersion
 
 # Get the VMODL version by checking the existence of vSAN namespace.
-def GetLatestVmodlVersion(hostname, port=443):
+# The version negotiated with a host is cached in memory for ttl seconds, and
+# in cacheFile if given, e.g. VSAN_VERSION_CACHE_FILE. Pass ttl=0 to
+# negotiate again.
+def GetLatestVmodlVersion(hostname, port=443, cacheFile=None,
+                          ttl=VSAN_VERSION_CACHE_TTL):
+   key = '%s:%s' % (hostname, port)
+   version = _GetCachedVmodlVersion(key, cacheFile, ttl)
+   if version:
+      return version
+   version, negotiated = _NegotiateVmodlVersion(hostname, port)
+   if negotiated:
+      _CacheVmodlVersion(key, version, cacheFile)
+   return version
+
+def _NegotiateVmodlVersion(hostname, port):
    try:
       if valid_ipv6(hostname):
          hostname = "[%s]" % hostname
       vsanVmodlUrl = 'https://%s:%s/sdk/vsanServiceVersions.xml' % (hostname, str(port))
-      if (hasattr(ssl, '_create_unverified_context') and
-         hasattr(ssl, '_create_default_https_context')):
-         ssl._create_default_https_context = ssl._create_unverified_context
+      context = None
+      if hasattr(ssl, '_create_unverified_context'):
+         context = ssl._create_unverified_context()
       localVersion = VmomiSupport.newestVersions.GetName("vsan")
-      xmldoc = minidom.parse(urlopen(vsanVmodlUrl, timeout=5))
+      xmldoc = minidom.parse(urlopen(vsanVmodlUrl, timeout=5, context=context))
       for element in xmldoc.getElementsByTagName('name'):
          if (element.firstChild.nodeValue == "urn:vsan"):
             versions = xmldoc.getElementsByTagName('version')
@@ -264,12 +356,53 @@ def GetLatestVmodlVersion(hostname, port=443):
                versionId = ver.firstChild.nodeValue
                version = getVsanVersionFromNamespace(versionId, localVersion)
                if version:
-                  return version
-            return localVersion
-         else:
-            return VmomiSupport.newestVersions.GetName('vim')
+                  return version, True
+            return localVersion, True
    except Exception as e:
       # Any exception like failing to open the XML or failed to parse the
       # the content should lead to the returning of namespace with vim.
-      return VmomiSupport.newestVersions.GetName('vim')
+      pass
+   # The vim fallback is not cached, the next call tries again
+   return VmomiSupport.newestVersions.GetName('vim'), False
+
+def _GetCachedVmodlVersion(key, cacheFile, ttl):
+   now = time.time()
+   with _cacheLock:
+      entry = _vsanVersions.get(key)
+   if entry is None and cacheFile:
+      entry = _ReadVersionCacheFile(cacheFile).get(key)
+   if entry is None or now - entry['time'] >= ttl:
+      return None
+   # Versions cached by another pyVmomi release may be unknown to this one
+   if entry['version'] not in VmomiSupport.versionIdMap:
+      return None
+   with _cacheLock:
+      _vsanVersions[key] = entry
+   return entry['version']
+
+def _CacheVmodlVersion(key, version, cacheFile):
+   entry = {'version': version, 'time': time.time()}
+   with _cacheLock:
+      _vsanVersions[key] = entry
+   if not cacheFile:
+      return
+   try:
+      entries = _ReadVersionCacheFile(cacheFile)
+      entries[key] = entry
+      # Write to a temporary file first, so that concurrent scripts never
+      # read a partially written cache
+      tmpFile = '%s.%d.tmp' % (cacheFile, os.getpid())
+      with open(tmpFile, 'w') as f:
+         json.dump(entries, f)
+      os.replace(tmpFile, cacheFile)
+   except Exception:
+      # The cache is an optimization only
+      pass
 
+def _ReadVersionCacheFile(cacheFile):
+   try:
+      with open(cacheFile) as f:
+         entries = json.load(f)
+      return entries if isinstance(entries, dict) else {}
+   except (IOError, OSError, ValueError):
+      return {}
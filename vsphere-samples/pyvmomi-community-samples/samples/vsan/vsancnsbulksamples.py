@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2019-2025 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes sample code for bulk operations of the vSAN Cloud Native
+Storage API.
+
+Instead of creating, updating and deleting CNS volumes one at a time and
+waiting for each task, the volume specs are grouped into batches, one
+Create(), UpdateVolumeMetadata() or Delete() call per batch, and a bounded
+number of batch tasks is kept in flight. The tasks in flight are checked with
+one property collector call. A batch rejected by vCenter, e.g. as too large,
+is split in two and submitted once more. Volumes are read with Query() pages using the
+cursor of the query filter, and the latency of every volume is reported.
+
+NOTE: using vSAN CNS API requires a minimal vim.version.version11 Stub.
+
+usage: vsancnsbulksamples.py [-h] -s HOST [-o PORT] -u USER [-p PASSWORD]
+                             [--cluster CLUSTER] [--count COUNT]
+                             [--batch-size BATCH_SIZE] [--in-flight IN_FLIGHT]
+                             [--page-size PAGE_SIZE]
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+import sys
+import ssl
+import atexit
+import argparse
+import getpass
+import time
+import vsanapiutils
+
+from pyVmomi import vim, vmodl
+from pyVim.connect import SmartConnect, Disconnect
+
+import vsanmgmtObjects
+
+# Volumes per Create, UpdateVolumeMetadata or Delete call, halved for a batch
+# vCenter rejects
+MAX_BATCH_SIZE = 32
+# Batch tasks running at the same time
+MAX_TASKS_IN_FLIGHT = 4
+# Volumes per Query call
+QUERY_PAGE_SIZE = 100
+
+def GetArgs():
+   """
+   Supports the command-line arguments listed below.
+   """
+   parser = argparse.ArgumentParser(
+       description='Process args for vSAN SDK sample application')
+   parser.add_argument('-s', '--host', required=True, action='store',
+                       help='Remote vCenter host to connect to')
+   parser.add_argument('-o', '--port', type=int, default=443, action='store',
+                       help='Port to connect on')
+   parser.add_argument('-u', '--user', required=True, action='store',
+                       help='User name to use when connecting to host')
+   parser.add_argument('-p', '--password', required=False, action='store',
+                       help='Password to use when connecting to host')
+   parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
+                       default='VSAN-Cluster')
+   parser.add_argument('--count', type=int, default=100,
+                       help='Number of volumes to create, update and delete')
+   parser.add_argument('--batch-size', dest='batchSize', type=int,
+                       default=MAX_BATCH_SIZE,
+                       help='Volumes per CNS call')
+   parser.add_argument('--in-flight', dest='inFlight', type=int,
+                       default=MAX_TASKS_IN_FLIGHT,
+                       help='CNS tasks running at the same time')
+   parser.add_argument('--page-size', dest='pageSize', type=int,
+                       default=QUERY_PAGE_SIZE,
+                       help='Volumes per Query call')
+   args = parser.parse_args()
+   return args
+
+def GetVsanDatastore(clusterName, vcServiceInst):
+   """
+   Get vsan datastore with cluster instance
+   @param clusterName Given cluster name
+   @param vcServiceInst Vc service instance
+   @return dsList Vsan datastores
+   """
+   content = vcServiceInst.RetrieveContent()
+   searchIndex = content.searchIndex
+   for datacenter in content.rootFolder.childEntity:
+      cluster = searchIndex.FindChild(datacenter.hostFolder, clusterName)
+      if cluster is not None:
+         return [ds for ds in cluster.datastore if ds.summary.type == 'vsan']
+   return None
+
+def PrepareMetadata(user, pvcName, labels=None):
+   containerCluster = vim.cns.ContainerCluster()
+   containerCluster.clusterType = "KUBERNETES"
+   containerCluster.clusterId = "k8_cls_1"
+   containerCluster.vSphereUser = user
+   k8sEntityMetaData = vim.cns.KubernetesEntityMetadata()
+   k8sEntityMetaData.namespace = "default"
+   k8sEntityMetaData.entityType = "PERSISTENT_VOLUME_CLAIM"
+   k8sEntityMetaData.entityName = pvcName
+   k8sEntityMetaData.delete = False
+   if labels:
+      k8sEntityMetaData.labels = [vim.KeyValue(key=key, value=value)
+                                  for key, value in labels.items()]
+   metadata = vim.cns.VolumeMetadata()
+   metadata.containerCluster = containerCluster
+   metadata.entityMetadata = [k8sEntityMetaData]
+   return metadata
+
+def PrepareVolumeCreateSpec(user, volumeName, datastores=None):
+   """
+   Creates the createSpec of one block volume
+   @param user vSphere user of the container cluster
+   @param volumeName Volume name
+   @param datastores Array of datastore
+   @return createSpec
+   """
+   backingOption = vim.cns.BlockBackingDetails()
+   backingOption.capacityInMb = 1024
+   createSpec = vim.cns.VolumeCreateSpec()
+   createSpec.name = volumeName
+   createSpec.volumeType = "BLOCK"
+   createSpec.metadata = PrepareMetadata(user, volumeName)
+   createSpec.backingObjectDetails = backingOption
+   createSpec.datastores = list(datastores or [])
+   return createSpec
+
+def PrepareVolumeMetadataUpdateSpec(user, volumeId, volumeName, labels):
+   updateSpec = vim.cns.VolumeMetadataUpdateSpec()
+   updateSpec.volumeId = volumeId
+   updateSpec.metadata = PrepareMetadata(user, volumeName, labels)
+   return updateSpec
+
+class CnsBulkClient(object):
+   """
+   Runs CNS volume operations in batches, with a bounded number of tasks in
+   flight.
+   """
+
+   # Faults of a batch larger than vCenter accepts, also raised for a malformed
+   # spec, so a batch is only split once
+   BATCH_TOO_LARGE_FAULTS = (vmodl.fault.InvalidArgument,
+                             vmodl.fault.NotSupported)
+
+   def __init__(self, volumeManager, si, batchSize=MAX_BATCH_SIZE,
+                maxInFlight=MAX_TASKS_IN_FLIGHT, pollInterval=1):
+      """
+      @param volumeManager cns-volume-manager MO
+      @param si vc service instance
+      @param batchSize volumes per call
+      @param maxInFlight tasks running at the same time
+      @param pollInterval seconds between two checks of the tasks in flight
+      """
+      self.volumeManager = volumeManager
+      self.si = si
+      self.batchSize = batchSize
+      self.maxInFlight = maxInFlight
+      self.pollInterval = pollInterval
+
+   def _TaskStates(self, tasks):
+      """
+      Retrieves the state of the tasks in one property collector call
+      @return dict of task moId to vim.TaskInfo.State
+      """
+      pc = self.si.content.propertyCollector
+      filterSpec = vmodl.query.PropertyCollector.FilterSpec(
+         objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=task)
+                    for task in tasks],
+         propSet=[vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.Task, pathSet=['info.state'])])
+      states = {}
+      result = pc.RetrievePropertiesEx(
+         [filterSpec], vmodl.query.PropertyCollector.RetrieveOptions())
+      while result:
+         for objContent in result.objects:
+            states[objContent.obj._moId] = objContent.propSet[0].val
+         if not result.token:
+            break
+         result = pc.ContinueRetrievePropertiesEx(result.token)
+      return states
+
+   def Run(self, operation, items, keyFunc):
+      """
+      Runs operation on batches of items
+      @param operation function of a list of items returning a vSAN task
+      @param items specs or volume ids, in the order of the results
+      @param keyFunc function returning the name of an item
+      @return list of (key, volumeId, fault, seconds), one per item. seconds
+              runs from the submission to the completion of its batch
+      """
+      # (batch, whether it is half of a rejected batch)
+      pending = [(items[i:i + self.batchSize], False)
+                 for i in range(0, len(items), self.batchSize)]
+      pending.reverse()
+      inFlight = {}
+      results = []
+
+      def complete(batch, start, volumeResults=None, fault=None):
+         seconds = time.time() - start
+         for i, item in enumerate(batch):
+            volumeFault = fault
+            volumeId = None
+            if volumeResults is not None:
+               if i < len(volumeResults):
+                  volumeId = volumeResults[i].volumeId
+                  volumeFault = volumeResults[i].fault
+               else:
+                  volumeFault = vmodl.fault.SystemError(
+                     reason='No result returned for the volume',
+                     msg='No result returned for the volume')
+            results.append((keyFunc(item), volumeId, volumeFault, seconds))
+
+      while pending or inFlight:
+         while pending and len(inFlight) < self.maxInFlight:
+            batch, isRetry = pending.pop()
+            start = time.time()
+            try:
+               vcTask = vsanapiutils.ConvertVsanTaskToVcTask(
+                  operation(batch), self.si._stub)
+            except self.BATCH_TOO_LARGE_FAULTS as e:
+               if isRetry or len(batch) == 1:
+                  complete(batch, start, fault=e)
+                  continue
+               half = len(batch) // 2
+               pending.extend([(batch[half:], True), (batch[:half], True)])
+               continue
+            inFlight[vcTask._moId] = (vcTask, batch, start)
+
+         states = self._TaskStates([vcTask for vcTask, _, _ in
+                                    inFlight.values()])
+         for moId, state in states.items():
+            if state not in (vim.TaskInfo.State.success,
+                             vim.TaskInfo.State.error):
+               continue
+            vcTask, batch, start = inFlight.pop(moId)
+            info = vcTask.info
+            if state == vim.TaskInfo.State.success:
+               complete(batch, start,
+                        volumeResults=(info.result and
+                                       info.result.volumeResults) or [])
+            else:
+               complete(batch, start, fault=info.error)
+         if inFlight:
+            time.sleep(self.pollInterval)
+      return results
+
+   def Create(self, createSpecs):
+      return self.Run(self.volumeManager.Create, createSpecs,
+                      lambda spec: spec.name)
+
+   def UpdateVolumeMetadata(self, updateSpecs):
+      return self.Run(self.volumeManager.UpdateVolumeMetadata, updateSpecs,
+                      lambda spec: spec.volumeId.id)
+
+   def Delete(self, volumeIds, deleteDisk=True):
+      return self.Run(
+         lambda batch: self.volumeManager.Delete(batch, deleteDisk=deleteDisk),
+         volumeIds, lambda volumeId: volumeId.id)
+
+   def Query(self, filterSpec, pageSize=QUERY_PAGE_SIZE):
+      """
+      Iterates the volumes matching filterSpec, one Query call per page
+      """
+      offset = 0
+      while True:
+         filterSpec.cursor = vim.cns.Cursor(offset=offset, limit=pageSize)
+         queryResult = self.volumeManager.Query(filterSpec)
+         volumes = queryResult.volumes or []
+         for volume in volumes:
+            yield volume
+         cursor = queryResult.cursor
+         if not volumes or cursor is None or cursor.offset <= offset or \
+            cursor.offset >= cursor.totalRecords:
+            return
+         offset = cursor.offset
+
+def ReportResults(operation, results, elapsed):
+   """
+   Prints the failed volumes and the latency percentiles of an operation
+   @return number of failed volumes
+   """
+   failed = [(key, fault) for key, _, fault, _ in results if fault is not None]
+   for key, fault in failed:
+      print("   %s failed on %s: %s" % (operation, key,
+                                       getattr(fault, 'msg', fault)))
+   latencies = sorted(seconds for _, _, _, seconds in results)
+   if latencies:
+      print("%s %d volumes in %.1f seconds, %d failed, latency p50 %.1f s, "
+            "p95 %.1f s, max %.1f s" % (
+               operation, len(results), elapsed, len(failed),
+               latencies[len(latencies) // 2],
+               latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+               latencies[-1]))
+   return len(failed)
+
+def main():
+   args = GetArgs()
+   if args.password:
+      password = args.password
+   else:
+      password = getpass.getpass(prompt='Enter password for host %s and '
+                                        'user %s: ' % (args.host,args.user))
+
+   # For python 2.7.9 and later, the default SSL context has stricter
+   # connection handshaking rule, hence we are turning off the hostname checking
+   # and client side cert verification.
+   sslContext = None
+   if sys.version_info[:3] > (2,7,8):
+      sslContext = ssl.create_default_context()
+      sslContext.check_hostname = False
+      sslContext.verify_mode = ssl.CERT_NONE
+
+   si = SmartConnect(host=args.host,
+                     user=args.user,
+                     pwd=password,
+                     port=int(args.port),
+                     sslContext=sslContext)
+   atexit.register(Disconnect, si)
+
+   apiVersion = vsanapiutils.GetLatestVmodlVersion(args.host, int(args.port))
+   vcMos = vsanapiutils.GetVsanVcMos(si._stub,
+                                     context=sslContext,
+                                     version=apiVersion)
+   client = CnsBulkClient(vcMos['cns-volume-manager'], si,
+                          batchSize=args.batchSize, maxInFlight=args.inFlight)
+
+   datastores = GetVsanDatastore(args.clusterName, si)
+   if not datastores:
+      print("vsan datastore is not found for cluster %s" % args.clusterName)
+      return -1
+
+   # Create CNS volumes
+   prefix = "bulk_volume_sdk_test_%d" % int(time.time())
+   volumeNames = ["%s_%d" % (prefix, i) for i in range(args.count)]
+   start = time.time()
+   results = client.Create([PrepareVolumeCreateSpec(args.user, name,
+                                                    datastores)
+                            for name in volumeNames])
+   ReportResults("Create", results, time.time() - start)
+   created = dict((name, volumeId) for name, volumeId, fault, _ in results
+                  if fault is None and volumeId is not None)
+
+   # Query CNS volumes, page by page
+   filterSpec = vim.cns.QueryFilter()
+   filterSpec.names = volumeNames
+   start = time.time()
+   volumes = list(client.Query(filterSpec, args.pageSize))
+   print("Query %d volumes in %.1f seconds" % (len(volumes),
+                                               time.time() - start))
+   for volume in volumes:
+      created.setdefault(volume.name, volume.volumeId)
+
+   # Update CNS volume metadata
+   start = time.time()
+   results = client.UpdateVolumeMetadata(
+      [PrepareVolumeMetadataUpdateSpec(args.user, volumeId, name,
+                                       {'PVCkey1': 'PVCvalue1'})
+       for name, volumeId in sorted(created.items())])
+   ReportResults("Update", results, time.time() - start)
+
+   # Delete CNS volumes
+   start = time.time()
+   results = client.Delete([volumeId for _, volumeId in sorted(created.items())])
+   if ReportResults("Delete", results, time.time() - start):
+      return -1
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2016-2025 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes sample codes for a fleet wide vSAN health sweep with the
+QueryClusterHealthSummary() API of the VsanVcClusterHealthSystem MO.
+
+The health summaries of many clusters are queried concurrently, requesting only
+the fields the sweep uses. The static health test catalog returned by
+QueryAllSupportedHealthChecks() is cached on disk apart from the per-run
+results, and the results are flattened into one row per cluster and test,
+indexed by cluster, test and health.
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+from pyVim.connect import SmartConnect, Disconnect
+import sys
+import ssl
+import atexit
+import argparse
+import getpass
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import vsanmgmtObjects
+import vsanapiutils
+from pyVmomi import vim, vmodl
+
+# Top level fields of VsanClusterHealthSummary used by the sweep
+HEALTH_FIELDS = ['groups', 'overallHealth']
+
+CATALOG_FILE = os.path.join(os.path.expanduser('~'), '.vsanHealthCatalog.json')
+CATALOG_TTL = 24 * 60 * 60
+
+def GetArgs():
+   """
+   Supports the command-line arguments listed below.
+   """
+   parser = argparse.ArgumentParser(
+       description='Process args for vSAN SDK sample application')
+   parser.add_argument('-s', '--host', required=True, action='store',
+                       help='Remote vCenter Server to connect to')
+   parser.add_argument('-o', '--port', type=int, default=443, action='store',
+                       help='Port to connect on')
+   parser.add_argument('-u', '--user', required=True, action='store',
+                       help='User name to use when connecting to host')
+   parser.add_argument('-p', '--password', required=False, action='store',
+                       help='Password to use when connecting to host')
+   parser.add_argument('--cluster', dest='clusterNames', metavar="CLUSTER",
+                       action='append',
+                       help='Cluster to check, can be given several times. '
+                            'All clusters are checked by default')
+   parser.add_argument('--workers', type=int, default=16,
+                       help='Concurrent QueryClusterHealthSummary calls')
+   parser.add_argument('--no-cache', dest='fetchFromCache',
+                       action='store_false',
+                       help='Run the health tests instead of returning the '
+                            'results cached by vCenter')
+   parser.add_argument('--all', dest='showAll', action='store_true',
+                       help='Print the green tests as well')
+   args = parser.parse_args()
+   return args
+
+def GetClusters(si, clusterNames=None):
+   """
+   Retrieves the clusters and their names in one property collector call
+   @return list of (name, cluster)
+   """
+   content = si.RetrieveContent()
+   view = content.viewManager.CreateContainerView(
+      content.rootFolder, [vim.ClusterComputeResource], True)
+   try:
+      traversal = vmodl.query.PropertyCollector.TraversalSpec(
+         name='traverseView', path='view', skip=False,
+         type=vim.view.ContainerView)
+      filterSpec = vmodl.query.PropertyCollector.FilterSpec(
+         objectSet=[vmodl.query.PropertyCollector.ObjectSpec(
+            obj=view, skip=True, selectSet=[traversal])],
+         propSet=[vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.ClusterComputeResource, pathSet=['name'])])
+      clusters = []
+      result = content.propertyCollector.RetrievePropertiesEx(
+         [filterSpec], vmodl.query.PropertyCollector.RetrieveOptions())
+      while result:
+         for objContent in result.objects:
+            name = objContent.propSet[0].val
+            if not clusterNames or name in clusterNames:
+               clusters.append((name, objContent.obj))
+         if not result.token:
+            break
+         result = content.propertyCollector.ContinueRetrievePropertiesEx(
+            result.token)
+      return sorted(clusters, key=lambda cluster: cluster[0])
+   finally:
+      view.Destroy()
+
+def GetHealthCatalog(vchs, key, catalogFile=CATALOG_FILE, ttl=CATALOG_TTL):
+   """
+   Gets the supported health tests, from catalogFile while younger than ttl
+   @param key identifies the vCenter and vSAN API version of the catalog
+   @return dict of testId to dict of testName, groupId and groupName
+   """
+   catalogs = {}
+   try:
+      with open(catalogFile) as f:
+         catalogs = json.load(f)
+   except (IOError, OSError, ValueError):
+      pass
+   entry = catalogs.get(key)
+   if entry and time.time() - entry['time'] < ttl:
+      return entry['tests']
+
+   tests = {}
+   for check in vchs.QueryAllSupportedHealthChecks() or []:
+      tests[check.testId] = {'testName': check.testName,
+                             'groupId': check.groupId,
+                             'groupName': check.groupName}
+   catalogs[key] = {'time': time.time(), 'tests': tests}
+   try:
+      tmpFile = '%s.%d.tmp' % (catalogFile, os.getpid())
+      with open(tmpFile, 'w') as f:
+         json.dump(catalogs, f)
+      os.replace(tmpFile, catalogFile)
+   except (IOError, OSError):
+      pass
+   return tests
+
+def QueryHealthSummaries(vchs, clusters, workers=16, fetchFromCache=True):
+   """
+   Queries the health summary of the clusters concurrently
+   @return dict of cluster name to VsanClusterHealthSummary, or to the fault
+           raised for the cluster
+   """
+   def query(cluster):
+      try:
+         return vchs.QueryClusterHealthSummary(
+            cluster=cluster, fields=HEALTH_FIELDS,
+            fetchFromCache=fetchFromCache)
+      except vmodl.MethodFault as e:
+         return e
+
+   with ThreadPoolExecutor(max_workers=workers) as executor:
+      summaries = executor.map(query, [cluster for _, cluster in clusters])
+      return dict(zip([name for name, _ in clusters], summaries))
+
+def FlattenHealth(summaries, catalog):
+   """
+   Flattens the health summaries into one row per cluster and test
+   @return list of dicts with cluster, overallHealth, groupId, groupName,
+           testId, testName and health
+   """
+   rows = []
+   for clusterName, summary in sorted(summaries.items()):
+      if isinstance(summary, vmodl.MethodFault):
+         rows.append({'cluster': clusterName, 'overallHealth': 'unknown',
+                      'groupId': None, 'groupName': None, 'testId': None,
+                      'testName': summary.msg, 'health': 'unknown'})
+         continue
+      for group in summary.groups or []:
+         for test in group.groupTests or []:
+            info = catalog.get(test.testId, {})
+            rows.append({'cluster': clusterName,
+                         'overallHealth': summary.overallHealth,
+                         'groupId': group.groupId,
+                         'groupName': group.groupName or info.get('groupName'),
+                         'testId': test.testId,
+                         'testName': test.testName or info.get('testName'),
+                         'health': test.testHealth})
+   return rows
+
+def IndexHealth(rows):
+   """
+   Indexes the flat health rows
+   @return dict of (cluster, testId) to row, and dict of health to rows
+   """
+   byTest = {}
+   byHealth = defaultdict(list)
+   for row in rows:
+      byTest[(row['cluster'], row['testId'])] = row
+      byHealth[row['health']].append(row)
+   return byTest, byHealth
+
+def main():
+   args = GetArgs()
+   if args.password:
+      password = args.password
+   else:
+      password = getpass.getpass(prompt='Enter password for host %s and '
+                                        'user %s: ' % (args.host,args.user))
+
+   # For python 2.7.9 and later, the default SSL context has more strict
+   # connection handshaking rule. We may need turn off the hostname checking
+   # and client side cert verification.
+   context = None
+   if sys.version_info[:3] > (2,7,8):
+      context = ssl.create_default_context()
+      context.check_hostname = False
+      context.verify_mode = ssl.CERT_NONE
+
+   si = SmartConnect(host=args.host,
+                     user=args.user,
+                     pwd=password,
+                     port=int(args.port),
+                     sslContext=context)
+
+   atexit.register(Disconnect, si)
+
+   if si.content.about.apiType != 'VirtualCenter':
+      print('The sample script should be run against vc.')
+      return -1
+
+   apiVersion = vsanapiutils.GetLatestVmodlVersion(args.host, int(args.port))
+   vcMos = vsanapiutils.GetVsanVcMos(
+         si._stub, context=context, version=apiVersion)
+   vchs = vcMos['vsan-cluster-health-system']
+
+   clusters = GetClusters(si, args.clusterNames)
+   if not clusters:
+      print("No cluster found for %s" % args.host)
+      return -1
+
+   start = time.time()
+   catalog = GetHealthCatalog(vchs, '%s:%s|%s' % (args.host, args.port,
+                                                  apiVersion))
+   summaries = QueryHealthSummaries(vchs, clusters, args.workers,
+                                    args.fetchFromCache)
+   rows = FlattenHealth(summaries, catalog)
+   _, byHealth = IndexHealth(rows)
+
+   for row in rows:
+      if args.showAll or row['health'] != 'green':
+         print('%-30s %-8s %-30s %s' % (row['cluster'], row['health'],
+                                        row['groupName'], row['testName']))
+   print('\n%d clusters, %d tests checked in %.1f seconds: %s' % (
+      len(clusters), len(rows), time.time() - start,
+      ', '.join('%d %s' % (len(byHealth[health]), health)
+                for health in sorted(byHealth))))
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2016-2025 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes sample codes for tracking the vSAN resync of a cluster
+with the QuerySyncingVsanObjectsSummary() API of the VsanVcObjectSystemImpl MO.
+
+The syncing objects are paged through concurrently: the first page tells the
+total number of objects, the remaining offsets are then queried in parallel.
+Successive snapshots are compared to compute the resync rate of each object
+and a smoothed resync rate and ETA of the cluster. Objects completing their
+resync while the pages are queried shift the offsets of the later pages, so a
+snapshot may miss objects still resyncing. Such a snapshot keeps the missing
+objects with their previous bytes to sync, they are not counted as synced. The summaries of several
+resync status and type filters are queried in parallel as well.
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+from pyVim.connect import SmartConnect, Disconnect
+import sys
+import ssl
+import atexit
+import argparse
+import getpass
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import vsanmgmtObjects
+import vsanapiutils
+from pyVmomi import vim
+
+RESYNC_STATUSES = ['active', 'queued']
+
+def GetArgs():
+   """
+   Supports the command-line arguments listed below.
+   """
+   parser = argparse.ArgumentParser(
+       description='Process args for vSAN SDK sample application')
+   parser.add_argument('-s', '--host', required=True, action='store',
+                       help='Remote vCenter Server to connect to')
+   parser.add_argument('-o', '--port', type=int, default=443, action='store',
+                       help='Port to connect on')
+   parser.add_argument('-u', '--user', required=True, action='store',
+                       help='User name to use when connecting to host')
+   parser.add_argument('-p', '--password', required=False, action='store',
+                       help='Password to use when connecting to host')
+   parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
+                      default='VSAN-Cluster')
+   parser.add_argument('--resync-types', dest='resyncTypes', nargs='*',
+                       default=['evacuate', 'repair'],
+                       help='Resync types to print a summary of, besides '
+                            'the summary of all types')
+   parser.add_argument('--interval', type=int, default=30,
+                       help='Seconds between two snapshots')
+   parser.add_argument('--count', type=int, default=0,
+                       help='Number of snapshots, 0 to track until the '
+                            'resync completed')
+   parser.add_argument('--page-size', dest='pageSize', type=int, default=500,
+                       help='Objects per QuerySyncingVsanObjectsSummary call')
+   parser.add_argument('--workers', type=int, default=8,
+                       help='Concurrent QuerySyncingVsanObjectsSummary calls')
+   args = parser.parse_args()
+   return args
+
+def getClusterInstance(clusterName, serviceInstance):
+   content = serviceInstance.RetrieveContent()
+   searchIndex = content.searchIndex
+   datacenters = content.rootFolder.childEntity
+   for datacenter in datacenters:
+      cluster = searchIndex.FindChild(datacenter.hostFolder, clusterName)
+      if cluster is not None:
+         return cluster
+   return None
+
+class ResyncTracker(object):
+   """
+   Tracks the resyncing objects of a cluster across snapshots.
+   """
+
+   def __init__(self, objectSystem, cluster, pageSize=500, workers=8,
+                smoothing=0.3):
+      """
+      @param objectSystem vsan-cluster-object-system MO
+      @param cluster cluster to track
+      @param pageSize objects per query
+      @param workers concurrent queries
+      @param smoothing weight of the latest rate in the smoothed cluster rate
+      """
+      self.objectSystem = objectSystem
+      self.cluster = cluster
+      self.pageSize = pageSize
+      self.smoothing = smoothing
+      self.executor = ThreadPoolExecutor(max_workers=workers)
+      self.snapshot = None
+      self.snapshotTime = None
+      self.objectRates = {}
+      self.clusterRate = None
+      # Whether the last QueryObjects returned as many objects as reported
+      self.complete = True
+
+   def close(self):
+      self.executor.shutdown()
+
+   def _Query(self, resyncStatus, resyncType=None, offset=0,
+              numberOfObjects=None):
+      syncingFilter = vim.cluster.VsanSyncingObjectFilter(
+         resyncStatus=resyncStatus, resyncType=resyncType, offset=offset,
+         numberOfObjects=numberOfObjects or self.pageSize)
+      return self.objectSystem.QuerySyncingVsanObjectsSummary(
+         self.cluster, syncingFilter)
+
+   def QuerySummaries(self, resyncTypes=None):
+      """
+      Queries the summary of every resync status and type combination in
+      parallel, only the totals are used so only one object is requested
+      @return dict of (status, type) to VsanSyncingObjectQueryResult
+      """
+      combinations = list(itertools.product(RESYNC_STATUSES,
+                                            [None] + list(resyncTypes or [])))
+      results = self.executor.map(
+         lambda combination: self._Query(*combination, numberOfObjects=1),
+         combinations)
+      return dict(zip(combinations, results))
+
+   def QueryObjects(self, resyncStatuses=RESYNC_STATUSES):
+      """
+      Pages through all the syncing objects of the resync statuses. The first
+      pages tell the number of objects, the other pages are then all queried
+      concurrently
+      @return dict of object uuid to the bytes left to sync
+      """
+      pages = list(self.executor.map(self._Query, resyncStatuses))
+      totalObjects = sum(first.totalObjectsToSync or 0 for first in pages)
+      queries = [(status, offset)
+                 for status, first in zip(resyncStatuses, pages)
+                 for offset in range(self.pageSize,
+                                     first.totalObjectsToSync or 0,
+                                     self.pageSize)]
+      pages.extend(self.executor.map(
+         lambda query: self._Query(query[0], offset=query[1]), queries))
+      objects = {}
+      for page in pages:
+         for obj in page.objects or []:
+            objects[obj.uuid] = sum(component.bytesToSync
+                                    for component in obj.components)
+      self.complete = len(objects) >= totalObjects
+      return objects
+
+   def TakeSnapshot(self):
+      """
+      Takes a snapshot of all resyncing objects and updates the rates
+      @return dict of object uuid to the bytes left to sync
+      """
+      snapshot = self.QueryObjects()
+      now = time.time()
+
+      if self.snapshot is not None and not self.complete:
+         # Objects missed because the pages shifted may still be resyncing,
+         # assume they made no progress
+         for uuid, previousBytes in self.snapshot.items():
+            snapshot.setdefault(uuid, previousBytes)
+
+      if self.snapshot is not None and now > self.snapshotTime:
+         elapsed = now - self.snapshotTime
+         # Objects gone since the previous complete snapshot completed their
+         # resync, objects new in this snapshot do not count until the next
+         # one
+         synced = 0
+         self.objectRates = {}
+         for uuid, previousBytes in self.snapshot.items():
+            bytesToSync = snapshot.get(uuid, 0)
+            self.objectRates[uuid] = max(previousBytes - bytesToSync, 0) / elapsed
+            synced += max(previousBytes - bytesToSync, 0)
+         rate = synced / elapsed
+         if self.clusterRate is None:
+            self.clusterRate = rate
+         else:
+            self.clusterRate = self.smoothing * rate + \
+                               (1 - self.smoothing) * self.clusterRate
+      self.snapshot = snapshot
+      self.snapshotTime = now
+      return snapshot
+
+   def TotalBytesToSync(self):
+      return sum(self.snapshot.values()) if self.snapshot else 0
+
+   def ClusterEta(self):
+      """
+      @return seconds until the resync completes at the smoothed rate, None
+              while the rate is unknown or zero
+      """
+      if not self.clusterRate:
+         return None
+      return self.TotalBytesToSync() / self.clusterRate
+
+def displayResyncSummary(res):
+   print('totalObjectsToSync = %s' % res.totalObjectsToSync)
+   print('totalBytesToSync = %s' % res.totalBytesToSync)
+   print('totalRecoveryETA = %s' % res.totalRecoveryETA)
+
+def displaySnapshot(tracker, top=5):
+   eta = tracker.ClusterEta()
+   print('%s objects, %s bytes to sync, rate %s bytes/s, ETA %s' % (
+      len(tracker.snapshot), tracker.TotalBytesToSync(),
+      int(tracker.clusterRate) if tracker.clusterRate is not None else 'unknown',
+      '%d s' % eta if eta is not None else 'unknown'))
+   fastest = sorted(tracker.objectRates.items(), key=lambda item: -item[1])
+   for uuid, rate in fastest[:top]:
+      if rate:
+         print('   %s: %d bytes/s' % (uuid, rate))
+
+def main():
+   args = GetArgs()
+   if args.password:
+      password = args.password
+   else:
+      password = getpass.getpass(prompt='Enter password for host %s and '
+                                        'user %s: ' % (args.host,args.user))
+
+   # For python 2.7.9 and later, the default SSL context has more strict
+   # connection handshaking rule. We may need turn off the hostname checking
+   # and client side cert verification.
+   context = None
+   if sys.version_info[:3] > (2,7,8):
+      context = ssl.create_default_context()
+      context.check_hostname = False
+      context.verify_mode = ssl.CERT_NONE
+
+   si = SmartConnect(host=args.host,
+                     user=args.user,
+                     pwd=password,
+                     port=int(args.port),
+                     sslContext=context)
+
+   atexit.register(Disconnect, si)
+
+   aboutInfo = si.content.about
+   if aboutInfo.apiType != 'VirtualCenter':
+      print('The sample script should be run against vc.')
+      return -1
+
+   apiVersion = vsanapiutils.GetLatestVmodlVersion(args.host, int(args.port))
+   vcMos = vsanapiutils.GetVsanVcMos(
+         si._stub, context=context, version=apiVersion)
+   cluster = getClusterInstance(args.clusterName, si)
+   if cluster is None:
+      print("Cluster %s is not found for %s" % (args.clusterName, args.host))
+      return -1
+
+   tracker = ResyncTracker(vcMos['vsan-cluster-object-system'], cluster,
+                           pageSize=args.pageSize, workers=args.workers)
+   try:
+      summaries = tracker.QuerySummaries(args.resyncTypes)
+      for (status, resyncType), res in sorted(summaries.items(),
+                                              key=lambda item: str(item[0])):
+         print('\nResync summary of %s objects having %s:' % (
+            status, 'resync reason as %s' % resyncType if resyncType
+                    else 'any resync reason'))
+         displayResyncSummary(res)
+
+      print('')
+      snapshots = 0
+      while True:
+         tracker.TakeSnapshot()
+         displaySnapshot(tracker)
+         snapshots += 1
+         if not tracker.snapshot or snapshots == args.count:
+            break
+         time.sleep(args.interval)
+   finally:
+      tracker.close()
+
+if __name__ == "__main__":
+   main()
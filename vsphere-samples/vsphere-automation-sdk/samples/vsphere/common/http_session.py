@@ -0,0 +1,128 @@
+"""
+* *******************************************************
+* Copyright (c) 2025 Broadcom. All Rights Reserved.
+* SPDX-License-Identifier: MIT
+* *******************************************************
+*
+* DISCLAIMER. THIS PROGRAM IS PROVIDED TO YOU "AS IS" WITHOUT
+* WARRANTIES OR CONDITIONS OF ANY KIND, WHETHER ORAL OR WRITTEN,
+* EXPRESS OR IMPLIED. THE AUTHOR SPECIFICALLY DISCLAIMS ANY IMPLIED
+* WARRANTIES OR CONDITIONS OF MERCHANTABILITY, SATISFACTORY QUALITY,
+* NON-INFRINGEMENT AND FITNESS FOR A PARTICULAR PURPOSE.
+"""
+
+__author__ = 'Broadcom, Inc.'
+
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+# Methods that can be resent safely after a connection error or a 502/503/504
+IDEMPOTENT_METHODS = frozenset(['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT', 'TRACE'])
+RETRY_STATUSES = (502, 503, 504)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a larger connection pool, TCP keep-alive on the pooled
+    connections and a retry policy for idempotent requests.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=32, max_retries=3,
+                 backoff_factor=0.5, pool_block=False):
+        """
+        :type  pool_connections: :class:`int`
+        :param pool_connections: Number of hosts to keep a connection pool for
+        :type  pool_maxsize: :class:`int`
+        :param pool_maxsize: Connections kept open per host, should be at
+            least the number of threads sharing the session
+        :type  max_retries: :class:`int`
+        :param max_retries: Retries of idempotent requests after a connection
+            error or a 502, 503 or 504 response
+        :type  backoff_factor: :class:`float`
+        :param backoff_factor: Exponential backoff between the retries
+        :type  pool_block: :class:`bool`
+        :param pool_block: Wait for a free connection instead of opening one
+            that is not pooled when all the connections of a host are in use
+        """
+        retry = Retry(total=max_retries,
+                      backoff_factor=backoff_factor,
+                      allowed_methods=IDEMPOTENT_METHODS,
+                      status_forcelist=RETRY_STATUSES,
+                      raise_on_status=False)
+        HTTPAdapter.__init__(self, pool_connections=pool_connections,
+                             pool_maxsize=pool_maxsize, max_retries=retry,
+                             pool_block=pool_block)
+
+    def init_poolmanager(self, *args, **pool_kwargs):
+        # Keep idle pooled connections alive through firewalls and NAT
+        pool_kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        HTTPAdapter.init_poolmanager(self, *args, **pool_kwargs)
+
+    def pool_stats(self):
+        """
+        Get the usage of the connection pools, one entry per host.
+        A saturation of 1.0 means every pooled connection is in use, further
+        requests to the host then wait or open unpooled connections.
+
+        :rtype: :class:`list` of :class:`dict`
+        :return: host, port, connections opened, requests sent, connections
+            in use, pool size and saturation of each pool
+        """
+        stats = []
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            in_use = pool.pool.maxsize - pool.pool.qsize() if pool.pool else 0
+            stats.append({
+                'host': pool.host,
+                'port': pool.port,
+                'num_connections': pool.num_connections,
+                'num_requests': pool.num_requests,
+                'in_use': in_use,
+                'maxsize': pool.pool.maxsize if pool.pool else 0,
+                'saturation': float(in_use) / pool.pool.maxsize if pool.pool else 0.0,
+            })
+        return stats
+
+
+def create_session(session=None, verify=None, **adapter_kwargs):
+    """
+    Create a requests session for vAPI connectors, with a PooledHTTPAdapter
+    mounted for http and https.
+
+    :type  session: :class:`requests.Session` or ``None``
+    :param session: Session to mount the adapter on, a new one if None
+    :type  verify: :class:`bool` or :class:`str` or ``None``
+    :param verify: Certificate verification of the session, left unchanged
+        if None
+    :param adapter_kwargs: Pool and retry settings of PooledHTTPAdapter
+    :rtype: :class:`requests.Session`
+    :return: the session
+    """
+    session = session or requests.Session()
+    if verify is not None:
+        session.verify = verify
+    adapter = PooledHTTPAdapter(**adapter_kwargs)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_pool_stats(session):
+    """
+    Get the connection pool usage of a session created by create_session.
+
+    :rtype: :class:`list` of :class:`dict`
+    :return: see PooledHTTPAdapter.pool_stats
+    """
+    adapter = session.get_adapter('https://')
+    if not isinstance(adapter, PooledHTTPAdapter):
+        return []
+    return adapter.pool_stats()
@@ -24,6 +24,8 @@ from vmware.vapi.security.user_password import \
     create_user_password_security_context
 from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
 
+from samples.vsphere.common.http_session import create_session
+
 
 def get_jsonrpc_endpoint_url(host):
     # The URL for the stub requests are made against the /api HTTP endpoint
@@ -41,7 +43,7 @@ def connect(host, user, pwd, skip_verification=False, cert_path=None, suppress_w
     """
     host_url = get_jsonrpc_endpoint_url(host)
 
-    session = requests.Session()
+    session = create_session()
     if skip_verification:
         session = create_unverified_session(session, suppress_warning)
     elif cert_path: